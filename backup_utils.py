@@ -1,102 +1,280 @@
 """
 ระบบสำรองข้อมูลอัตโนมัติ
+สำรองแบบ content-addressed: ไฟล์ถูกตัดเป็นบล็อกขนาดคงที่ เก็บแต่ละบล็อกครั้งเดียวตาม hash (บีบอัดด้วย zlib)
+แต่ละครั้งที่สำรองมี manifest หนึ่งไฟล์ (รายชื่อบล็อกของแต่ละไฟล์) บล็อกที่ไม่เปลี่ยนจึงไม่ถูกเขียนซ้ำ
+
+data/backups/
+├── chunks/ab/abcdef...       # บล็อก (ชื่อ = sha256 ของข้อมูลก่อนบีบอัด)
+└── manifests/20250101_120000.json
 """
 
 import os
-import shutil
+import json
+import zlib
+import sqlite3
+import hashlib
 import datetime
 import logging
 from config import PATHS, SYSTEM_CONFIG
 
-def create_backup():
+CHUNK_SIZE = 16 * 1024  # ขนาดบล็อก (หลายเท่าของ page SQLite 4096 bytes: page ที่เปลี่ยนกระทบบล็อกเดียว)
+MAX_AGE_DAYS = 7  # เก็บสำรองไว้ 7 วัน
+TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+
+def _backup_dirs(root=None):
+    root = root or PATHS['BACKUPS']
+    return os.path.join(root, "chunks"), os.path.join(root, "manifests")
+
+def _chunk_path(chunks_dir, digest):
+    return os.path.join(chunks_dir, digest[:2], digest)
+
+def _write_atomic(path, data):
+    """ เขียนไฟล์ใหม่ทั้งไฟล์แบบ atomic (ไฟล์ชั่วคราวแล้ว os.replace) """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _store_chunks(path, chunks_dir, stats):
+    """
+    ตัดไฟล์เป็นบล็อก เขียนเฉพาะบล็อกที่ยังไม่มี คืน (รายชื่อ hash, sha256 ของทั้งไฟล์)
+    """
+    digests = []
+    file_hash = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(CHUNK_SIZE)
+            if not block:
+                break
+            file_hash.update(block)
+            digest = hashlib.sha256(block).hexdigest()
+            chunk_path = _chunk_path(chunks_dir, digest)
+            if os.path.exists(chunk_path):
+                os.utime(chunk_path)  # บล็อกที่ใช้ซ้ำถือว่าใหม่ ไม่ถูกลบระหว่างสำรอง (ดู cleanup_old_backups)
+            else:
+                os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
+                data = zlib.compress(block, 1)
+                _write_atomic(chunk_path, data)
+                stats['stored'] += len(data)
+                stats['new_chunks'] += 1
+            digests.append(digest)
+    return digests, file_hash.hexdigest()
+
+def _snapshot_sqlite(db_path, snapshot_path):
+    """
+    คัดลอกฐานข้อมูลด้วย SQLite online backup API (ได้ snapshot ที่สอดคล้องแม้มีการเขียนอยู่ และรวมข้อมูลใน WAL)
+    """
+    source = sqlite3.connect(db_path)
+    target = sqlite3.connect(snapshot_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+def _read_stable(path, chunks_dir, stats, attempts=3):
+    """
+    สำรองไฟล์ธรรมดา ถ้าไฟล์เปลี่ยนระหว่างอ่าน (ขนาด/เวลาแก้ไขไม่ตรง) อ่านใหม่
+    """
+    for _ in range(attempts):
+        before = os.stat(path)
+        digests, file_hash = _store_chunks(path, chunks_dir, stats)
+        after = os.stat(path)
+        if (before.st_size, before.st_mtime_ns) == (after.st_size, after.st_mtime_ns):
+            break
+    return digests, file_hash, after
+
+def _latest_manifest(manifests_dir):
+    names = sorted(name for name in os.listdir(manifests_dir) if name.endswith(".json"))
+    if not names:
+        return None
+    with open(os.path.join(manifests_dir, names[-1]), encoding="utf-8") as f:
+        return json.load(f)
+
+def create_backup(sources=None, root=None):
     """
-    สร้างสำรองข้อมูล Q-Table และฐานข้อมูล
+    สร้างสำรองข้อมูล Q-Table และฐานข้อมูล (เฉพาะบล็อกที่เปลี่ยนจากสำรองก่อนหน้า)
+    คืน manifest (dict) ของสำรองนี้ หรือ False ถ้าไม่สำเร็จ
     """
     try:
-        # สร้างชื่อไฟล์สำรองพร้อมเวลา
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        # สร้างโฟลเดอร์สำรองถ้ายังไม่มี
-        if not os.path.exists(PATHS['BACKUPS']):
-            os.makedirs(PATHS['BACKUPS'])
-        
-        # สำรองไฟล์ Q-Table
-        q_table_backup = os.path.join(PATHS['BACKUPS'], f"q_table_{timestamp}.json")
-        if os.path.exists(SYSTEM_CONFIG['Q_TABLE_FILE']):
-            shutil.copy2(SYSTEM_CONFIG['Q_TABLE_FILE'], q_table_backup)
-            logging.info(f"สำรอง Q-Table เรียบร้อย: {q_table_backup}")
-        
-        # สำรองฐานข้อมูล
-        db_backup = os.path.join(PATHS['BACKUPS'], f"q_table_{timestamp}.db")
-        if os.path.exists(SYSTEM_CONFIG['DB_FILE']):
-            shutil.copy2(SYSTEM_CONFIG['DB_FILE'], db_backup)
-            logging.info(f"สำรองฐานข้อมูลเรียบร้อย: {db_backup}")
-        
+        chunks_dir, manifests_dir = _backup_dirs(root)
+        os.makedirs(chunks_dir, exist_ok=True)
+        os.makedirs(manifests_dir, exist_ok=True)
+        sources = sources or {'q_table': SYSTEM_CONFIG['Q_TABLE_FILE'], 'database': SYSTEM_CONFIG['DB_FILE']}
+
+        # ชื่อสำรองตามเวลา (ถ้าซ้ำในวินาทีเดียวกันเติมลำดับต่อท้าย)
+        now = datetime.datetime.now()
+        timestamp = now.strftime(TIMESTAMP_FORMAT)
+        suffix = 1
+        while os.path.exists(os.path.join(manifests_dir, f"{timestamp}.json")):
+            timestamp = f"{now.strftime(TIMESTAMP_FORMAT)}_{suffix}"
+            suffix += 1
+
+        previous = _latest_manifest(manifests_dir) or {'files': {}}
+        stats = {'stored': 0, 'new_chunks': 0}
+        files = {}
+        for name, path in sources.items():
+            if not os.path.exists(path):
+                continue
+            if path.endswith(".db"):
+                snapshot_path = os.path.join(manifests_dir, f"{timestamp}.{name}.snapshot")
+                try:
+                    _snapshot_sqlite(path, snapshot_path)
+                    digests, file_hash = _store_chunks(snapshot_path, chunks_dir, stats)
+                    size = os.path.getsize(snapshot_path)
+                finally:
+                    if os.path.exists(snapshot_path):
+                        os.remove(snapshot_path)
+                files[name] = {'path': path, 'kind': 'sqlite', 'size': size, 'sha256': file_hash, 'chunks': digests}
+                continue
+
+            # ไฟล์ที่ขนาดและเวลาแก้ไขเท่าเดิมใช้รายชื่อบล็อกเดิมได้เลย (ไม่ต้องอ่านใหม่)
+            stat = os.stat(path)
+            old = previous['files'].get(name)
+            if old and old.get('kind') == 'file' and (old['size'], old.get('mtime_ns')) == (stat.st_size, stat.st_mtime_ns):
+                for digest in set(old['chunks']):
+                    os.utime(_chunk_path(chunks_dir, digest))
+                files[name] = dict(old, path=path)
+                continue
+            digests, file_hash, stat = _read_stable(path, chunks_dir, stats)
+            files[name] = {'path': path, 'kind': 'file', 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                           'sha256': file_hash, 'chunks': digests}
+
+        manifest = {
+            'timestamp': timestamp,
+            'created': now.strftime("%Y-%m-%d %H:%M:%S"),
+            'chunk_size': CHUNK_SIZE,
+            'size': sum(entry['size'] for entry in files.values()),
+            'stored': stats['stored'],
+            'new_chunks': stats['new_chunks'],
+            'files': files,
+        }
+        # manifest เขียนเป็นขั้นสุดท้าย: สำรองที่ทำไม่เสร็จจะไม่มี manifest (บล็อกที่ค้างถูกลบตอน cleanup)
+        _write_atomic(os.path.join(manifests_dir, f"{timestamp}.json"),
+                      json.dumps(manifest, ensure_ascii=False).encode("utf-8"))
+        logging.info(f"สำรองข้อมูลเรียบร้อย: {timestamp} ({manifest['size']} bytes, "
+                     f"เขียนใหม่ {stats['stored']} bytes / {stats['new_chunks']} บล็อก)")
+
         # ลบไฟล์สำรองเก่า (เก็บไว้ 7 วัน)
-        cleanup_old_backups()
-        
-        return True
-        
+        cleanup_old_backups(root=root)
+
+        return manifest
+
     except Exception as e:
         logging.error(f"เกิดข้อผิดพลาดในการสำรองข้อมูล: {str(e)}")
         return False
 
-def cleanup_old_backups():
+def cleanup_old_backups(max_age_days=MAX_AGE_DAYS, root=None, grace_seconds=3600):
     """
-    ลบไฟล์สำรองที่เก่ากว่า 7 วัน
+    ลบสำรองที่เก่ากว่า `max_age_days` วัน (ตามเวลาใน manifest และเก็บสำรองล่าสุดไว้เสมอ)
+    แล้วลบบล็อกที่ไม่มี manifest ใดอ้างถึง (mark & sweep) ยกเว้นบล็อกที่เพิ่งเขียน/ใช้ภายใน `grace_seconds`
     """
     try:
+        chunks_dir, manifests_dir = _backup_dirs(root)
+        if not os.path.isdir(manifests_dir):
+            return 0
         current_time = datetime.datetime.now()
-        for filename in os.listdir(PATHS['BACKUPS']):
-            filepath = os.path.join(PATHS['BACKUPS'], filename)
-            file_time = datetime.datetime.fromtimestamp(os.path.getctime(filepath))
-            
-            # ถ้าไฟล์เก่ากว่า 7 วัน
-            if (current_time - file_time).days > 7:
-                os.remove(filepath)
-                logging.info(f"ลบไฟล์สำรองเก่า: {filename}")
-                
+        names = sorted(name for name in os.listdir(manifests_dir) if name.endswith(".json"))
+        referenced = set()
+        removed = 0
+        for index, name in enumerate(names):
+            path = os.path.join(manifests_dir, name)
+            with open(path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            created = datetime.datetime.strptime(manifest['created'], "%Y-%m-%d %H:%M:%S")
+            if index < len(names) - 1 and (current_time - created).days > max_age_days:
+                os.remove(path)
+                removed += 1
+                logging.info(f"ลบไฟล์สำรองเก่า: {name}")
+                continue
+            for entry in manifest['files'].values():
+                referenced.update(entry['chunks'])
+
+        swept = 0
+        cutoff = current_time.timestamp() - grace_seconds
+        for prefix in os.listdir(chunks_dir) if os.path.isdir(chunks_dir) else ():
+            prefix_dir = os.path.join(chunks_dir, prefix)
+            for digest in os.listdir(prefix_dir):
+                chunk_path = os.path.join(prefix_dir, digest)
+                if digest not in referenced and os.path.getmtime(chunk_path) < cutoff:
+                    os.remove(chunk_path)
+                    swept += 1
+        if swept:
+            logging.info(f"ลบบล็อกที่ไม่ถูกใช้แล้ว {swept} บล็อก")
+        return removed
+
     except Exception as e:
         logging.error(f"เกิดข้อผิดพลาดในการลบไฟล์สำรองเก่า: {str(e)}")
+        return 0
+
+def _restore_file(entry, chunks_dir, target_path):
+    """ ประกอบไฟล์จากบล็อกลง `target_path` และตรวจ sha256 """
+    file_hash = hashlib.sha256()
+    with open(target_path, "wb") as f:
+        for digest in entry['chunks']:
+            with open(_chunk_path(chunks_dir, digest), "rb") as chunk:
+                block = zlib.decompress(chunk.read())
+            file_hash.update(block)
+            f.write(block)
+    if file_hash.hexdigest() != entry['sha256']:
+        raise ValueError(f"ข้อมูลสำรองของ {entry['path']} ไม่ตรงกับ checksum")
 
-def restore_backup(timestamp):
+def restore_backup(timestamp=None, root=None):
     """
-    กู้คืนข้อมูลจากไฟล์สำรอง
+    กู้คืนข้อมูลจากสำรอง (`timestamp` ตาม list_backups, ไม่ระบุ = สำรองล่าสุด)
+    ฐานข้อมูลกู้คืนด้วย SQLite backup API (ปลอดภัยแม้มี connection เปิดอยู่)
     """
     try:
-        # กู้คืน Q-Table
-        q_table_backup = os.path.join(PATHS['BACKUPS'], f"q_table_{timestamp}.json")
-        if os.path.exists(q_table_backup):
-            shutil.copy2(q_table_backup, SYSTEM_CONFIG['Q_TABLE_FILE'])
-            logging.info(f"กู้คืน Q-Table เรียบร้อย: {q_table_backup}")
-        
-        # กู้คืนฐานข้อมูล
-        db_backup = os.path.join(PATHS['BACKUPS'], f"q_table_{timestamp}.db")
-        if os.path.exists(db_backup):
-            shutil.copy2(db_backup, SYSTEM_CONFIG['DB_FILE'])
-            logging.info(f"กู้คืนฐานข้อมูลเรียบร้อย: {db_backup}")
-        
+        chunks_dir, manifests_dir = _backup_dirs(root)
+        if timestamp is None:
+            manifest = _latest_manifest(manifests_dir)
+            if manifest is None:
+                logging.error("ไม่มีข้อมูลสำรองให้กู้คืน")
+                return False
+        else:
+            with open(os.path.join(manifests_dir, f"{timestamp}.json"), encoding="utf-8") as f:
+                manifest = json.load(f)
+
+        for name, entry in manifest['files'].items():
+            tmp_path = entry['path'] + ".restore"
+            try:
+                _restore_file(entry, chunks_dir, tmp_path)
+                if entry['kind'] == 'sqlite':
+                    _snapshot_sqlite(tmp_path, entry['path'])
+                else:
+                    os.replace(tmp_path, entry['path'])
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            logging.info(f"กู้คืน {name} เรียบร้อย: {entry['path']} ({manifest['timestamp']})")
+
         return True
-        
+
     except Exception as e:
         logging.error(f"เกิดข้อผิดพลาดในการกู้คืนข้อมูล: {str(e)}")
         return False
 
-def list_backups():
+def list_backups(root=None):
     """
-    แสดงรายการไฟล์สำรองที่มี
+    แสดงรายการสำรองที่มี (ใหม่สุดก่อน) อ่านจาก manifest เท่านั้น
     """
     try:
+        _, manifests_dir = _backup_dirs(root)
+        if not os.path.isdir(manifests_dir):
+            return []
         backups = []
-        for filename in os.listdir(PATHS['BACKUPS']):
-            filepath = os.path.join(PATHS['BACKUPS'], filename)
-            file_time = datetime.datetime.fromtimestamp(os.path.getctime(filepath))
+        for filename in sorted((name for name in os.listdir(manifests_dir) if name.endswith(".json")), reverse=True):
+            with open(os.path.join(manifests_dir, filename), encoding="utf-8") as f:
+                manifest = json.load(f)
             backups.append({
                 'filename': filename,
-                'timestamp': file_time.strftime("%Y-%m-%d %H:%M:%S"),
-                'size': os.path.getsize(filepath)
+                'timestamp': manifest['timestamp'],
+                'created': manifest['created'],
+                'files': sorted(manifest['files']),
+                'size': manifest['size'],
+                'stored': manifest['stored'],
             })
         return backups
     except Exception as e:
         logging.error(f"เกิดข้อผิดพลาดในการดึงรายการสำรอง: {str(e)}")
-        return [] 
\ No newline at end of file
+        return []
@@ -0,0 +1,161 @@
+"""
+สภาพแวดล้อมแบบ batch: ฝึก K Episode ของ Grid ขนาดเดียวกัน (ตำแหน่ง E เดียวกัน) พร้อมกัน
+Grid ทั้งหมดอยู่ใน array uint8 ขนาด [K, rows, cols] วางอาคารด้วย fancy indexing
+คำนวณคะแนนด้วย score_batch และอัปเดต Q-Table ทีละชุดด้วย QTable.update_batch
+"""
+
+import time
+import logging
+from contextlib import nullcontext
+
+import numpy as np
+
+from grid_codec import CELL_CODES, ACTION_TYPES, CELL_BITS, SHAPE_BITS, encode_grid, pack_grid
+from reward_calculator import score_batch
+
+logger = logging.getLogger(__name__)
+
+ACTION_CODES = np.array([CELL_CODES[char] for char in ACTION_TYPES], dtype=np.uint8)
+EXPLORE_WEIGHTS = (0.5, 0.3, 0.2)  # ✅ ความน่าจะเป็นของ H, R, G ตอนสุ่ม (เหมือน choose_action)
+
+
+class BatchEnv:
+    """ ✅ K Episode ที่เดินไปพร้อมกัน: grids [K, rows, cols], done mask [K] และ key ของแต่ละ Grid
+
+    Episode ที่วางเต็มแล้ว (done) จะไม่ถูกเปลี่ยนอีกในขั้นต่อไป
+    """
+
+    def __init__(self, rows, cols, e_position, batch_size, rng=None):
+        self.rows, self.cols = rows, cols
+        self.size = rows * cols
+        self.e_position = e_position
+        self.batch_size = batch_size
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.reset()
+
+    def reset(self, grids=None):
+        """ ✅ เริ่ม Episode ใหม่ทั้งชุด จาก Grid ว่าง (วาง E) หรือจาก `grids` [K, rows, cols] ที่ส่งมา """
+        if grids is None:
+            grids = np.zeros((self.batch_size, self.rows, self.cols), dtype=np.uint8)
+        else:
+            grids = encode_grid(grids).copy()
+            self.batch_size = len(grids)
+        grids[(slice(None),) + tuple(self.e_position)] = CELL_CODES['E']
+        self.grids = grids
+        self.flat = grids.reshape(self.batch_size, self.size)  # ✅ view เดียวกับ grids
+        self.keys = [pack_grid(grid) for grid in grids]
+        self.done = ~self.empty_cells().any(axis=1)
+        return self.grids
+
+    def empty_cells(self):
+        """ ✅ bool [K, rows*cols] ช่องที่ยังว่าง """
+        return self.flat == CELL_CODES['0']
+
+    def random_actions(self, empty):
+        """ ✅ สุ่มช่องว่างหนึ่งช่องต่อ Episode และสุ่มประเภทอาคารตามน้ำหนัก EXPLORE_WEIGHTS """
+        priority = self.rng.random(empty.shape)
+        priority[~empty] = -1.0
+        cells = priority.argmax(axis=1)
+        kinds = self.rng.choice(len(ACTION_TYPES), size=len(empty), p=EXPLORE_WEIGHTS)
+        return cells * len(ACTION_TYPES) + kinds
+
+    def greedy_actions(self, matrix, empty):
+        """ ✅ Action ที่ค่า Q สูงสุดในช่องที่ยังว่างของแต่ละ Episode
+
+        คืน (actions [K], found [K]) โดย found = False เมื่อ state ยังไม่เคยเรียนรู้ หรือไม่มีค่า Q ของช่องว่างเลย
+        """
+        actions = np.zeros(len(empty), dtype=np.intp)
+        found = np.zeros(len(empty), dtype=bool)
+        if matrix is None:
+            return actions, found
+        slots = matrix.lookup_slots(self.keys)
+        seen = slots >= 0
+        if not seen.any():
+            return actions, found
+        q_values = np.where(np.repeat(empty[seen], len(ACTION_TYPES), axis=1), matrix.values[slots[seen]], -np.inf)
+        actions[seen] = q_values.argmax(axis=1)
+        found[seen] = q_values.max(axis=1) > -np.inf
+        return actions, found
+
+    def step(self, actions):
+        """ ✅ วางอาคารตาม `actions` (grid_codec.encode_action) ใน Episode ที่ยังไม่จบ
+
+        คืน (active, prev_keys, rewards): active = Episode ที่ขยับในขั้นนี้, prev_keys = key ก่อนวาง
+        และ rewards = คะแนนหลังวางของ Episode ที่ขยับ (เรียงตาม active)
+        """
+        active = np.flatnonzero(~self.done)
+        cells, kinds = np.divmod(np.asarray(actions)[active], len(ACTION_TYPES))
+        codes = ACTION_CODES[kinds]
+        self.flat[active, cells] = codes
+
+        prev_keys = [self.keys[i] for i in active.tolist()]
+        shifts = 2 * SHAPE_BITS + cells * CELL_BITS
+        for i, key, code, shift in zip(active.tolist(), prev_keys, codes.tolist(), shifts.tolist()):
+            self.keys[i] = key | (code << shift)  # ✅ ช่องเดิมว่าง (รหัส 0) จึงใส่ bit ได้เลย
+
+        rewards = score_batch(self.grids[active])
+        self.done[active] = ~self.empty_cells()[active].any(axis=1)
+        return active, prev_keys, rewards
+
+
+def train_batched(q_table, episodes, grid, e_position, batch_size=256, epsilon=None,
+                  alpha_schedule=None, gamma=0.9, lock=None, on_update=None, on_batch=None, seed=None):
+    """ ✅ ฝึกแบบ batch: K Episode พร้อมกันด้วยนโยบาย epsilon-greedy จาก Q-Table
+
+    - `epsilon(batch_index)` และ `alpha_schedule(episode)` กำหนดอัตราการสุ่ม/อัตราการเรียนรู้ (ค่าเริ่มต้น 0.1 คงที่)
+    - state ที่ยังไม่เคยเรียนรู้ใช้ Action สุ่ม (ไม่มีการค้นหาด้วยคะแนนทุกตัวเลือกแบบ choose_action)
+    - `lock` ถือไว้ระหว่างอัปเดต Q-Table, `on_update(changed)` ได้รับ list ของ (state_key, action_key) ที่เปลี่ยน
+    - `on_batch(batch_index)` ถูกเรียกหลังจบแต่ละ batch (นอก lock) เช่นตรวจหน่วยความจำ
+
+    คืน (best_grid uint8, best_score, episodes ต่อวินาที)
+    ถ้า `episodes` <= 0 คืน Grid ตั้งต้น (วาง E แล้ว) พร้อมคะแนนจริงของมัน
+    """
+    grid = encode_grid(grid)
+    rows, cols = grid.shape
+    rng = np.random.default_rng(seed)
+    lock = lock or nullcontext()
+    epsilon = epsilon or (lambda batch_index: 0.1)
+    alpha_schedule = alpha_schedule or (lambda episode: 0.1)
+
+    best_grid, best_score = None, float('-inf')
+    start_time = time.perf_counter()
+    env = BatchEnv(rows, cols, e_position, batch_size, rng)
+    if episodes <= 0:
+        seed_grid = env.reset(grid[np.newaxis])[0].copy()
+        return seed_grid, int(score_batch(seed_grid)[0]), 0.0
+
+    for batch_index, first_episode in enumerate(range(0, episodes, batch_size)):
+        k = min(batch_size, episodes - first_episode)
+        env.reset(np.broadcast_to(grid, (k, rows, cols)))
+        explore_rate = epsilon(batch_index)
+        alpha = alpha_schedule(first_episode)
+        # ✅ Episode ที่ไม่ขยับเลย (Grid ตั้งต้นไม่มีช่องว่าง) ได้คะแนนของ Grid ตั้งต้น
+        final_scores = np.full(k, score_batch(env.grids[:1])[0], dtype=np.int64)
+
+        while not env.done.all():
+            empty = env.empty_cells()
+            actions = env.random_actions(empty)
+            greedy, found = env.greedy_actions(q_table.matrix((rows, cols)), empty)
+            exploit = found & (rng.random(k) >= explore_rate)
+            actions[exploit] = greedy[exploit]
+
+            active, prev_keys, rewards = env.step(actions)
+            final_scores[active] = rewards
+            with lock:
+                changed = q_table.update_batch((rows, cols), prev_keys, np.asarray(actions)[active], rewards,
+                                               [env.keys[i] for i in active.tolist()], alpha, gamma)
+                if on_update:
+                    on_update(changed)
+
+        best = int(final_scores.argmax())
+        if final_scores[best] > best_score:
+            best_score = int(final_scores[best])
+            best_grid = env.grids[best].copy()
+        if on_batch:
+            on_batch(batch_index)
+
+    elapsed = time.perf_counter() - start_time
+    rate = episodes / elapsed if elapsed else float('inf')
+    logger.info("⚡ Batch training Grid %sx%s, E ที่ %s: %s episodes (K=%s) | %.0f episodes/sec | คะแนนสูงสุด %s",
+                rows, cols, e_position, episodes, batch_size, rate, best_score)
+    return best_grid, best_score, rate
@@ -0,0 +1,295 @@
+"""
+ชุดวัดความเร็วของฟังก์ชันคำนวณคะแนนและการฝึก AI
+ทุกชุดใช้ seed คงที่ ผลบันทึกเป็น JSON ได้ และเทียบกับผลครั้งก่อนเพื่อหาส่วนที่ช้าลง (regression)
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+
+import numpy as np
+
+from config import SYSTEM_CONFIG, RUN_MODES
+from grid_codec import CELL_CODES, decode_grid, encode_grid
+from reward_calculator import calculate_reward_verbose, count_r_clusters, score_batch
+from reward_cache import get_reward_cache
+import q_sync
+import q_table_store
+
+BENCH_SIZES = ((3, 3), (4, 4), (5, 5), (6, 6), (7, 7))
+
+def random_grids(n, rows, cols, seed=0):
+    """ ✅ สร้าง Grid สุ่มแบบ uint8 ขนาด [n, rows, cols] โดยกำหนด seed ได้ """
+    rng = np.random.default_rng(seed)
+    return rng.choice(np.array([0, 1, 2, 3, 4], dtype=np.uint8), size=(n, rows, cols),
+                      p=[0.1, 0.05, 0.4, 0.3, 0.15])
+
+def benchmark_score_batch(sizes=(1, 100, 10_000), rows=5, cols=5, seed=0):
+    """ ✅ เปรียบเทียบเวลา calculate_reward_verbose ทีละ Grid กับ score_batch ทั้งชุด """
+    results = []
+    for n in sizes:
+        grids = random_grids(n, rows, cols, seed)
+        char_grids = decode_grid(grids)
+
+        start = time.perf_counter()
+        expected = np.array([calculate_reward_verbose(g) for g in char_grids])
+        loop_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scores = score_batch(grids)
+        batch_time = time.perf_counter() - start
+
+        if not np.array_equal(scores, expected):
+            raise AssertionError(f"score_batch ไม่ตรงกับ calculate_reward_verbose (N={n})")
+
+        results.append({
+            'n': n,
+            'loop_time': loop_time,
+            'batch_time': batch_time,
+            'speedup': loop_time / batch_time if batch_time else float('inf'),
+        })
+    return results
+
+def time_call(fn, repeats=5, setup=None):
+    """ ✅ จับเวลา fn() `repeats` ครั้ง (เรียก setup() ก่อนทุกครั้งโดยไม่จับเวลา) คืน (best, median) วินาที """
+    times = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times), statistics.median(times)
+
+def partial_grids(n, rows, cols, seed=0, fill=0.5):
+    """ ✅ Grid uint8 ที่วางไปแล้วบางส่วน (E ที่มุมซ้ายบน) ใช้จำลอง state ระหว่าง Episode """
+    rng = np.random.default_rng(seed)
+    grids = rng.choice(np.array([2, 3, 4], dtype=np.uint8), size=(n, rows, cols), p=[0.5, 0.3, 0.2])
+    grids[rng.random((n, rows, cols)) >= fill] = CELL_CODES['0']
+    grids[:, 0, 0] = CELL_CODES['E']
+    return grids
+
+def random_transitions(n, rows, cols, seed=0):
+    """ ✅ (state, action, reward, next_state) สุ่มแบบ Grid ตัวอักษร สำหรับ update_q_table """
+    rng = random.Random(seed)
+    transitions = []
+    for grid in partial_grids(n, rows, cols, seed):
+        empty = np.argwhere(grid == CELL_CODES['0'])
+        if not len(empty):
+            continue
+        r, c = empty[rng.randrange(len(empty))].tolist()
+        char = rng.choice('HRG')
+        next_grid = grid.copy()
+        next_grid[r, c] = CELL_CODES[char]
+        transitions.append((decode_grid(grid), (r, c, char), rng.randint(-2000, 2000), decode_grid(next_grid)))
+    return transitions
+
+def fill_q_table(trainer, transitions):
+    """ ✅ ใส่ transition ลง Q-Table ใหม่ของ trainer (jecsu34) """
+    trainer.q_table = trainer.QTable()
+    for episode, (state, action, reward, next_state) in enumerate(transitions):
+        trainer.update_q_table(state, action, reward, next_state, episode)
+
+def benchmark_trainer(sizes=BENCH_SIZES, seed=0, repeats=5, samples=200, episodes=20):
+    """ ✅ วัดความเร็วของฟังก์ชันหลักในการฝึกทุกขนาด Grid ใน `sizes`
+
+    calculate_reward_verbose, count_r_clusters, choose_action, update_q_table (ต่อการเรียกหนึ่งครั้ง)
+    clean_q_table, load_q_table (ต่อ Q-Table ขนาด `samples` x 10 transition), prune_q_table (ส่วนของหนึ่ง Episode)
+    และ train_ai (ต่อ Episode)
+    ใช้ฐานข้อมูล Q-Table ชั่วคราว และโหมด fast (ไม่หน่วงเวลา) คืน {ชื่อ: {'seconds', 'median', 'unit'}}
+    ระหว่างวัด send_q_table_to_server ถูกแทนด้วยฟังก์ชันว่าง (ไม่ส่ง HTTP ไปเซิร์ฟเวอร์ใดๆ ผลจึงไม่ขึ้นกับเครือข่าย)
+    และ entry ที่เปลี่ยนถูกบันทึกกับ SyncClient ชั่วคราว
+    เมื่อจบ Q-Table, โหมด, config และ store/client ของ trainer กลับเป็นเหมือนก่อนเรียก (เรียกจาก process ที่ใช้งานอยู่ได้)
+    """
+    import jecsu34 as trainer
+
+    results = {}
+    db_file, sync_url = SYSTEM_CONFIG['DB_FILE'], SYSTEM_CONFIG['SYNC_SERVER_URL']
+    saved = {name: getattr(trainer, name) for name in ('q_table', 'q_pruner', 'memory_governor', 'send_q_table_to_server')}
+    run_mode = dict(trainer.run_mode)
+    reward_cache = get_reward_cache()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        SYSTEM_CONFIG['DB_FILE'] = os.path.join(tmp_dir, "bench_q_table.db")
+        SYSTEM_CONFIG['SYNC_SERVER_URL'] = "http://127.0.0.1:0/benchmark"  # ✅ ไม่ใส่ entry ของ benchmark ลง client จริง
+        trainer.send_q_table_to_server = lambda: None  # ✅ benchmark ทำงานแบบ offline
+        trainer.run_mode.update(RUN_MODES['fast'], NAME='fast')
+        logging.disable(logging.CRITICAL)  # ✅ ไม่นับเวลา/ข้อความของ logging
+        try:
+            for rows, cols in sizes:
+                shape = f"{rows}x{cols}"
+
+                def record(name, unit, count, fn, setup=None):
+                    random.seed(seed)
+                    np.random.seed(seed)
+                    best, median = time_call(fn, repeats, setup)
+                    results[f"{name}[{shape}]"] = {'seconds': best / count, 'median': median / count, 'unit': unit}
+
+                full = decode_grid(random_grids(samples, rows, cols, seed))
+                partial = partial_grids(samples, rows, cols, seed)
+                transitions = random_transitions(samples, rows, cols, seed)
+                table = random_transitions(samples * 10, rows, cols, seed)  # ✅ Q-Table ใหญ่พอให้จับเวลาได้นิ่ง
+
+                record("calculate_reward_verbose", "call", len(full),
+                       lambda: [calculate_reward_verbose(g) for g in full])
+                record("count_r_clusters", "call", len(full), lambda: [count_r_clusters(g) for g in full])
+                record("choose_action", "call", len(partial),
+                       lambda: [trainer.choose_action(g, (0, 0), epsilon=0.0) for g in partial],
+                       setup=reward_cache.clear)  # ✅ วัดแบบแคชว่างทุกรอบ
+                record("update_q_table", "call", len(transitions), lambda: fill_q_table(trainer, transitions))
+
+                record("clean_q_table", "table", 1, trainer.clean_q_table,
+                       setup=lambda: fill_q_table(trainer, table))
+
+                def prepare_prune():
+                    fill_q_table(trainer, table)
+                    trainer.get_q_pruner()  # ✅ วัดเฉพาะการตรวจหนึ่งช่วง ไม่รวมการสร้าง pruner
+                record("prune_q_table", "episode", 1, trainer.prune_q_table, setup=prepare_prune)
+
+                def save_table():
+                    fill_q_table(trainer, table)
+                    trainer.get_q_store().flush(trainer.q_table, trainer.q_table_lock)
+                record("load_q_table", "table", 1, trainer.load_q_table, setup=save_table)
+
+                start = encode_grid([['0'] * cols for _ in range(rows)])
+                record("train_ai", "episode", episodes, lambda: trainer.train_ai(episodes, start, (0, 0)),
+                       setup=lambda: (setattr(trainer, 'q_table', trainer.QTable()), reward_cache.clear()))
+        finally:
+            logging.disable(logging.NOTSET)
+            store = q_table_store._stores.pop((os.getpid(), SYSTEM_CONFIG['DB_FILE']), None)
+            if store is not None:
+                store.close()
+            q_sync._clients.pop((os.getpid(), SYSTEM_CONFIG['SYNC_SERVER_URL']), None)
+            SYSTEM_CONFIG['DB_FILE'], SYSTEM_CONFIG['SYNC_SERVER_URL'] = db_file, sync_url
+            for name, value in saved.items():
+                setattr(trainer, name, value)
+            trainer.run_mode.clear()
+            trainer.run_mode.update(run_mode)
+    return results
+
+def benchmark_environment(seed=0):
+    """ ✅ ข้อมูลเครื่องและเวอร์ชันที่บันทึกคู่กับผล (ผลจากเครื่องต่างกันเทียบกันตรงๆ ไม่ได้) """
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': seed,
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def save_results(results, path, seed=0):
+    """ ✅ บันทึกผลเป็น JSON: {'environment': ..., 'results': {ชื่อ: {'seconds', 'median', 'unit'}}} """
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({'environment': benchmark_environment(seed), 'results': results}, f, indent=2, ensure_ascii=False)
+
+def compare_results(baseline, current, threshold=0.20):
+    """ ✅ เทียบผลสองชุด (dict จาก save_results) ด้วยเวลาที่ดีที่สุด ('seconds')
+
+    คืน list ของ dict: name, baseline, current, ratio (current / baseline) และ status
+    'regression' เมื่อช้าลงเกิน `threshold` (0.20 = 20%), 'improved' เมื่อเร็วขึ้นเกิน threshold, นอกนั้น 'ok'
+    """
+    rows = []
+    for name, base in baseline['results'].items():
+        if name not in current['results']:
+            continue
+        ratio = current['results'][name]['seconds'] / base['seconds'] if base['seconds'] else float('inf')
+        status = 'regression' if ratio > 1 + threshold else 'improved' if ratio < 1 - threshold else 'ok'
+        rows.append({'name': name, 'baseline': base['seconds'], 'current': current['results'][name]['seconds'],
+                     'ratio': ratio, 'status': status})
+    return rows
+
+def parse_size(text):
+    rows, cols = text.lower().split('x')
+    return int(rows), int(cols)
+
+IMPORT_PROBE = "import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+
+def benchmark_import_time(modules=("jecsun", "jecsu34"), repeats=5):
+    """ ✅ เวลา import แต่ละโมดูลใน Python process ใหม่ (cold start เหมือน Dashboard / worker process)
+
+    จับเวลาเฉพาะคำสั่ง import (ไม่รวมเวลาเปิด interpreter) คืน list ของ dict: module, best, median (วินาที)
+    ถ้า import ไม่สำเร็จ best / median เป็น None และ 'error' คือบรรทัดสุดท้ายของ stderr (ไม่หยุดวัดโมดูลอื่น)
+    """
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for module in modules:
+        times = []
+        error = None
+        for _ in range(repeats):
+            process = subprocess.run([sys.executable, "-c", IMPORT_PROBE.format(module=module)], cwd=repo_dir,
+                                     capture_output=True, text=True)
+            if process.returncode != 0:
+                error = (process.stderr.strip().splitlines() or [f"exit code {process.returncode}"])[-1]
+                break
+            times.append(float(process.stdout.strip().splitlines()[-1]))
+        if error:
+            results.append({'module': module, 'best': None, 'median': None, 'error': error})
+        else:
+            results.append({'module': module, 'best': min(times), 'median': statistics.median(times)})
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ชุดวัดความเร็ว")
+    commands = parser.add_subparsers(dest="command")
+    run = commands.add_parser("run", help="วัดความเร็วการฝึก AI แล้วบันทึก JSON")
+    run.add_argument("--sizes", nargs="+", type=parse_size, default=list(BENCH_SIZES), help="เช่น 3x3 5x5")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--repeats", type=int, default=5)
+    run.add_argument("--episodes", type=int, default=20, help="จำนวน Episode ของ train_ai ต่อรอบ")
+    run.add_argument("--output", default="bench_results.json")
+    run.add_argument("--baseline", default=None, help="ไฟล์ผลเดิม: เทียบทันทีหลังวัดเสร็จ")
+    run.add_argument("--threshold", type=float, default=0.20)
+    compare = commands.add_parser("compare", help="เทียบไฟล์ผลสองไฟล์")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.20)
+    args = parser.parse_args(argv)
+
+    if args.command is None:
+        print("📊 score_batch vs calculate_reward_verbose (Grid 5x5)")
+        for result in benchmark_score_batch():
+            print(f"   N={result['n']:>6} | loop: {result['loop_time']:.4f} s | "
+                  f"batch: {result['batch_time']:.4f} s | เร็วขึ้น {result['speedup']:.1f}x")
+        print("📊 เวลา import (process ใหม่)")
+        for result in benchmark_import_time():
+            if result.get('error'):
+                print(f"   {result['module']:<10} | ❌ import ไม่สำเร็จ: {result['error']}")
+                continue
+            print(f"   {result['module']:<10} | best: {result['best'] * 1000:.1f} ms | median: {result['median'] * 1000:.1f} ms")
+        return 0
+
+    if args.command == "run":
+        results = benchmark_trainer(args.sizes, args.seed, args.repeats, episodes=args.episodes)
+        save_results(results, args.output, args.seed)
+        print(f"📊 บันทึกผล {len(results)} รายการที่ {args.output}")
+        for name, result in results.items():
+            print(f"   {name:<32} | {result['seconds'] * 1e6:>12.1f} µs/{result['unit']}")
+        if not args.baseline:
+            return 0
+        baseline_path, current_path = args.baseline, args.output
+    else:
+        baseline_path, current_path = args.baseline, args.current
+
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(current_path, encoding="utf-8") as f:
+        current = json.load(f)
+    rows = compare_results(baseline, current, args.threshold)
+    icons = {'regression': '❌', 'improved': '✅', 'ok': '  '}
+    for row in rows:
+        print(f"{icons[row['status']]} {row['name']:<32} | {row['baseline'] * 1e6:>12.1f} → "
+              f"{row['current'] * 1e6:>12.1f} µs | x{row['ratio']:.2f}")
+    regressions = [row for row in rows if row['status'] == 'regression']
+    print(f"\n{len(regressions)} regression(s) (threshold {args.threshold:.0%})")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,7 +15,18 @@ AI_CONFIG = {
     'GAMMA': 0.9,
     'EPSILON_START': 0.7,
     'EPSILON_END': 0.01,
-    'EPSILON_DECAY': 0.95
+    'EPSILON_DECAY': 0.95,
+    'RUN_MODE': 'demo',  # 'demo' = แสดงทุกขั้นตอนพร้อมหน่วงเวลา, 'fast' = ฝึกจริงแบบเงียบ
+    'PROGRESS_INTERVAL': 100,  # รายงานความเร็ว (episodes/sec) ทุกกี่ Episodes
+    'USE_SYMMETRY': False,  # รวม state ที่เป็นภาพกลับด้าน/หมุน 180° ของกันไว้ใน key เดียว
+    'NUM_WORKERS': None,  # จำนวน process สำหรับฝึกแบบขนาน (None = ใช้ทุก core, สูงสุด cpu_count())
+    'BATCH_SIZE': None  # จำนวน Episode ที่ฝึกพร้อมกันด้วย batch_env (None = ฝึกทีละ Episode ด้วย train_ai)
+}
+
+# ตั้งค่าโหมดการทำงาน (เลือกผ่าน AI_CONFIG['RUN_MODE'] หรือ --mode ตอนรันโปรแกรม)
+RUN_MODES = {
+    'demo': {'LOG_LEVEL': 'DEBUG', 'STEP_DELAY': 0.1, 'EPISODE_DELAY': 0.5},
+    'fast': {'LOG_LEVEL': 'INFO', 'STEP_DELAY': 0.0, 'EPISODE_DELAY': 0.0}
 }
 
 # ตั้งค่าขนาด Grid ที่รองรับ
@@ -27,7 +38,12 @@ SYSTEM_CONFIG = {
     'BACKUP_INTERVAL': 3600,  # ตั้งเวลาสำรองข้อมูล (1 ชั่วโมง)
     'LOG_LEVEL': 'INFO',      # ระดับการบันทึก
     'Q_TABLE_FILE': "q_table.json",  # ไฟล์เก็บ Q-Table
-    'DB_FILE': "q_table.db"   # ไฟล์ฐานข้อมูล
+    'DB_FILE': "q_table.db",   # ไฟล์ฐานข้อมูล
+    'MAP_INDEX_FILE': "map_index.db",  # ดัชนี Grid จาก CSV พร้อมคะแนนที่คำนวณไว้
+    'REWARD_CACHE_SIZE': 200_000,  # จำนวนคะแนนของ Grid ที่แคชไว้ต่อ process (LRU)
+    'OPTIMAL_LAYOUTS_FILE': "optimal_layouts.db",  # ตารางผังที่ดีที่สุดจาก layout_solver
+    'LAYOUT_ARTIFACT_FILE': "optimal_layouts.npz",  # ไฟล์ผังที่ดีที่สุดสำหรับ Dashboard (สร้างด้วย layout_artifact.py)
+    'SYNC_SERVER_URL': "http://127.0.0.1:5000/update_q_table"  # เซิร์ฟเวอร์ที่รับ Q-Table แบบ delta (q_sync)
 }
 
 # ตั้งค่าเส้นทางไฟล์
@@ -46,6 +62,11 @@ GAMMA = AI_CONFIG['GAMMA']
 EPSILON_START = AI_CONFIG['EPSILON_START']
 EPSILON_END = AI_CONFIG['EPSILON_END']
 EPSILON_DECAY = AI_CONFIG['EPSILON_DECAY']
+RUN_MODE = AI_CONFIG['RUN_MODE']
+PROGRESS_INTERVAL = AI_CONFIG['PROGRESS_INTERVAL']
+USE_SYMMETRY = AI_CONFIG['USE_SYMMETRY']
+NUM_WORKERS = AI_CONFIG['NUM_WORKERS']
+BATCH_SIZE = AI_CONFIG['BATCH_SIZE']
 
 SCORES = get_scores_config()
 grid_sizes = GRID_SIZES
@@ -1,13 +1,16 @@
 import logging
 import os
 
-def setup_logging():
+def setup_logging(level='INFO'):
     """
     ตั้งค่าระบบ logging สำหรับโปรแกรม
     - สร้างไฟล์ log ในโฟลเดอร์ logs
-    - ตั้งระดับการบันทึกเป็น INFO
+    - ตั้งระดับการบันทึกตาม `level` (ค่าเริ่มต้น INFO, โหมด demo ใช้ DEBUG)
     - กำหนดรูปแบบการบันทึก
     """
+    if isinstance(level, str):
+        level = getattr(logging, level.upper(), logging.INFO)
+
     # สร้างโฟลเดอร์ logs ถ้ายังไม่มี
     if not os.path.exists('logs'):
         os.makedirs('logs')
@@ -15,16 +18,23 @@ def setup_logging():
     # ตั้งค่า logging
     logging.basicConfig(
         filename='logs/ai_village.log',
-        level=logging.INFO,
+        level=level,
         format='%(asctime)s - %(levelname)s - %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
     
-    # เพิ่มการแสดงผลในคอนโซลด้วย
+    root_logger = logging.getLogger('')
+    root_logger.setLevel(level)
+
+    # เพิ่มการแสดงผลในคอนโซลด้วย (ครั้งเดียว ถ้าเรียกซ้ำจะไม่เพิ่ม handler ซ้ำ)
+    for handler in root_logger.handlers:
+        if type(handler) is logging.StreamHandler:
+            handler.setLevel(level)
+            return
     console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
+    console_handler.setLevel(level)
     formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
     console_handler.setFormatter(formatter)
-    logging.getLogger('').addHandler(console_handler)
+    root_logger.addHandler(console_handler)
     
     logging.info("ระบบ Logging เริ่มทำงาน") 
\ No newline at end of file
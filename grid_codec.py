@@ -0,0 +1,84 @@
+"""
+ตัวแปลง Grid ระหว่างตัวอักษร ('0', 'E', 'H', 'R', 'G', 'X') กับรหัสจำนวนเต็มขนาดเล็ก
+และ key แบบบีบอัด (3 bits ต่อช่อง) สำหรับใช้เป็น key ของ Q-Table
+"""
+
+import numpy as np
+
+# ✅ รหัสของแต่ละช่อง (ใช้ได้ไม่เกิน 3 bits ต่อช่อง)
+CELL_CODES = {'0': 0, 'E': 1, 'H': 2, 'R': 3, 'G': 4, 'X': 5}
+CODE_TO_CELL = np.array(['0', 'E', 'H', 'R', 'G', 'X'])
+UNKNOWN_CODE = CELL_CODES['X']  # ✅ ค่าที่ไม่รู้จักถือเป็น 'X' (ไม่มีคะแนนและไม่เข้า Pattern ใด)
+
+# ✅ ประเภทอาคารที่ AI วางได้ (ลำดับนี้ใช้ในการเข้ารหัส Action)
+ACTION_TYPES = ('H', 'R', 'G')
+
+CELL_BITS = 3
+SHAPE_BITS = 3  # ✅ รองรับ Grid สูงสุด 7x7
+
+def encode_grid(grid):
+    """ ✅ แปลง Grid ตัวอักษร (list หรือ array กี่มิติก็ได้) เป็น uint8 array """
+    grid = np.asarray(grid)
+    if grid.dtype == np.uint8:
+        return grid
+    grid = grid.astype(str)
+    codes = np.full(grid.shape, UNKNOWN_CODE, dtype=np.uint8)
+    for cell, code in CELL_CODES.items():
+        codes[grid == cell] = code
+    return codes
+
+def decode_grid(codes):
+    """ ✅ แปลง uint8 array กลับเป็น Grid ตัวอักษร """
+    return CODE_TO_CELL[np.asarray(codes)]
+
+def pack_grid(grid):
+    """ ✅ บีบอัด Grid เป็น int เดียว: 3 bits ต่อช่อง + ขนาด Grid ใน 6 bits ล่างสุด
+
+    key เป็น int ธรรมดาของ Python จึง hash และเปรียบเทียบได้เร็ว และใช้หน่วยความจำ
+    น้อยกว่า tuple ของ tuple ของ string หลายเท่า
+    """
+    codes = encode_grid(grid)
+    rows, cols = codes.shape
+    key = 0
+    for code in codes.ravel()[::-1].tolist():
+        key = (key << CELL_BITS) | code
+    return (key << (2 * SHAPE_BITS)) | (rows << SHAPE_BITS) | cols
+
+def key_shape(key):
+    """ ✅ ดึงขนาด Grid (rows, cols) ออกจาก key """
+    return (key >> SHAPE_BITS) & 0b111, key & 0b111
+
+def unpack_grid(key):
+    """ ✅ แปลง key กลับเป็น uint8 array """
+    rows, cols = key_shape(key)
+    key >>= 2 * SHAPE_BITS
+    codes = np.empty(rows * cols, dtype=np.uint8)
+    for i in range(rows * cols):
+        codes[i] = key & 0b111
+        key >>= CELL_BITS
+    return codes.reshape(rows, cols)
+
+def key_set_cell(key, r, c, char):
+    """ ✅ คืน key ของ Grid เดิมที่เปลี่ยนช่อง (r, c) เป็น `char` โดยไม่ต้องบีบอัดใหม่ทั้ง Grid """
+    _, cols = key_shape(key)
+    shift = 2 * SHAPE_BITS + (r * cols + c) * CELL_BITS
+    code = CELL_CODES.get(char, UNKNOWN_CODE)
+    return (key & ~(0b111 << shift)) | (code << shift)
+
+def key_to_bytes(key):
+    """ ✅ แปลง key เป็น bytes สำหรับเก็บใน SQLite (BLOB) """
+    return key.to_bytes((key.bit_length() + 7) // 8 or 1, 'little')
+
+def key_from_bytes(data):
+    """ ✅ แปลง bytes จาก SQLite กลับเป็น key """
+    return int.from_bytes(data, 'little')
+
+def encode_action(r, c, char, cols):
+    """ ✅ เข้ารหัส Action (r, c, อาคาร) เป็น int: (ตำแหน่งช่อง * 3) + ประเภทอาคาร """
+    return (r * cols + c) * len(ACTION_TYPES) + ACTION_TYPES.index(char)
+
+def decode_action(action, cols):
+    """ ✅ แปลง Action ที่เข้ารหัสกลับเป็น (r, c, อาคาร) """
+    cell, kind = divmod(action, len(ACTION_TYPES))
+    r, c = divmod(cell, cols)
+    return r, c, ACTION_TYPES[kind]
@@ -0,0 +1,109 @@
+"""
+โครงสร้างของ Grid ที่คำนวณไว้ล่วงหน้าต่อขนาด (rows, cols)
+เพื่อนบ้าน 4 ทิศ, ช่องขอบ, ลำดับ BFS จากตำแหน่ง E และหน้าต่าง Pattern
+ทุกฟังก์ชันที่ใช้ Grid ขนาดเดียวกันจะใช้ตารางชุดเดียวกัน ไม่ต้องเช็คขอบเขตซ้ำในลูป
+"""
+
+from collections import deque
+from functools import lru_cache
+
+import numpy as np
+
+# ✅ ทิศทางเพื่อนบ้าน (บน, ล่าง, ซ้าย, ขวา) ลำดับนี้กำหนดลำดับ BFS
+DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+# ✅ หน้าต่าง Pattern: แนวนอน 1x3 ('h') และแนวตั้ง 3x1 ('v')
+WINDOW_STEPS = {'h': (0, 1), 'v': (1, 0)}
+
+
+class GridTopology:
+    """ ✅ ตารางตำแหน่งของ Grid ขนาดหนึ่ง (ใช้ผ่าน get_topology เท่านั้น จะได้ใช้ซ้ำ)
+
+    ตำแหน่งช่องใช้ index แบบแบน i = r * cols + c ทั้งหมด
+    array ที่ต้องเติมให้ยาวเท่ากันใช้ index `size` (หนึ่งช่องหลังช่องสุดท้าย) เป็นช่องว่างสำรอง
+    """
+
+    def __init__(self, rows, cols):
+        self.rows, self.cols = rows, cols
+        self.size = size = rows * cols
+
+        # ✅ เพื่อนบ้าน 4 ทิศของแต่ละช่อง
+        self.neighbors = tuple(
+            tuple((r + dr) * cols + (c + dc) for dr, dc in DIRECTIONS
+                  if 0 <= r + dr < rows and 0 <= c + dc < cols)
+            for r in range(rows) for c in range(cols)
+        )
+        self.neighbor_cells = tuple(tuple(divmod(n, cols) for n in nbrs) for nbrs in self.neighbors)
+        self.neighbor_index = self._padded(self.neighbors, len(DIRECTIONS))
+
+        # ✅ ช่องที่อยู่ในระยะ 2 ช่องตามแนวตรง (ใช้ตรวจบ้านที่ห่างถนนไม่เกิน 1 ช่อง)
+        self.reach2_index = self._padded([
+            [(r + dr * k) * cols + (c + dc * k) for k in (1, 2) for dr, dc in DIRECTIONS
+             if 0 <= r + dr * k < rows and 0 <= c + dc * k < cols]
+            for r in range(rows) for c in range(cols)
+        ], 2 * len(DIRECTIONS))
+
+        # ✅ ช่องขอบ
+        self.edge_mask = np.zeros((rows, cols), dtype=bool)
+        self.edge_mask[[0, -1], :] = True
+        self.edge_mask[:, [0, -1]] = True
+        self.edge_mask.setflags(write=False)
+        self.is_edge = tuple(self.edge_mask.ravel().tolist())
+        self.edge_positions = tuple((r, c) for r in range(rows) for c in range(cols) if self.edge_mask[r, c])
+
+        # ✅ หน้าต่าง Pattern: array [W, 3] ต่อทิศ และ tuple ('h'|'v', a, b, c) สำหรับลูปแบบเพิ่มทีละช่อง
+        self.window_index = {}
+        self.windows = []
+        for direction, (dr, dc) in WINDOW_STEPS.items():
+            cells = [
+                tuple((r + dr * k) * cols + (c + dc * k) for k in range(3))
+                for r in range(rows - 2 * dr) for c in range(cols - 2 * dc)
+            ]
+            self.window_index[direction] = np.array(cells, dtype=np.intp).reshape(-1, 3)
+            self.window_index[direction].setflags(write=False)
+            self.windows.extend((direction,) + cell for cell in cells)
+        self.windows = tuple(self.windows)
+        cell_windows = [[] for _ in range(size)]
+        for window in self.windows:
+            for i in window[1:]:
+                cell_windows[i].append(window)
+        self.cell_windows = tuple(tuple(windows) for windows in cell_windows)
+
+    def _padded(self, lists, width):
+        """ ✅ แปลง list ของ index ที่ยาวไม่เท่ากันเป็น array [size, width] เติมด้วยช่องสำรอง """
+        index = np.full((self.size, width), self.size, dtype=np.intp)
+        for i, items in enumerate(lists):
+            index[i, :len(items)] = items
+        index.setflags(write=False)
+        return index
+
+    def bfs_order(self, e_position):
+        """ ✅ ลำดับช่อง (index แบบแบน) ที่ BFS เดินถึงเมื่อเริ่มจากตำแหน่ง E """
+        return _bfs_order(self, tuple(e_position))
+
+    def pad(self, flat, fill=False):
+        """ ✅ เติมช่องสำรองท้าย array แบน [..., size] ให้ใช้กับ neighbor_index / reach2_index ได้ """
+        flat = np.asarray(flat)
+        pad_width = [(0, 0)] * (flat.ndim - 1) + [(0, 1)]
+        return np.pad(flat, pad_width, constant_values=fill)
+
+
+@lru_cache(maxsize=None)
+def get_topology(rows, cols):
+    """ ✅ คืน GridTopology ของขนาด (rows, cols) (สร้างครั้งเดียวต่อขนาด) """
+    return GridTopology(rows, cols)
+
+@lru_cache(maxsize=None)
+def _bfs_order(topology, e_position):
+    r, c = e_position
+    start = r * topology.cols + c
+    order = [start]
+    seen = {start}
+    queue = deque(order)
+    while queue:
+        for n in topology.neighbors[queue.popleft()]:
+            if n not in seen:
+                seen.add(n)
+                order.append(n)
+                queue.append(n)
+    return tuple(order)
@@ -3,39 +3,41 @@
 # =========================================================
 
 # ✅ Import ไลบรารีมาตรฐาน
-import os
-import sys
 import json
 import time
 import copy
-import glob
-import shutil
+import logging
+import argparse
 import random
-import hashlib
 import sqlite3
 import threading
 import multiprocessing
-from collections import deque, defaultdict
-from concurrent.futures import ThreadPoolExecutor
-from multiprocessing import Pool, cpu_count
+from collections import Counter
+from multiprocessing import cpu_count
 
-# ✅ Import ไลบรารีจาก third-party
+# ✅ Import ไลบรารีจาก third-party (flask / requests import เมื่อใช้งานจริงใน create_app / send_q_table_to_server
+# เพื่อให้ import โมดูลนี้ (เช่นใน worker process) เร็ว)
 import numpy as np
-import pandas as pd
-import requests
-import psutil
-import heapq
-from tabulate import tabulate
-from filelock import FileLock
-from flask import Flask, request, jsonify
-from scipy.ndimage import label
 
 # ✅ Import โมดูลภายในโปรเจกต์
 from memory_utils import *
 from error_handling import *
 from backup_utils import *
-from validation_utils import *
+from validation_utils import validate_grid, validate_grid_size
 from reward_calculator import *
+from grid_codec import (
+    CELL_CODES, encode_grid, decode_grid, pack_grid, key_set_cell,
+    encode_action, decode_action
+)
+from grid_topology import get_topology
+from reward_cache import get_reward_cache, log_cache_stats
+from q_matrix import QTable
+from batch_env import train_batched
+from symmetry_utils import canonicalize, canonical_state_action, restore_action
+from map_index import get_map_index, scorer_version
+from q_table_store import get_q_store
+from q_pruner import QTablePruner
+from q_sync import SYNC_PATH, SyncServer, get_sync_client
 
 # =========================================================
 # 📌 2️⃣ กำหนดค่าพื้นฐานสำหรับการทำงานของ AI
@@ -45,40 +47,45 @@ from reward_calculator import *
 from config import (
     EPISODES, ALPHA_START, ALPHA_END, ALPHA_DECAY_RATE,
     GAMMA, EPSILON_START, EPSILON_END, EPSILON_DECAY
-    , grid_sizes, Q_TABLE_FILE
+    , grid_sizes, Q_TABLE_FILE, RUN_MODE, RUN_MODES, PROGRESS_INTERVAL,
+    USE_SYMMETRY, NUM_WORKERS, BATCH_SIZE, SYSTEM_CONFIG
 )
+from config_logging import setup_logging
 
 SCORES = get_scores_config()
 
-conn = sqlite3.connect("q_table.db", check_same_thread=False)
-cursor = conn.cursor()
+logger = logging.getLogger(__name__)
+
+# ✅ โหมดการทำงานปัจจุบัน ('demo' หรือ 'fast') เปลี่ยนได้ด้วย set_run_mode()
+run_mode = dict(RUN_MODES[RUN_MODE], NAME=RUN_MODE)
+
+def set_run_mode(mode):
+    """ ✅ เลือกโหมดการทำงาน: ตั้งระดับ logging และเวลาหน่วงตาม config.RUN_MODES """
+    if mode not in RUN_MODES:
+        raise CustomError(f"ไม่รู้จักโหมด {mode} (รองรับ: {', '.join(RUN_MODES)})")
+    run_mode.clear()
+    run_mode.update(RUN_MODES[mode], NAME=mode)
+    setup_logging(run_mode['LOG_LEVEL'])
 
 q_table_lock = threading.Lock()  # ✅ ใช้ Lock ป้องกันปัญหาการอัปเดตพร้อมกัน
-LOCK_FILE = "q_table.lock"  # ✅ ใช้ Lock ป้องกันการเขียนไฟล์ซ้อนกัน
-# 🔹 ใช้ Lock ป้องกันไฟล์เสียหายจากการเขียนพร้อมกัน
 
 last_load_time = time.time()
 last_update_time = time.time() 
-last_q_table_hash = ""
 # 🔹 เก็บเวลาอัปเดตล่าสุด
 
-q_table = {}
+q_table = QTable()
 # 🔹 สร้างตัวแปร Q-Table (ต้องมาก่อน load_q_table)
+# 🔹 เก็บเป็น matrix float32 ต่อขนาด Grid (q_matrix) พร้อมจำนวนครั้งที่อัปเดตแต่ละ (state, action)
+# 🔹 บันทึกลงดิสก์ผ่าน q_table_store (get_q_store) เฉพาะ entry ที่เปลี่ยน
 
-conn = sqlite3.connect("q_table.db", check_same_thread=False)
-cursor = conn.cursor()
+track_changes = True
+# 🔹 worker process ของการฝึกแบบขนานปิดไว้ (ไม่บันทึกลงดิสก์เอง ส่ง delta กลับให้ process หลัก)
+memory_governor = None  # ✅ สร้างเมื่อใช้ครั้งแรก (get_memory_governor)
+memory_budget = None  # ✅ งบหน่วยความจำของ process นี้ (None = MAX_MEMORY_USAGE, worker ได้ส่วนแบ่งจาก train_ai_parallel)
+q_pruner = None  # ✅ สร้างเมื่อใช้ครั้งแรก (get_q_pruner)
 
-# ✅ วนลูป Q-Table เพื่อดึงค่า state, action, q_value
-for state, actions in q_table.items():
-    for action, q_value in actions.items():
-        cursor.execute("INSERT OR REPLACE INTO q_table (state_key, action_key, q_value) VALUES (?, ?, ?)",
-                       (str(state), str(action), q_value))
-
-conn.commit()
-conn.close()
-
-app = Flask(__name__)  # ✅ สร้าง Flask Application
-@app.route('/update_q_table', methods=['POST'])
+policy_stats = Counter()
+# 🔹 นับว่า choose_action ใช้ทางไหน: 'greedy' (Q-Table), 'search' (ค้นหาด้วยคะแนน), 'explore' (สุ่ม)
 
 # =========================================================
 # 📌 3️⃣ ฟังก์ชันเกี่ยวกับ Grid (การสร้าง, โหลด, และให้คะแนน)
@@ -86,36 +93,34 @@ app = Flask(__name__)  # ✅ สร้าง Flask Application
 @handle_errors
 def load_or_create_grid(rows, cols, e_position=(1, 1), csv_folder="data/maps/CSV/goodcsv"):
     """ ✅ โหลด Grid จากไฟล์ CSV หรือสร้างใหม่ถ้าไม่มี """
-    print(f"\n🔹 [STEP] กำลังโหลด/สร้าง Grid ขนาด {rows}x{cols}, วาง `E` ที่ {e_position}")
+    logger.info("🔹 [STEP] กำลังโหลด/สร้าง Grid ขนาด %sx%s, วาง `E` ที่ %s", rows, cols, e_position)
     
     # ✅ ตรวจสอบขนาด Grid
     if not validate_grid_size((rows, cols)):
         raise CustomError(f"ขนาด Grid {rows}x{cols} ไม่รองรับ")
     
-    csv_files = glob.glob(f"{csv_folder}/**/*.csv", recursive=True)
     best_grid = None
     best_score = float('-inf')
 
-    # ✅ ตรวจสอบไฟล์ CSV ทั้งหมด
-    for file in csv_files:
-        df = pd.read_csv(file, header=None)
-        if df.shape == (rows, cols) and 'E' in df.values:
-            grid_from_csv = df.astype(str).values.tolist()
-            
-            # ✅ ตรวจสอบความถูกต้องของ Grid
-            if validate_grid(grid_from_csv):
-                score = calculate_reward_verbose(grid_from_csv)
-                if score > best_score:
-                    best_score = score
-                    best_grid = grid_from_csv
+    # ✅ ค้นจากดัชนีแผนที่ (อ่าน/ให้คะแนนเฉพาะ CSV ที่เพิ่มหรือแก้ไขใหม่) เรียงจากคะแนนสูงสุด
+    map_index = get_map_index()
+    map_index.refresh(csv_folder)
+    version = scorer_version(get_scores_config(), calculate_reward_verbose)
+    for grid_from_csv, score in map_index.best_maps(rows, cols, scorer="reward_calculator",
+                                                    score_fn=calculate_reward_verbose, version=version):
+        # ✅ ตรวจสอบความถูกต้องของ Grid
+        if validate_grid(grid_from_csv):
+            best_score = score
+            best_grid = grid_from_csv
+            break
 
     if best_grid is not None:
-        print(f"✅ โหลด Grid ที่ดีที่สุดจาก CSV (คะแนน: {best_score})")
-        print_grid(best_grid)
+        logger.info("✅ โหลด Grid ที่ดีที่สุดจาก CSV (คะแนน: %s)", best_score)
+        log_grid(best_grid, logging.INFO)
         return best_grid
 
     # ✅ ถ้าไม่มี Grid ที่เหมาะสม สร้างใหม่
-    print(f"⚠️ ไม่มี Grid ที่เหมาะสม สร้างใหม่ {rows}x{cols}")
+    logger.info("⚠️ ไม่มี Grid ที่เหมาะสม สร้างใหม่ %sx%s", rows, cols)
     grid = [['0' for _ in range(cols)] for _ in range(rows)]
     r, c = min(e_position[0], rows-1), min(e_position[1], cols-1)
     grid[r][c] = 'E'
@@ -124,19 +129,13 @@ def load_or_create_grid(rows, cols, e_position=(1, 1), csv_folder="data/maps/CSV
     if not validate_grid(grid):
         raise CustomError("ไม่สามารถสร้าง Grid ที่ถูกต้องได้")
     
-    print(f"✅ Grid ถูกสร้างขึ้นใหม่ พร้อมวาง `E` ที่ {e_position}")
-    print_grid(grid)
+    logger.info("✅ Grid ถูกสร้างขึ้นใหม่ พร้อมวาง `E` ที่ %s", e_position)
+    log_grid(grid, logging.INFO)
     return grid
 
 def get_edge_positions(rows, cols):
-    """ ✅ คืนค่าตำแหน่งขอบของ Grid โดยป้องกันค่าเกินขอบเขต """
-    edge_positions = []
-    for r in range(rows):
-        for c in range(cols):
-            if r == 0 or r == rows - 1 or c == 0 or c == cols - 1:
-                if 0 <= r < rows and 0 <= c < cols:  # ✅ เช็คก่อนบันทึก
-                    edge_positions.append((r, c))
-    return edge_positions
+    """ ✅ คืนค่าตำแหน่งขอบของ Grid (จากตาราง grid_topology) """
+    return list(get_topology(rows, cols).edge_positions)
 
 def train_grid_size(grid_size):
     """ ✅ ฝึก AI สำหรับขนาด Grid ที่กำหนด """
@@ -160,41 +159,39 @@ def train_grid_size(grid_size):
 # 📌 4️⃣ ฟังก์ชันเกี่ยวกับ Q-Table (โหลด, อัปเดต, และส่งไปเซิร์ฟเวอร์)
 # =========================================================
 def load_q_table():
-    """ ✅ โหลด Q-Table จากฐานข้อมูล SQLite อย่างปลอดภัย """
+    """ ✅ โหลด Q-Table จากฐานข้อมูล SQLite อย่างปลอดภัย (ตาราง q_table รูปแบบเก่าจะถูกย้ายให้อัตโนมัติ) """
     global q_table
-    q_table = {}
+    q_table = QTable()
 
     try:
-        conn = sqlite3.connect("q_table.db", check_same_thread=False)
-        cursor = conn.cursor()
-        cursor.execute("SELECT state_key, action_key, q_value FROM q_table")
-        rows = cursor.fetchall()
-        conn.close()
+        q_table = get_q_store().load()
+        logger.info("✅ [AI] Q-Table Loaded from SQLite: %s states", len(q_table))
 
-        for state_key, action_key, q_value in rows:
-            try:
-                state_key = json.loads(state_key)  # ✅ ใช้ JSON แทน eval() เพื่อป้องกันปัญหาความปลอดภัย
-                action_key = json.loads(action_key) if isinstance(action_key, str) else action_key
+    except sqlite3.Error as e:
+        logger.warning("⚠️ [AI] SQLite Error: %s", e)
+        q_table = QTable()  # ถ้าโหลดไม่ได้ให้ใช้ Q-Table ว่าง
 
-                if isinstance(state_key, list):  # ✅ ถ้าเป็น list ให้แปลงเป็น tuple
-                    state_key = tuple(map(tuple, state_key))
+def mark_changed(state_key, action_key):
+    """ ✅ บันทึกว่า entry เปลี่ยน ทั้งสำหรับบันทึกลงดิสก์ (q_table_store) และซิงก์กับเซิร์ฟเวอร์ (q_sync)
 
-                if state_key not in q_table:
-                    q_table[state_key] = {}
-                q_table[state_key][action_key] = q_value
-            except Exception as e:
-                print(f"⚠️ [AI] Error แปลง state_key: {state_key} -> {e}")
+    เรียกขณะถือ q_table_lock
+    """
+    get_q_store().mark_dirty(state_key, action_key)
+    get_sync_client().mark_dirty(state_key, action_key)
 
-        print(f"✅ [AI] Q-Table Loaded from SQLite: {len(q_table)} states")
+def mark_changed_many(entries):
+    """ ✅ เหมือน mark_changed สำหรับหลาย (state_key, action_key) จากการอัปเดตแบบ batch """
+    get_q_store().mark_dirty_many(entries)
+    get_sync_client().mark_dirty_many(entries)
 
-    except sqlite3.Error as e:
-        print(f"⚠️ [AI] SQLite Error: {e}")
-        q_table = {}  # ถ้าโหลดไม่ได้ให้ใช้ dictionary ว่าง
+def mark_state_deleted(state_key):
+    get_q_store().mark_deleted(state_key)
+    get_sync_client().mark_deleted(state_key)
 
 def convert_to_hashable(obj):
-    """ ✅ แปลง object เป็น hashable type """
-    if isinstance(obj, (list, np.ndarray)):
-        return tuple(map(tuple, obj.tolist() if isinstance(obj, np.ndarray) else obj))
+    """ ✅ แปลง Grid เป็น key แบบบีบอัด (int, 3 bits ต่อช่อง) สำหรับใช้ใน Q-Table """
+    if isinstance(obj, (list, tuple, np.ndarray)):
+        return pack_grid(obj)
     return obj
 
 def get_grid_value(grid, r, c):
@@ -205,115 +202,112 @@ def get_grid_value(grid, r, c):
 
 def update_q_table(state, action, reward, next_state, episode):
     """ ✅ ปรับปรุง Q-Table โดยตรวจสอบ key ก่อนอัปเดต """
-    print(f"\n🔹 [STEP] อัปเดต Q-Table (Episode {episode})")
+    logger.debug("🔹 [STEP] อัปเดต Q-Table (Episode %s)", episode)
 
-    state_key = convert_to_hashable(state)
-    next_state_key = convert_to_hashable(next_state)
-    action_key = convert_to_hashable(action)
+    action_key = encode_action(*action, cols=np.shape(state)[1])
+    if USE_SYMMETRY:
+        # ✅ ใช้ตัวแทนภายใต้สมมาตรที่คะแนนไม่เปลี่ยน (Action แปลงพิกัดตามไปด้วย)
+        state_key, action_key, _ = canonical_state_action(state, action_key)
+        next_state_key = canonicalize(next_state)[0]
+    else:
+        state_key = convert_to_hashable(state)
+        next_state_key = convert_to_hashable(next_state)
 
     alpha = max(ALPHA_END, ALPHA_START / (1 + episode * ALPHA_DECAY_RATE))
 
     with q_table_lock:
-        if state_key not in q_table:
-            q_table[state_key] = {}
-
-        if action_key not in q_table[state_key]:
-            q_table[state_key][action_key] = 0  
+        # ✅ max Q ของ next_state อ่านได้ O(1) จากค่าสูงสุดของแถวที่ QTable เก็บไว้, ปัดเศษ 4 ตำแหน่งป้องกันค่าเล็กเกินไป
+        old_q_value, new_q_value = q_table.update(state_key, action_key, reward, next_state_key, alpha, GAMMA)
+        if track_changes:
+            mark_changed(state_key, action_key)
+
+        logger.debug("📌 อัปเดต Q-Table: State = %x | Action = %s | Old Q = %.4f → New Q = %.4f",
+                     state_key, action, old_q_value, new_q_value)
+
+def lookup_q_values(state):
+    """ ✅ ดึงค่า Q ของทุก Action ที่เคยเรียนรู้ใน state นี้ เป็น {(r, c, อาคาร): Q} ตามพิกัดของ Grid ที่ส่งมา """
+    shape = np.shape(state)
+    if USE_SYMMETRY:
+        state_key, name = canonicalize(state)
+    else:
+        state_key, name = convert_to_hashable(state), 'identity'
+
+    actions = q_table.get(state_key, {})
+    return {
+        decode_action(restore_action(action, name, shape), shape[1]): q_value
+        for action, q_value in actions.items()
+    }
 
-        max_future_q = max(q_table.get(next_state_key, {}).values(), default=0)
-        old_q_value = q_table[state_key][action_key]
-        new_q_value = (1 - alpha) * old_q_value + alpha * (reward + GAMMA * max_future_q)
-        q_table[state_key][action_key] = round(new_q_value, 4)  # ✅ ป้องกันค่าเล็กเกินไป
+def greedy_action(state):
+    """ ✅ Action ที่ค่า Q สูงสุดของ state นี้ (อ่าน O(1) จาก QTable) หรือ None ถ้ายังไม่เคยเรียนรู้ state นี้ """
+    state = encode_grid(state)
+    shape = state.shape
+    if USE_SYMMETRY:
+        state_key, name = canonicalize(state)
+    else:
+        state_key, name = convert_to_hashable(state), 'identity'
 
-        print(f"📌 อัปเดต Q-Table: State = {state_key[:30]}... | Action = {action_key} | Old Q = {old_q_value:.4f} → New Q = {q_table[state_key][action_key]:.4f}")
+    with q_table_lock:
+        best = q_table.best_action(state_key)
+    if best is None:
+        return None
 
-        print(f"🔍 ก่อน Clean: Q-Table มี {len(q_table)} states")
-        # ✅ Clean Q-Table ทุก 500 Episodes
-        if episode % 500 == 0:
-            print(f"🔍 Clean Q-Table ทุก 500 Episodes (Episode {episode})")
-            clean_q_table()
-        print(f"🔍 หลัง Clean: Q-Table มี {len(q_table)} states")
+    r, c, char = decode_action(restore_action(best[0], name, shape), shape[1])
+    if state[r, c] != CELL_CODES['0']:
+        return None  # ✅ ป้องกันข้อมูลเก่าที่ชี้ไปยังช่องที่ไม่ว่าง
+    return r, c, char
 
 def send_q_table_to_server():
-    """ ✅ ส่ง Q-Table ไปยังเซิร์ฟเวอร์ Flask """
-    url = "http://127.0.0.1:5000/update_q_table"
+    """ ✅ ซิงก์ Q-Table กับเซิร์ฟเวอร์ Flask (q_sync): ส่งเฉพาะ entry ที่เปลี่ยนตั้งแต่ครั้งที่เซิร์ฟเวอร์ยืนยันล่าสุด """
+    import requests
+
+    if not track_changes:
+        return  # ✅ worker process: Q-Table ถูกรวมเข้า process หลักอยู่แล้ว ไม่ส่งเอง
 
     if not q_table:  
-        print("⚠️ [AI] Q-Table ว่างเปล่า ไม่ส่งไปเซิร์ฟเวอร์")
+        logger.debug("⚠️ [AI] Q-Table ว่างเปล่า ไม่ส่งไปเซิร์ฟเวอร์")
         return
 
-    print(f"📤 [AI] กำลังส่ง Q-Table ไปเซิร์ฟเวอร์ (ตอนนี้มี {len(q_table)} states)")
-
-    with q_table_lock:
-        try:
-            q_table_serializable = [
-                {"state_key": json.dumps(state), "action_key": json.dumps(action), "q_value": q_value}
-                for state, actions in q_table.items()
-                for action, q_value in actions.items()
-            ]
-        except Exception as e:
-            print(f"⚠️ [AI] ERROR: แปลง Q-Table ไม่สำเร็จ: {e}")
-            return
-
     try:
-        response = requests.post(url, json=q_table_serializable, timeout=10)
-        response.raise_for_status()
-        print(f"✅ [AI] Q-Table Sent | Server Response: {response.json()}")  
+        result = get_sync_client().sync(q_table, q_table_lock)
+        if result:
+            logger.debug("✅ [AI] Q-Table Synced | %s", result)
     except requests.exceptions.Timeout:
-        print("⚠️ [AI] ERROR: Timeout! ไม่สามารถเชื่อมต่อเซิร์ฟเวอร์ได้")
+        logger.warning("⚠️ [AI] ERROR: Timeout! ไม่สามารถเชื่อมต่อเซิร์ฟเวอร์ได้")
     except requests.exceptions.ConnectionError:
-        print("⚠️ [AI] ERROR: ไม่สามารถเชื่อมต่อเซิร์ฟเวอร์ (Connection Error)")
+        logger.warning("⚠️ [AI] ERROR: ไม่สามารถเชื่อมต่อเซิร์ฟเวอร์ (Connection Error)")
     except requests.exceptions.RequestException as e:
-        print(f"⚠️ [AI] ERROR: ไม่สามารถส่ง Q-Table ไปเซิร์ฟเวอร์: {e}")
+        logger.warning("⚠️ [AI] ERROR: ไม่สามารถส่ง Q-Table ไปเซิร์ฟเวอร์: %s", e)
     except json.JSONDecodeError:
-        print("⚠️ [AI] ERROR: ตอบกลับจากเซิร์ฟเวอร์ไม่ใช่ JSON ที่ถูกต้อง")
-
-def update_q_table_server():
-    global q_table
+        logger.warning("⚠️ [AI] ERROR: ตอบกลับจากเซิร์ฟเวอร์ไม่ใช่ JSON ที่ถูกต้อง")
 
-    new_q_table = request.get_json()
-    episode = request.args.get("episode", type=int)  # ✅ รับค่า episode จาก request
+def create_app():
+    """ ✅ สร้าง Flask Application ที่รับ Q-Table แบบ delta ผ่าน POST /update_q_table (q_sync) """
+    from flask import Flask
 
-    if not new_q_table:
-        return jsonify({"status": "error", "message": "Received empty Q-Table"}), 400
+    app = Flask(__name__)
+    app.extensions['q_sync'] = SyncServer(q_table, q_table_lock)  # ✅ รวม delta เข้า Q-Table ของ process นี้
+    app.add_url_rule(SYNC_PATH, view_func=update_q_table_server, methods=['POST'])
+    return app
 
-    print(f"🔍 ก่อน Clean: Q-Table มี {len(q_table)} states")
-    
-    # ✅ Clean Q-Table ทุก 500 Episodes
-    if episode and episode % 500 == 0:
-        print(f"🔍 Clean Q-Table ทุก 500 Episodes (Episode {episode})")
-        clean_q_table()
-
-    print(f"🔍 หลัง Clean: Q-Table มี {len(q_table)} states")
-
-def batch_update_q_table(stop_event):
-    global last_q_table_hash
-    while not stop_event.is_set():
-        time.sleep(30)  # ✅ ปรับเวลาหน่วงเป็น 30 วินาที ลดการล็อกไฟล์บ่อยเกินไป
+def update_q_table_server():
+    """ ✅ รับ delta / ทั้งตารางจาก trainer (state ที่ trainer ลบด้วย prune_q_table มาเป็นบรรทัดลบใน delta แล้ว) """
+    from flask import current_app, request, jsonify
 
-        with q_table_lock:
-            q_table_copy = dict(q_table)
+    payload, status = current_app.extensions['q_sync'].handle(request)
+    return jsonify(payload), status
 
+def batch_update_q_table(stop_event, interval=30):
+    """ ✅ บันทึก Q-Table ลง SQLite เป็นระยะ เฉพาะ entry ที่เปลี่ยนตั้งแต่ครั้งก่อน """
+    while not stop_event.wait(interval):  # ✅ ปรับเวลาหน่วงเป็น 30 วินาที ลดการเขียนดิสก์บ่อยเกินไป
         try:
-            q_table_hash = hashlib.md5(json.dumps(q_table_copy, sort_keys=True).encode()).hexdigest()
-
-            if q_table_hash == last_q_table_hash:
-                print("⚠️ [Batch Update] Q-Table ไม่เปลี่ยนแปลง ข้ามการบันทึก")
-                continue
-
-            print(f"💾 [Batch Update] กำลังบันทึก Q-Table ({len(q_table_copy)} states)")
-
-            with FileLock(LOCK_FILE, timeout=10):  # ✅ เพิ่ม timeout เป็น 10 วินาที
-                with open(Q_TABLE_FILE, "w") as f:
-                    json.dump(q_table_copy, f)
-
-            last_q_table_hash = q_table_hash
-            print(f"✅ [Batch Update] บันทึกเสร็จ ({len(q_table_copy)} states)")
-
-        except TimeoutError:
-            print("❌ [Batch Update] ERROR: Timeout acquiring file lock! ป้องกัน Deadlock")
-        except Exception as e:
-            print(f"❌ [Batch Update] เกิดข้อผิดพลาดในการบันทึก: {e}")
+            saved = get_q_store().flush(q_table, q_table_lock)
+            if saved:
+                logger.info("✅ [Batch Update] บันทึกเสร็จ (%s entries ที่เปลี่ยน)", saved)
+            else:
+                logger.debug("⚠️ [Batch Update] Q-Table ไม่เปลี่ยนแปลง ข้ามการบันทึก")
+        except sqlite3.Error as e:
+            logger.error("❌ [Batch Update] เกิดข้อผิดพลาดในการบันทึก: %s", e)
 
 def check_memory_before_training():
     """ ✅ ตรวจสอบหน่วยความจำก่อนเริ่มการฝึก AI """
@@ -328,87 +322,77 @@ def check_memory_before_training():
         print(f"   - หน่วยความจำว่าง: {memory_info['free']:.2f} GB")
         print(f"   - ใช้หน่วยความจำ: {memory_info['percent']}%")
 
-def check_q_table_size():
-    """ ✅ ตรวจสอบจำนวน state และขนาดของ Grid ที่ถูกเก็บใน Q-Table """
-    conn, cursor = get_db_connection()
+def get_memory_governor():
+    """ ✅ MemoryGovernor ของ Q-Table ปัจจุบัน (สร้างใหม่เมื่อ q_table ถูกแทนที่ เช่นหลัง load_q_table)
 
-    cursor.execute("SELECT COUNT(*) FROM q_table")
-    num_states = cursor.fetchone()[0]
+    process หลักบันทึก state ที่ถูกไล่ลง SQLite ก่อนทิ้ง ส่วน worker process (track_changes = False) ทิ้งไปเลย
+    """
+    global memory_governor
+    if memory_governor is None or memory_governor.q_table is not q_table:
+        memory_governor = MemoryGovernor(q_table, q_table_lock, store=get_q_store() if track_changes else None,
+                                         budget=memory_budget)
+    return memory_governor
 
-    cursor.execute("SELECT DISTINCT state_key FROM q_table")
-    state_keys = cursor.fetchall()
+def govern_memory():
+    get_memory_governor().maybe_check()
 
-    grid_sizes = set()
-    for key in state_keys:
-        try:
-            grid_size = eval(key[0])  # ✅ แปลง string กลับเป็น tuple
-            grid_sizes.add(grid_size)
-        except:
-            pass  # ข้าม state ที่ผิดปกติ
+def log_memory_metrics():
+    metrics = get_memory_governor().metrics
+    if metrics['evictions']:
+        logger.info("🧠 Memory governor: %s", metrics)
 
-    conn.close()  # ✅ ปิด Connection หลังจากดึงข้อมูล
+def check_q_table_size():
+    """ ✅ ตรวจสอบจำนวน state และขนาดของ Grid ที่ถูกเก็บใน Q-Table """
+    store = get_q_store()
+    _, num_states = store.count()
+    grid_sizes = store.grid_sizes()  # ✅ ขนาด Grid อยู่ใน key
 
     print(f"📌 Q-Table มีทั้งหมด {num_states} states")
-    print(f"📌 Grid ที่บันทึกไว้มีขนาด: {sorted(grid_sizes) if grid_sizes else 'ยังไม่มีข้อมูล'}")
+    print(f"📌 Grid ที่บันทึกไว้มีขนาด: {grid_sizes if grid_sizes else 'ยังไม่มีข้อมูล'}")
 
 def check_q_table():
-    conn, cursor = get_db_connection()
-    cursor.execute("SELECT COUNT(*) FROM q_table")
-    num_records = cursor.fetchone()[0]
-    conn.close()
+    num_records, _ = get_q_store().count()
     print(f"📌 Q-Table มีทั้งหมด {num_records} records")
 
 def print_grid(grid):
     """ ✅ แสดงผล Grid เป็นตัวอักษรธรรมดา โดยไม่มีการจัดระยะห่างพิเศษ """
-    for row in grid:
-        print(" ".join(row))  # ✅ ใช้ " " คั่นระหว่างตัวอักษร
+    print(format_grid(grid))
     print()  # ✅ เพิ่มบรรทัดเว้นระหว่าง Grid แต่ละรอบ
 
-def get_db_connection():
-    """ ✅ จัดการ Database Connection ป้องกันการเปิดซ้ำ """
-    conn = sqlite3.connect("q_table.db", check_same_thread=False)
-    cursor = conn.cursor()
-    return conn, cursor
+def format_grid(grid):
+    """ ✅ แปลง Grid เป็นข้อความหลายบรรทัด ใช้ " " คั่นระหว่างตัวอักษร """
+    if isinstance(grid, np.ndarray) and grid.dtype == np.uint8:
+        grid = decode_grid(grid)
+    return "\n".join(" ".join(row) for row in grid)
+
+def log_grid(grid, level=logging.DEBUG):
+    """ ✅ บันทึก Grid ลง log เฉพาะเมื่อระดับนั้นเปิดอยู่ (ไม่เสียเวลาจัดรูปแบบในโหมด fast) """
+    if logger.isEnabledFor(level):
+        logger.log(level, "\n%s\n", format_grid(grid))
+
+def get_q_pruner():
+    """ ✅ QTablePruner ของ Q-Table ปัจจุบัน (สร้างใหม่เมื่อ q_table ถูกแทนที่) state ที่ถูกลบถูกบันทึกผ่าน mark_state_deleted """
+    global q_pruner
+    if q_pruner is None or q_pruner.q_table is not q_table:
+        on_delete = (lambda keys: [mark_state_deleted(key) for key in keys]) if track_changes else None
+        q_pruner = QTablePruner(q_table, percentile=35, lock=q_table_lock, on_delete=on_delete)
+    return q_pruner
+
+def prune_q_table(episodes=1):
+    """ ✅ ลบ state ค่าต่ำแบบทยอย: ตรวจส่วนหนึ่งของตารางตามจำนวน Episode ที่ผ่านไป (ครบรอบทุกประมาณ 500 Episodes) """
+    return get_q_pruner().step(episodes)
 
 def clean_q_table():
-    """ ✅ ลบค่าที่ต่ำกว่าค่า threshold ออกจาก Q-Table โดยแยกตามขนาดของ Grid """
-    global q_table  
-
+    """ ✅ ลบค่าที่ต่ำกว่าค่า threshold ออกจาก Q-Table โดยแยกตามขนาดของ Grid (ครบทั้งตารางในครั้งเดียว) """
     if not q_table:
-        print("⚠️ Q-Table ว่างเปล่า! ไม่มีอะไรต้องล้าง")
+        logger.debug("⚠️ Q-Table ว่างเปล่า! ไม่มีอะไรต้องล้าง")
         return
 
-    # ✅ 1. แยก Q-values ตามขนาดของกริด
-    grid_q_values = {}
-    
-    for state, actions in q_table.items():
-        grid_size = (len(state), len(state[0]))  # ขนาดของ Grid
-        max_q_value = max(actions.values(), default=0)
-        
-        if grid_size not in grid_q_values:
-            grid_q_values[grid_size] = []
-        grid_q_values[grid_size].append(max_q_value)
-
-    # ✅ 2. คำนวณ threshold แยกตามขนาดของ Grid
-    thresholds = {
-        grid_size: np.percentile(np.array(q_values), 35) if q_values else float('-inf')
-        for grid_size, q_values in grid_q_values.items()
-    }
-
-    # ✅ 3. ลบค่าที่ต่ำกว่า threshold ของขนาด Grid นั้น ๆ
-    q_table_keys = list(q_table.keys())  # ✅ ป้องกันการลบ key ระหว่าง loop
-    deleted_count = 0  # นับจำนวน states ที่ถูกลบ
-
-    for key in q_table_keys:
-        grid_size = (len(key), len(key[0]))  # ขนาดของ Grid
-        threshold = thresholds.get(grid_size, float('-inf'))
-        q_values = np.fromiter(q_table[key].values(), dtype=float)
+    # ✅ threshold = percentile ที่ 35 ของค่า Q สูงสุดของแต่ละ state แยกตามขนาด Grid (จาก quantile sketch)
+    # ✅ ลบ state ที่ค่า Q เฉลี่ยต่ำกว่า threshold ทีละช่วง slot (ถือ q_table_lock เฉพาะช่วงที่ตรวจ)
+    deleted_count = len(get_q_pruner().sweep())
 
-        if np.mean(q_values) < threshold:  # ✅ ใช้ mean แทน max
-            del q_table[key]
-            deleted_count += 1  # ✅ เพิ่มตัวนับ states ที่ถูกลบ
-
-    print(f"✅ Q-Table Cleaned: ลบ {deleted_count} states ที่ต่ำกว่าค่า threshold ของแต่ละขนาด, เหลือ {len(q_table)} states")
+    logger.info("✅ Q-Table Cleaned: ลบ %s states ที่ต่ำกว่าค่า threshold ของแต่ละขนาด, เหลือ %s states", deleted_count, len(q_table))
 
 # =========================================================
 # 📌 5️⃣ ฟังก์ชันเกี่ยวกับการเลือก Action
@@ -431,54 +415,65 @@ def get_state(grid, r, c, size=3):
         state.append(tuple(row))
     return tuple(state)
 
-def choose_action(grid, e_position, epsilon=0.1):
-    """ ✅ เลือกจุดวางแบบ BFS (จิ๊กซอ) และเลือกอาคารที่ให้โบนัสแพทเทิร์นสูงสุด """
-    if not isinstance(grid, np.ndarray):
-        grid = np.array(grid)
-
-    rows, cols = grid.shape
-    visited = set()
-    queue = deque([e_position])
-    build_order = []
+def choose_action(grid, e_position, epsilon=0.1, scorer=None, use_q_table=False):
+    """ ✅ เลือกจุดวางแบบ BFS (จิ๊กซอ) และเลือกอาคารที่ให้โบนัสแพทเทิร์นสูงสุด
 
-    while queue:
-        r, c = queue.popleft()
-        if (r, c) in visited:
-            continue
-        visited.add((r, c))
+    ถ้าส่ง `scorer` (IncrementalScorer ที่ตรงกับ grid) มาด้วย จะใช้ซ้ำได้เลย
+    ไม่ต้องสร้างใหม่ทุกครั้ง
+    ถ้า `use_q_table` จะเลือก Action ที่ค่า Q สูงสุดก่อน และค้นหาด้วยคะแนนเฉพาะ state ที่ยังไม่เคยเรียนรู้
+    """
+    grid = encode_grid(grid)  # ✅ ทำงานกับ Grid แบบ uint8
 
-        if get_grid_value(grid, r, c) == '0':
-            build_order.append((r, c))
+    if use_q_table and random.random() >= epsilon:
+        action = greedy_action(grid)
+        if action is not None:
+            policy_stats['greedy'] += 1
+            return action
 
-        for dr, dc in [(-1,0), (1,0), (0,-1), (0,1)]:
-            nr, nc = r + dr, c + dc
-            if 0 <= nr < rows and 0 <= nc < cols and (nr, nc) not in visited:
-                queue.append((nr, nc))
+    rows, cols = grid.shape
+    # ✅ ลำดับ BFS จาก E คำนวณไว้ครั้งเดียวต่อ (ขนาด Grid, ตำแหน่ง E) เหลือแค่กรองช่องว่าง
+    flat = grid.ravel().tolist()
+    build_order = [divmod(i, cols) for i in get_topology(rows, cols).bfs_order(e_position)
+                   if flat[i] == CELL_CODES['0']]
 
     if not build_order:
         return None  # ถ้ากริดเต็มแล้ว ไม่ต้องเลือก action ใหม่
 
     # ✅ ถ้าอยู่ในช่วง Exploration (สุ่มเลือก)
     if random.random() < epsilon:
+        policy_stats['explore'] += 1
         r, c = random.choice(build_order)
         chosen = random.choices(['H', 'R', 'G'], weights=[0.5, 0.3, 0.2])[0]  # ✅ ปรับความน่าจะเป็น
         return r, c, chosen
 
+    policy_stats['search'] += 1
+
     # ✅ ใช้คะแนนจาก Q-Table หรือ Reward System ในการเลือกอาคาร
     best_score = float('-inf')
+    best_q = float('-inf')
     best_choice = None
     best_position = None
+    q_values = lookup_q_values(grid)  # ✅ ใช้ตัดสินเมื่อคะแนนเท่ากัน
+
+    # ✅ ใช้ IncrementalScorer คำนวณเฉพาะส่วนที่เปลี่ยน แทนการคำนวณทั้ง Grid ทุกตัวเลือก
+    if scorer is None:
+        scorer = IncrementalScorer(grid)
+    # ✅ ผังบางส่วนเดิมๆ ถูกทดลองซ้ำข้าม Episode จึงแคชคะแนนไว้ด้วย key ของ Grid หลังวาง
+    reward_cache = get_reward_cache()
+    state_key = pack_grid(grid)
 
     for r, c in build_order:
         for option in ['H', 'R', 'G']:
-            temp_grid = grid.copy()
-            temp_grid[r, c] = option  # ✅ ทดลองวาง
-
-            # ✅ ลดการเรียก calculate_reward_verbose() บ่อยเกินไป
-            score = calculate_reward_verbose(temp_grid)  
-
-            if score > best_score:
+            candidate_key = key_set_cell(state_key, r, c, option)
+            score = reward_cache.get(candidate_key)
+            if score is None:
+                score = scorer.score_if(r, c, option)  # ✅ ทดลองวาง
+                reward_cache.put(candidate_key, score)
+            q_value = q_values.get((r, c, option), 0)
+
+            if score > best_score or (score == best_score and q_value > best_q):
                 best_score = score
+                best_q = q_value
                 best_choice = option
                 best_position = (r, c)
 
@@ -487,24 +482,20 @@ def choose_action(grid, e_position, epsilon=0.1):
 def validate_final_grid(grid):
     """ ✅ ตรวจสอบว่าผังหมู่บ้านถูกต้องตามเงื่อนไข """
     grid = np.array(grid)
+    if grid.dtype == np.uint8:
+        grid = decode_grid(grid)
 
     # ✅ ตรวจสอบว่ามีถนนอย่างน้อย 1 เส้น
     roads_exist = np.sum(grid == 'R') > 0
     if not roads_exist:
         return False
 
-    # ✅ ตรวจสอบว่าบ้านทุกหลังต้องติดถนน หรืออยู่ห่างไม่เกิน 1 ช่อง
-    houses = np.argwhere(grid == 'H')
-    for r, c in houses:
-        if not ((r > 0 and grid[r-1, c] == 'R') or 
-                (r < grid.shape[0]-1 and grid[r+1, c] == 'R') or
-                (c > 0 and grid[r, c-1] == 'R') or 
-                (c < grid.shape[1]-1 and grid[r, c+1] == 'R') or
-                (r > 1 and grid[r-2, c] == 'R') or
-                (r < grid.shape[0]-2 and grid[r+2, c] == 'R') or
-                (c > 1 and grid[r, c-2] == 'R') or 
-                (c < grid.shape[1]-2 and grid[r, c+2] == 'R')):
-            return False  # ถ้าพบบ้านที่ไม่ติดถนน ให้คืนค่า False
+    # ✅ ตรวจสอบว่าบ้านทุกหลังต้องติดถนน หรืออยู่ห่างไม่เกิน 1 ช่อง (แนวตรง ระยะ 1-2 ช่องจากตาราง topology)
+    topology = get_topology(*grid.shape)
+    flat = grid.ravel()
+    road_nearby = topology.pad(flat == 'R')[topology.reach2_index].any(axis=1)
+    if np.any((flat == 'H') & ~road_nearby):
+        return False  # ถ้าพบบ้านที่ไม่ติดถนน ให้คืนค่า False
 
     return True  # ✅ ถ้าผ่านทุกเงื่อนไข ถือว่า Grid ใช้งานได้
 
@@ -524,130 +515,181 @@ def get_neighbors(grid, r, c, visited=None):
     if visited is None:
         visited = set()
 
-    neighbors = []
-    directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-
-    for dr, dc in directions:
-        nr, nc = r + dr, c + dc
-        if 0 <= nr < len(grid) and 0 <= nc < len(grid[0]) and (nr, nc) not in visited:
-            if grid[nr][nc] == '0':
-                neighbors.append((nr, nc))
-
-    return neighbors
+    cols = len(grid[0])
+    return [
+        (nr, nc) for nr, nc in get_topology(len(grid), cols).neighbor_cells[r * cols + c]
+        if (nr, nc) not in visited and grid[nr][nc] == '0'
+    ]
 
 def train_ai(episodes, grid, e_position):
-    """ ✅ AI ฝึกการเรียนรู้ และบังคับให้วางอาคารให้เต็ม Grid อย่างมีประสิทธิภาพ """
-    
-    if not isinstance(grid, np.ndarray):
-        grid = np.array(grid)
+    """ ✅ AI ฝึกการเรียนรู้ และบังคับให้วางอาคารให้เต็ม Grid อย่างมีประสิทธิภาพ
+
+    ภายในใช้ Grid แบบ uint8 (grid_codec) และแปลงกลับเป็นตัวอักษรตอนคืนค่า
+    """
+    grid = encode_grid(grid)
 
     best_grid = None
     best_score = float('-inf')
     episode_scores = []
     start_time = time.time()
+    step_delay = run_mode['STEP_DELAY']
+    episode_delay = run_mode['EPISODE_DELAY']
 
-    print("\n" + "="*50)
-    print("🎮 เริ่มการฝึก AI...")
-    print(f"📊 จำนวน Episodes: {episodes}")
-    print(f"📐 ขนาด Grid: {grid.shape}")
-    print(f"📍 ตำแหน่ง E: {e_position}")
-    print("="*50 + "\n")
+    logger.info("🎮 เริ่มการฝึก AI... | Episodes: %s | ขนาด Grid: %s | ตำแหน่ง E: %s | โหมด: %s",
+                episodes, grid.shape, e_position, run_mode['NAME'])
 
     for episode in range(episodes):
         episode_start = time.time()
-        print(f"\n🔹 Episode {episode + 1}/{episodes}")
-        print(f"⏰ เวลาที่ใช้ไปแล้ว: {time.time() - start_time:.2f} วินาที")
+        logger.debug("🔹 Episode %s/%s | ⏰ เวลาที่ใช้ไปแล้ว: %.2f วินาที", episode + 1, episodes, time.time() - start_time)
         
         state = grid.copy()
-        if state[e_position] != 'E':
-            state[e_position] = 'E'
+        state[e_position] = CELL_CODES['E']
 
-        print("\nสถานะ Grid ปัจจุบัน:")
-        print_grid(state)
-        time.sleep(0.5)  # หน่วงเวลาให้เห็นการเปลี่ยนแปลง
+        logger.debug("สถานะ Grid ปัจจุบัน:")
+        log_grid(state)
+        if episode_delay:
+            time.sleep(episode_delay)  # หน่วงเวลาให้เห็นการเปลี่ยนแปลง (เฉพาะโหมด demo)
 
-        empty_cells = np.argwhere(state == '0')
+        empty_cells = np.argwhere(state == CELL_CODES['0'])
         np.random.shuffle(empty_cells)
         placed_buildings = {'H': 0, 'R': 0, 'G': 0}
+        scorer = IncrementalScorer(state)  # ✅ เก็บคะแนนย่อยของ Grid ตลอดทั้ง Episode
 
         for r, c in empty_cells:
-            action = choose_action(state, e_position)
+            action = choose_action(state, e_position, scorer=scorer)
             if action:
                 r, c, char = action
             else:
                 char = np.random.choice(['H', 'R', 'G'], p=[0.5, 0.3, 0.2])
 
-            state[r, c] = char
+            prev_state = state.copy()  # ✅ Q-Table เรียนรู้จาก state ก่อนวาง (ใช้ค้นหา Action ตอน inference ได้)
+            state[r, c] = CELL_CODES[char]
+            scorer.set(r, c, char)
             placed_buildings[char] += 1
             
-            print(f"\nวางอาคาร {char} ที่ตำแหน่ง ({r+1}, {c+1})")
-            print(f"จำนวนอาคารที่วางแล้ว: H={placed_buildings['H']}, R={placed_buildings['R']}, G={placed_buildings['G']}")
-            print_grid(state)
-            time.sleep(0.1)  # หน่วงเวลาระหว่างการวางแต่ละอาคาร
+            logger.debug("วางอาคาร %s ที่ตำแหน่ง (%s, %s) | จำนวนอาคารที่วางแล้ว: H=%s, R=%s, G=%s",
+                         char, r + 1, c + 1, placed_buildings['H'], placed_buildings['R'], placed_buildings['G'])
+            log_grid(state)
+            if step_delay:
+                time.sleep(step_delay)  # หน่วงเวลาระหว่างการวางแต่ละอาคาร (เฉพาะโหมด demo)
 
             next_state = state.copy()
-            reward = calculate_reward_verbose(state)
-            update_q_table(state, (r, c, char), reward, next_state, episode)
+            reward = scorer.total()
+            update_q_table(prev_state, (r, c, char), reward, next_state, episode)
 
-        total_reward = calculate_reward_verbose(state)
+        total_reward = scorer.total()
         episode_scores.append(total_reward)
 
-        episode_time = time.time() - episode_start
-        print(f"\n📊 สรุป Episode {episode + 1}:")
-        print(f"⏱️ เวลาที่ใช้: {episode_time:.2f} วินาที")
-        print(f"🎯 คะแนน: {total_reward}")
-        print(f"🏗️ อาคารที่วาง: H={placed_buildings['H']}, R={placed_buildings['R']}, G={placed_buildings['G']}")
+        logger.debug("📊 สรุป Episode %s: ⏱️ %.2f วินาที | 🎯 คะแนน: %s | 🏗️ H=%s, R=%s, G=%s",
+                     episode + 1, time.time() - episode_start, total_reward,
+                     placed_buildings['H'], placed_buildings['R'], placed_buildings['G'])
 
         if total_reward < -1000:
-            print(f"⚠️ แจ้งเตือน: คะแนนต่ำมาก! ({total_reward})")
+            logger.debug("⚠️ แจ้งเตือน: คะแนนต่ำมาก! (%s)", total_reward)
         elif total_reward > 0:
-            print(f"✅ แจ้งเตือน: คะแนนดี! ({total_reward})")
+            logger.debug("✅ แจ้งเตือน: คะแนนดี! (%s)", total_reward)
 
         if placed_buildings['R'] == 0:
-            print(f"⚠️ แจ้งเตือน: ไม่มีการวางถนน!")
+            logger.debug("⚠️ แจ้งเตือน: ไม่มีการวางถนน!")
         elif placed_buildings['H'] == 0:
-            print(f"⚠️ แจ้งเตือน: ไม่มีการวางบ้าน!")
+            logger.debug("⚠️ แจ้งเตือน: ไม่มีการวางบ้าน!")
         elif placed_buildings['G'] == 0:
-            print(f"⚠️ แจ้งเตือน: ไม่มีการวางพื้นที่สีเขียว!")
+            logger.debug("⚠️ แจ้งเตือน: ไม่มีการวางพื้นที่สีเขียว!")
 
         if total_reward > best_score or best_grid is None:
             best_score = total_reward
             best_grid = state.copy()
-            print(f"   🎯 คะแนนใหม่สูงสุด: {best_score}")
+            logger.debug("   🎯 คะแนนใหม่สูงสุด: %s", best_score)
+
+        if (episode + 1) % PROGRESS_INTERVAL == 0:
+            elapsed = time.time() - start_time
+            logger.info("⏩ Episode %s/%s | %.1f episodes/sec | คะแนนสูงสุด: %s",
+                        episode + 1, episodes, (episode + 1) / elapsed if elapsed else float('inf'), best_score)
+
+        prune_q_table()  # ✅ ลบ state ค่าต่ำทีละส่วน แทนการ Clean ทั้งตารางทุก 500 Episodes
+        govern_memory()  # ✅ ตรวจหน่วยความจำเป็นระยะ ไล่ state ออกถ้าใกล้เกิน MAX_MEMORY_USAGE
 
         if episode % 10 == 0:
             send_q_table_to_server()
             
     total_time = time.time() - start_time
-    print("\n" + "="*50)
-    print("📊 สรุปการฝึกทั้งหมด:")
-    print(f"   - จำนวน Episodes ที่ฝึกจริง: {episodes}")
-    print(f"   - เวลาที่ใช้ทั้งหมด: {total_time:.2f} วินาที")
-    print(f"   - เวลาเฉลี่ยต่อ Episode: {total_time/episodes:.2f} วินาที")
-    print(f"   - คะแนนเฉลี่ย: {sum(episode_scores)/len(episode_scores):.2f}")
-    print(f"   - คะแนนสูงสุด: {max(episode_scores)}")
-    print(f"   - คะแนนต่ำสุด: {min(episode_scores)}")
-    print(f"   - คะแนนสูงสุดตลอดการฝึก: {best_score}")
-    print("\n🎯 Grid ที่ดีที่สุด:")
-    print_grid(best_grid)
-    print("="*50 + "\n")
-
-    return best_grid, best_score
+    logger.info("📊 สรุปการฝึกทั้งหมด: Episodes %s | เวลา %.2f วินาที | %.1f episodes/sec | "
+                "คะแนนเฉลี่ย %.2f | สูงสุด %s | ต่ำสุด %s",
+                episodes, total_time, episodes / total_time if total_time else float('inf'),
+                sum(episode_scores) / len(episode_scores), max(episode_scores), min(episode_scores))
+    log_cache_stats()
+    logger.info("🧭 การเลือก Action: %s", dict(policy_stats))
+    log_memory_metrics()
+    logger.info("🎯 Grid ที่ดีที่สุด (คะแนน %s):", best_score)
+    log_grid(best_grid, logging.INFO)
+
+    return decode_grid(best_grid), best_score
+
+def train_ai_batched(episodes, grid, e_position, batch_size=256):
+    """ ✅ ฝึก AI แบบ batch (batch_env): K Episode พร้อมกันด้วยนโยบาย epsilon-greedy จาก Q-Table
+
+    ใช้ Q-Table, lock และการบันทึกลงดิสก์ชุดเดียวกับ train_ai แต่ไม่ค้นหาด้วยคะแนนทุกตัวเลือก
+    (state ที่ยังไม่เคยเรียนรู้ใช้ Action สุ่ม) จึงเร็วกว่ามาก
+    epsilon ลดลงทุก batch ตาม EPSILON_START / EPSILON_DECAY / EPSILON_END
+    """
+    if USE_SYMMETRY:
+        # ✅ batch_env ใช้ key ตามพิกัดจริง ไม่รวม state ที่สมมาตรกัน
+        logger.warning("⚠️ USE_SYMMETRY เปิดอยู่: ใช้ train_ai แทนการฝึกแบบ batch")
+        return train_ai(episodes, grid, e_position)
+
+    on_update = mark_changed_many if track_changes else None
+
+    def after_batch(batch_index):
+        prune_q_table(batch_size)
+        govern_memory()
+
+    best_grid, best_score, _ = train_batched(
+        q_table, episodes, grid, e_position, batch_size=batch_size,
+        epsilon=lambda batch_index: max(EPSILON_END, EPSILON_START * EPSILON_DECAY ** batch_index),
+        alpha_schedule=lambda episode: max(ALPHA_END, ALPHA_START / (1 + episode * ALPHA_DECAY_RATE)),
+        gamma=GAMMA, lock=q_table_lock, on_update=on_update, on_batch=after_batch,
+    )
+    log_memory_metrics()
+    log_grid(best_grid, logging.INFO)
+    return decode_grid(best_grid), best_score
+
+def infer_layout(grid, e_position):
+    """ ✅ วางผังจาก Q-Table ที่ฝึกแล้ว (ไม่สุ่ม ไม่อัปเดต Q-Table)
+
+    state ที่เคยเรียนรู้ใช้ Action ที่ค่า Q สูงสุดทันที ส่วน state ใหม่ค้นหาด้วยคะแนนแทน
+    คืน (Grid ตัวอักษร, คะแนน, จำนวนครั้งที่ใช้แต่ละทาง {'greedy': n, 'search': n})
+    """
+    state = encode_grid(grid).copy()
+    state[e_position] = CELL_CODES['E']
+    scorer = IncrementalScorer(state)
+    before = policy_stats.copy()
+    start_time = time.perf_counter()
+
+    while True:
+        action = choose_action(state, e_position, epsilon=0, scorer=scorer, use_q_table=True)
+        if action is None:
+            break
+        r, c, char = action
+        state[r, c] = CELL_CODES[char]
+        scorer.set(r, c, char)
+
+    stats = {path: policy_stats[path] - before[path] for path in ('greedy', 'search')}
+    logger.info("🧭 Inference Grid %s, E ที่ %s: %.1f ms | Q-Table %s ครั้ง, ค้นหาด้วยคะแนน %s ครั้ง",
+                state.shape, e_position, (time.perf_counter() - start_time) * 1000, stats['greedy'], stats['search'])
+    return decode_grid(state), scorer.total(), stats
 
 def train_grid(grid_size, epsilon):
     """ ✅ ฝึก AI สำหรับขนาด Grid ที่กำหนด """
     rows, cols = grid_size
     e_positions = get_edge_positions(rows, cols)  # ✅ หาตำแหน่งขอบทั้งหมด
 
-    print(f"\n🔹 กำลังสร้าง Grid ขนาด {rows}x{cols}")
     # แปลงทุกตำแหน่งเป็น 1-based index ก่อนแสดงผล
-    e_positions_1based = [(r+1, c+1) for r, c in e_positions]
-    print(f"📌 ตำแหน่ง E ที่จะทดสอบ: {e_positions_1based}")
+    logger.info("🔹 กำลังสร้าง Grid ขนาด %sx%s | 📌 ตำแหน่ง E ที่จะทดสอบ: %s",
+                rows, cols, [(r+1, c+1) for r, c in e_positions])
 
     best_results = {}
     for e_position in e_positions:
-        e_position_1based = (e_position[0] + 1, e_position[1] + 1)  # แปลงเป็น 1-base
-        print(f"\n📌 ทดสอบตำแหน่ง E ที่ {e_position_1based}")
+        logger.info("📌 ทดสอบตำแหน่ง E ที่ %s", (e_position[0] + 1, e_position[1] + 1))
         
         # สร้างกริดเปล่า
         grid = [['0' for _ in range(cols)] for _ in range(rows)]
@@ -658,31 +700,127 @@ def train_grid(grid_size, epsilon):
 
     return best_results
 
-def train_grid_wrapper(size, epsilon):
-    return train_grid(size, epsilon)
+warm_start = {}  # ✅ (rows, cols) → (state_keys, actions, values) จาก Q-Table ของ process หลัก (ตั้งใน worker โดย _init_train_worker)
 
-def train_ai_parallel(grid_sizes):
-    """ ✅ ฝึก AI แบบขนาน แต่จำกัดการใช้ CPU """
-    num_workers = 1  # ใช้แค่ 1 core เพื่อให้เห็นการทำงานชัดเจน
-    print(f"\n🔄 เริ่มการฝึก AI แบบขนาน (ใช้ {num_workers} CPU core)")
-    
-    with multiprocessing.Pool(processes=num_workers) as pool:
-        results = []
-        for size in grid_sizes:
-            print(f"\n📐 กำลังฝึก Grid ขนาด {size}...")
-            result = pool.apply_async(train_grid_wrapper, (size, EPSILON_START))
-            results.append((size, result))
-            time.sleep(1)  # รอ 1 วินาทีระหว่างแต่ละ grid size
-        
-        # รอผลลัพธ์และแสดงความคืบหน้า
-        best_results = {}
-        for size, result in results:
-            print(f"\n⏳ รอผลลัพธ์สำหรับ Grid ขนาด {size}...")
-            grid_result = result.get()
-            best_results[size] = grid_result
-            print(f"✅ เสร็จสิ้นการฝึก Grid ขนาด {size}")
-            time.sleep(0.5)  # รอ 0.5 วินาทีก่อนแสดงผลถัดไป
+def _init_train_worker(entries_by_shape):
+    global warm_start
+    warm_start = entries_by_shape
+
+def train_job(grid_size, e_position, episodes, mode=None, batch_size=None, budget=None):
+    """ ✅ งานฝึก 1 ชิ้น (ขนาด Grid, ตำแหน่ง E) สำหรับ worker process
+
+    ใช้ Q-Table ของตัวเอง (ไม่แชร์กับ process อื่น) ที่เริ่มจากส่วนของขนาด Grid นี้ใน Q-Table หลัก (warm_start)
+    ฝึกบน Grid ว่างที่วาง E ตาม `e_position` (เหมือน train_grid)
+    แล้วคืน delta เป็น list ของ (state_key, action_key, q_value, visits) เฉพาะ entry ที่งานนี้อัปเดต
+    (visits = จำนวนครั้งที่อัปเดตในงานนี้) ให้ process หลักรวม
+    ถ้ากำหนด `batch_size` จะฝึกด้วย train_ai_batched แทน train_ai
+    `budget` คือส่วนแบ่งงบหน่วยความจำของ process นี้ (MemoryGovernor)
+    """
+    global q_table, track_changes, memory_budget
+    if mode is not None:
+        set_run_mode(mode)  # ✅ process ลูกไม่ได้รับโหมดจาก process หลักอัตโนมัติ
+    q_table, track_changes, memory_budget = QTable(), False, budget
+    state_keys, actions, values = warm_start.get(tuple(grid_size), ([], (), ()))
+    for state_key, action_key, q_value in zip(state_keys, actions, values):
+        q_table.set_q(state_key, action_key, q_value, visits=0)  # ✅ visits นับเฉพาะการอัปเดตในงานนี้
+
+    rows, cols = grid_size
+    grid = [['0' for _ in range(cols)] for _ in range(rows)]
+    grid[e_position[0]][e_position[1]] = 'E'
+
+    start_time = time.perf_counter()
+    if batch_size:
+        best_grid, best_score = train_ai_batched(episodes, grid, e_position, batch_size)
+    else:
+        best_grid, best_score = train_ai(episodes, grid, e_position)
+    elapsed = time.perf_counter() - start_time
+
+    delta = [entry for entry in q_table.entries() if entry[3]]
+    return grid_size, e_position, best_grid, best_score, delta, elapsed
+
+def _train_job_star(args):
+    return train_job(*args)
+
+def merge_q_deltas(deltas):
+    """ ✅ รวม delta จากหลาย worker เข้า Q-Table หลัก ด้วยค่าเฉลี่ยถ่วงน้ำหนักตามจำนวนครั้งที่อัปเดตในแต่ละงาน
+
+    ทุกงานเริ่มจาก Q-Table หลัก (warm start) ค่าจาก worker จึงรวมค่าเดิมไว้แล้ว: ค่าใหม่ = ค่าเฉลี่ยของ worker
+    และจำนวนครั้งที่อัปเดตบวกเพิ่มจากของเดิม
+    """
+    totals = {}
+    for delta in deltas:
+        for state_key, action_key, q_value, visits in delta:
+            weighted, count = totals.get((state_key, action_key), (0.0, 0))
+            totals[(state_key, action_key)] = (weighted + q_value * visits, count + visits)
+
+    with q_table_lock:
+        for (state_key, action_key), (weighted, count) in totals.items():
+            visits = q_table.get_visits(state_key, action_key) + count
+            q_table.set_q(state_key, action_key, round(weighted / count, 4), visits=visits)
+            if track_changes:
+                mark_changed(state_key, action_key)
 
+    logger.info("🔀 รวม Q-Table จาก %s งาน: %s entries, ตอนนี้มี %s states", len(deltas), len(totals), len(q_table))
+
+def _warm_start_entries(grid_sizes):
+    """ ✅ ส่วนของ Q-Table หลักแยกตามขนาด Grid สำหรับ warm start ของ worker (array เป็นสำเนา) """
+    entries = {}
+    with q_table_lock:
+        for size in grid_sizes:
+            matrix = q_table.matrices.get(tuple(size))
+            if matrix is not None and len(matrix):
+                state_keys, actions, values, _ = matrix.entries_in_range(0, matrix.slot_limit)
+                entries[tuple(size)] = (state_keys, actions.tolist(), values.tolist())
+    return entries
+
+def _run_jobs(jobs, num_workers, warm):
+    """ ✅ รันงานทั้งหมดใน Pool ขนาด `num_workers` yield ผลของแต่ละงานตามลำดับที่เสร็จ """
+    with multiprocessing.Pool(processes=num_workers, initializer=_init_train_worker, initargs=(warm,)) as pool:
+        yield from pool.imap_unordered(_train_job_star, jobs)
+
+def train_ai_parallel(grid_sizes, num_workers=None, episodes=EPISODES, batch_size=BATCH_SIZE, compare_serial=False):
+    """ ✅ ฝึก AI แบบขนาน: แยกงานตาม (ขนาด Grid, ตำแหน่ง E) แต่ละงานรันใน process ของตัวเอง
+
+    ทุกงานเริ่มจาก Q-Table หลัก (ส่วนของขนาด Grid นั้น) และฝึกบน Grid ว่างที่วาง E แล้ว
+    คืน {ขนาด Grid: {ตำแหน่ง E: (best_grid, best_score)}}
+    speedup ที่รายงานเป็นค่าประมาณ (ผลรวมเวลาของแต่ละงาน / เวลาจริง ซึ่งสูงเกินจริงเมื่องานแย่ง CPU กัน)
+    ถ้า `compare_serial` จะรันงานชุดเดียวกันอีกรอบด้วย worker เดียว (ไม่รวมผล) แล้วรายงาน speedup ที่วัดจริง
+    งบหน่วยความจำ (MAX_MEMORY_USAGE) แบ่งเท่าๆ กันให้ worker แต่ละตัวและ process หลัก (Q-Table ที่โหลดไว้และ delta ที่รวม)
+    """
+    positions = [(size, e_position) for size in grid_sizes for e_position in get_edge_positions(*size)]
+    num_workers = max(1, min(num_workers or NUM_WORKERS or cpu_count(), cpu_count(), len(positions)))
+    budget = SYSTEM_CONFIG['MAX_MEMORY_USAGE'] / (num_workers + 1)
+    jobs = [(size, e_position, episodes, run_mode['NAME'], batch_size, budget) for size, e_position in positions]
+    warm = _warm_start_entries(grid_sizes)
+    logger.info("🔄 เริ่มการฝึก AI แบบขนาน: %s งาน (ใช้ %s CPU core, งบหน่วยความจำ %.0f MB ต่อ process) | "
+                "warm start %s entries", len(jobs), num_workers, budget / (1024 * 1024),
+                sum(len(values) for _, _, values in warm.values()))
+
+    best_results = {size: {} for size in grid_sizes}
+    deltas = []
+    job_time = 0.0
+    start_time = time.perf_counter()
+
+    for size, e_position, best_grid, best_score, delta, elapsed in _run_jobs(jobs, num_workers, warm):
+        best_results[size][e_position] = (best_grid, best_score)
+        deltas.append(delta)
+        job_time += elapsed
+        logger.info("✅ เสร็จสิ้น Grid %s, E ที่ %s | คะแนน %s | %.2f วินาที | delta %s entries",
+                    size, (e_position[0] + 1, e_position[1] + 1), best_score, elapsed, len(delta))
+
+    wall_time = time.perf_counter() - start_time
+    logger.info("⚡ ใช้เวลา %.2f วินาที ด้วย %s worker | speedup โดยประมาณ %.2fx (ผลรวมเวลาต่องาน %.2f วินาที)",
+                wall_time, num_workers, job_time / wall_time if wall_time else float('inf'), job_time)
+
+    if compare_serial:
+        start_time = time.perf_counter()
+        for _ in _run_jobs(jobs, 1, warm):
+            pass
+        serial_time = time.perf_counter() - start_time
+        logger.info("⚡ รันทีละงาน (worker เดียว) ใช้เวลา %.2f วินาที | speedup ที่วัดจริง %.2fx",
+                    serial_time, serial_time / wall_time if wall_time else float('inf'))
+
+    merge_q_deltas(deltas)
     return best_results
 
 # =========================================================
@@ -699,7 +837,29 @@ def measure_execution_time(function, *args, **kwargs):
 # 📌 8️⃣ ส่วน `main()` สำหรับรันโปรแกรม
 # =========================================================
 
-if __name__ == "__main__":
+def positive_int(text):
+    """ ✅ type ของ argparse: จำนวนเต็มตั้งแต่ 1 ขึ้นไป """
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"ต้องเป็นจำนวนเต็มตั้งแต่ 1 ขึ้นไป: {text}")
+    return value
+
+def main(argv=None):
+    """ ✅ จุดเริ่มโปรแกรม: ฝึก AI ทุกขนาด Grid ใน config แล้วบันทึก Q-Table """
+    global q_table
+
+    parser = argparse.ArgumentParser(description="ฝึก AI วางผังหมู่บ้านด้วย Q-Learning")
+    parser.add_argument("--mode", choices=sorted(RUN_MODES), default=RUN_MODE,
+                        help="demo = แสดงทุกขั้นตอนพร้อมหน่วงเวลา, fast = ฝึกจริงแบบเงียบ")
+    parser.add_argument("--workers", type=positive_int, default=NUM_WORKERS,
+                        help="จำนวน process สำหรับฝึกแบบขนาน (ค่าเริ่มต้น: ทุก core)")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE,
+                        help="ฝึกทีละ K Episode พร้อมกันด้วย batch_env (ค่าเริ่มต้น: ทีละ Episode)")
+    parser.add_argument("--compare-serial", action="store_true",
+                        help="รันงานชุดเดียวกันซ้ำด้วย worker เดียวเพื่อวัด speedup จริง (ใช้เวลาเพิ่ม)")
+    args = parser.parse_args(argv)
+    set_run_mode(args.mode)
+
     start_time = time.perf_counter()  # ⏳ เริ่มจับเวลา
     train_time = 0  # กำหนดค่าเริ่มต้น
 
@@ -715,20 +875,23 @@ if __name__ == "__main__":
         load_q_table()
         if not q_table:
             print("⚠️ Q-Table ว่างเปล่า! AI ต้องเริ่มเรียนรู้ใหม่")
-            q_table = {}
+            q_table = QTable()
         else:
             print(f"✅ Q-Table Loaded: มี {len(q_table)} states")
 
         # ✅ Clean Q-Table ก่อนฝึก
         print(f"🔍 ก่อน Clean: Q-Table มี {len(q_table)} states")
         clean_q_table()
+        get_q_store().flush(q_table, q_table_lock)
         print(f"🔍 หลัง Clean: Q-Table มี {len(q_table)} states")
 
         # ✅ ฝึก AI และจับเวลาฝึก
         print("\n📌 เริ่มการฝึก AI สำหรับทุกขนาดกริด...")
         try:
             train_start_time = time.perf_counter()
-            raw_results = train_ai_parallel(grid_sizes)  # ✅ ฝึก AI ที่นี่ครั้งเดียว
+            raw_results = train_ai_parallel(grid_sizes, num_workers=args.workers, batch_size=args.batch,
+                                            compare_serial=args.compare_serial)  # ✅ ฝึก AI ที่นี่ครั้งเดียว
+            get_q_store().flush(q_table, q_table_lock)  # ✅ บันทึก Q-Table ที่รวมจากทุก worker
             train_end_time = time.perf_counter()
             train_time = train_end_time - train_start_time  # ⏳ เวลาที่ใช้ฝึก AI
         except Exception as e:
@@ -766,8 +929,8 @@ if __name__ == "__main__":
         try:
             backups = list_backups()
             if backups:
-                latest_backup = backups[0]['filename'].split('_')[1].split('.')[0]
-                restore_backup(latest_backup)
+                if not restore_backup(backups[0]['timestamp']):  # ✅ list_backups เรียงใหม่สุดก่อน
+                    raise RuntimeError(f"กู้คืนสำรอง {backups[0]['timestamp']} ไม่สำเร็จ")
                 print("✅ กู้คืนข้อมูลจากสำรองล่าสุดสำเร็จ")
             else:
                 print("⚠️ ไม่มีไฟล์สำรองข้อมูล")
@@ -789,3 +952,6 @@ if __name__ == "__main__":
         print(f"🚀 เวลาที่ใช้ฝึก AI: {train_time:.2f} วินาที")
         print(f"📊 เวลาที่ใช้ตรวจสอบ Q-Table: {check_time:.2f} วินาที")
         print("\n✨ จบการทำงานของโปรแกรม")
+
+if __name__ == "__main__":
+    main()
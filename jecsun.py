@@ -1,11 +1,11 @@
 import numpy as np
 import random
-import json
-import os
-import glob
-import pandas as pd
 from collections import deque
 import time
+from grid_codec import pack_grid, encode_action
+from map_index import get_map_index, scorer_version
+from reward_cache import cached_reward
+from profit_utils import HOUSE_PRICES, analyze_profit, format_profit_report, market_ratios, assign_house_types
 
 # Grid Settings
 GRID_ROWS = 3
@@ -17,28 +17,16 @@ SCORES = {'E': 10, 'G': 10, 'H': 15, 'R': 5, '0': 0}
 Q_TABLE_FILE = "q_table.json"
 E_START_POSITION = (1, 1)
 
-# House Price Settings
-HOUSE_PRICES = {
-    'H1': {'cost': 1_800_000, 'sale': 3_300_000, 'size': 110, 'weight': 1.3},
-    'H2': {'cost': 1_900_000, 'sale': 3_700_000, 'size': 125, 'weight': 1.1},
-    'H3': {'cost': 2_300_000, 'sale': 4_300_000, 'size': 160, 'weight': 1.0},
-    'H4': {'cost': 3_000_000, 'sale': 5_200_000, 'size': 200, 'weight': 0.9},
-}
-
 # CSV Loading
 csv_folder = "data/maps/CSV/goodcsv"
-csv_files = glob.glob(f"{csv_folder}/**/*.csv", recursive=True)
-
-# Optimize house type ratios
-def optimize_ratios():
-    ratios = {}
-    total_score = sum((p['sale'] - p['cost']) * p['weight'] for p in HOUSE_PRICES.values())
-    for htype, data in HOUSE_PRICES.items():
-        score = (data['sale'] - data['cost']) * data['weight']
-        ratios[htype] = score / total_score
-    return ratios
 
-H_TYPE_RATIOS = optimize_ratios()
+# House type assignment: market ratios are the fallback mix when the MILP assignment is unavailable
+H_TYPE_RATIOS = market_ratios(HOUSE_PRICES)
+# Caps keep a mix of types; edge bonuses (Baht) prefer larger houses on edge cells
+HOUSE_TYPE_RULES = {
+    'max_share': 0.35,
+    'edge_bonus': {'H3': 50_000, 'H4': 100_000},
+}
 
 # Calculate reward score
 def calculate_reward_verbose(grid):
@@ -168,26 +156,7 @@ def count_r_clusters(grid, use_dfs=False):
     return clusters
 
 def apply_house_types(grid):
-    h_positions = [(r, c) for r in range(len(grid)) for c in range(len(grid[0])) if grid[r][c] == 'H']
-    total_h = len(h_positions)
-    if total_h == 0:
-        return grid
-
-    house_counts = {htype: int(ratio * total_h) for htype, ratio in H_TYPE_RATIOS.items()}
-    while sum(house_counts.values()) < total_h:
-        for htype in house_counts:
-            house_counts[htype] += 1
-            if sum(house_counts.values()) == total_h:
-                break
-
-    house_sequence = []
-    for htype, count in house_counts.items():
-        house_sequence.extend([htype] * count)
-
-    for (r, c), htype in zip(h_positions, house_sequence):
-        grid[r][c] = htype
-
-    return grid
+    return assign_house_types(grid, HOUSE_PRICES, fallback_ratios=H_TYPE_RATIOS, **HOUSE_TYPE_RULES)
 
 def initialize_grid(rows, cols, e_position):
     print(f"Creating blank {rows}x{cols} grid, placing E at {e_position} (1-based index)")
@@ -223,30 +192,16 @@ def initialize_grid(rows, cols, e_position):
 
 def load_or_initialize_grid(csv_folder, rows, cols, e_position):
     print(f"Searching CSVs {rows}x{cols} with E at {e_position}")
-    csv_files = glob.glob(f"{csv_folder}/**/*.csv", recursive=True)
-
-    if not csv_files:
+    # Indexed lookup: only new/modified CSVs are read and scored
+    map_index = get_map_index()
+    if not map_index.refresh(csv_folder):
         print("No CSVs found! Creating new grid.")
         return initialize_grid(rows, cols, e_position)
 
-    best_grid = None
-    best_score = float('-inf')
-
-    for file in csv_files:
-        df = pd.read_csv(file, header=None)
-        if df.shape != (rows, cols):
-            continue
-        grid_from_csv = df.astype(str).values.tolist()
-        e_found = [(r+1, c+1) for r in range(len(grid_from_csv)) for c in range(len(grid_from_csv[0])) if grid_from_csv[r][c] == 'E']
-        if not e_found or e_found[0] != e_position:
-            continue
-
-        score = calculate_reward_verbose(grid_from_csv)
-        if score > best_score:
-            best_score = score
-            best_grid = grid_from_csv
-
-    if best_grid is not None:
+    e_index = (e_position[0] - 1, e_position[1] - 1)
+    version = scorer_version(SCORES, calculate_reward_verbose)
+    for best_grid, best_score in map_index.best_maps(rows, cols, e_index, scorer="jecsun",
+                                                     score_fn=calculate_reward_verbose, version=version):
         return best_grid, e_position
     return initialize_grid(rows, cols, e_position)
 
@@ -283,9 +238,10 @@ def choose_action(grid, e_position=(1,1), epsilon=0.1):
 
 
 def update_q_table(state, action, reward, next_state):
-    state_str = json.dumps(state)
-    action_str = str(tuple(action))
-    next_state_str = json.dumps(next_state)
+    # Q-Table keys: packed 3-bit grid codes (int) and encoded actions (int)
+    state_str = pack_grid(state)
+    action_str = encode_action(*action, cols=len(state[0]))
+    next_state_str = pack_grid(next_state)
 
     if state_str not in q_table:
         q_table[state_str] = {}
@@ -295,7 +251,9 @@ def update_q_table(state, action, reward, next_state):
     max_future_q = max(q_table.get(next_state_str, {}).values() or [0])
     q_table[state_str][action_str] = (1 - ALPHA) * q_table[state_str][action_str] + ALPHA * (reward + GAMMA * max_future_q)
 
-def train_ai(episodes, grid):
+def train_ai(episodes, grid, e_position=None, progress=None, progress_every=100):
+    # progress(episodes_done, best_grid, best_score) is called every `progress_every` episodes and at the end
+    e_position = e_position or new_e_position
     best_grid = None
     best_score = float('-inf')
 
@@ -306,20 +264,23 @@ def train_ai(episodes, grid):
         max_steps = rows * cols
 
         for _ in range(max_steps):
-            action = choose_action(state, new_e_position)
+            action = choose_action(state, e_position)
             if action is None:
                 break
             r, c, char = action
             state[r][c] = char
-            reward = calculate_reward_verbose(state)
+            reward = cached_reward(state, calculate_reward_verbose, name="jecsun")
             update_q_table(state, action, reward, state)
 
-        total_reward = calculate_reward_verbose(state)
+        total_reward = cached_reward(state, calculate_reward_verbose, name="jecsun")
 
         if total_reward > best_score:
             best_score = total_reward
             best_grid = [row[:] for row in state]
 
+        if progress and ((episode + 1) % progress_every == 0 or episode + 1 == episodes):
+            progress(episode + 1, best_grid, best_score)
+
     return best_grid, best_score
 
 def measure_execution_time(function, *args, **kwargs):
@@ -329,61 +290,29 @@ def measure_execution_time(function, *args, **kwargs):
     elapsed_time = end_time - start_time
     return *result, elapsed_time
 
-def analyze_profit(grid):
-    summary = {k: 0 for k in HOUSE_PRICES}
-    total_cost = total_sale = total_size = weighted_profit = 0
-
-    for row in grid:
-        for cell in row:
-            if cell in HOUSE_PRICES:
-                info = HOUSE_PRICES[cell]
-                summary[cell] += 1
-                total_cost += info['cost']
-                total_sale += info['sale']
-                total_size += info['size']
-                weighted_profit += (info['sale'] - info['cost']) * info['weight']
-
-    total_profit = total_sale - total_cost
-    avg_profit_per_sqm = total_profit / total_size if total_size else 0
-
-    print("\n📋 House Type Summary:\n")
-    print("House Type | Number of Units | Cost/Unit | Sale/Unit | Profit/Unit | Total Cost | Total Profit")
-    print("-" * 120)
-
-    total_units = sum(summary.values())
-    for htype, count in summary.items():
-        if count:
-            info = HOUSE_PRICES[htype]
-            cost_per_unit = info['cost']
-            sale_per_unit = info['sale']
-            profit_per_unit = sale_per_unit - cost_per_unit
-            total_cost_type = cost_per_unit * count
-            total_profit_type = profit_per_unit * count
-
-            print(f"🏠 {htype} | {count} units | {cost_per_unit:,.0f} Baht | {sale_per_unit:,.0f} Baht | {profit_per_unit:,.0f} Baht | {total_cost_type:,.0f} Baht | {total_profit_type:,.0f} Baht")
-
-    print("\n💸 Total Construction Cost:", f"{total_cost:,} Baht")
-    print("💰 Total Revenue:", f"{total_sale:,} Baht")
-    print("📈 Total Profit:", f"{total_profit:,} Baht")
-    print("📐 Average Profit per sqm:", f"{avg_profit_per_sqm:,.2f} Baht/sqm")
-    print("🎯 Weighted Profit (Market Preference):", f"{weighted_profit:,.2f} Baht")
-
-# Start execution
+# Library state: Q-table shared by update_q_table, default E position for train_ai
 q_table = {}
+new_e_position = E_START_POSITION
+
+def main():
+    global new_e_position
+
+    grid, new_e_position = initialize_grid(GRID_ROWS, GRID_COLS, E_START_POSITION)
+    grid, _ = load_or_initialize_grid(csv_folder, GRID_ROWS, GRID_COLS, new_e_position)
 
-grid, new_e_position = initialize_grid(GRID_ROWS, GRID_COLS, E_START_POSITION)
-grid, _ = load_or_initialize_grid(csv_folder, GRID_ROWS, GRID_COLS, new_e_position)
+    best_grid, best_score, execution_time = measure_execution_time(train_ai, EPISODES, grid)
+    final_layout = apply_house_types([row[:] for row in best_grid])
 
-best_grid, best_score, execution_time = measure_execution_time(train_ai, EPISODES, grid)
-final_layout = apply_house_types([row[:] for row in best_grid])
+    print("\n🏆 Best Layout Found:")
+    for row in best_grid:
+        print(" ".join(row))
+    print(f"\n✅ Best Score Achieved: {best_score}")
 
-print("\n🏆 Best Layout Found:")
-for row in best_grid:
-    print(" ".join(row))
-print(f"\n✅ Best Score Achieved: {best_score}")
+    print("\n📌 Final Layout with House Types:")
+    for row in final_layout:
+        print(" ".join(row))
 
-print("\n📌 Final Layout with House Types:")
-for row in final_layout:
-    print(" ".join(row))
+    print(format_profit_report(analyze_profit(final_layout)))
 
-analyze_profit(final_layout)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+ไฟล์ผังที่ดีที่สุดที่คำนวณไว้ล่วงหน้า (อ่านอย่างเดียว) สำหรับ Dashboard
+สร้างครั้งเดียวแบบ offline ด้วย layout_solver ครอบคลุมทุกขนาด Grid ที่ slider เลือกได้ (3-7 x 3-7) และทุกตำแหน่ง E ขอบ
+Dashboard โหลดไฟล์ตอนเริ่มและตอบได้ทันทีด้วย dict lookup ฝึก AI สดเฉพาะเมื่อไม่มีไฟล์หรือไฟล์ไม่ตรงเวอร์ชัน
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import argparse
+
+import numpy as np
+
+from config import SYSTEM_CONFIG
+from grid_codec import CODE_TO_CELL, encode_grid
+from grid_topology import get_topology
+from layout_solver import PROFILES, LayoutTable, solve_shape, parse_size
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FORMAT = 1
+MAX_SIDE = 7  # ✅ Grid ใหญ่สุดที่ Dashboard เลือกได้ (และที่ grid_codec รองรับ)
+DASHBOARD_SIZES = tuple((rows, cols) for rows in range(3, MAX_SIDE + 1) for cols in range(3, MAX_SIDE + 1))
+EXACT_MAX_CELLS = 25  # ✅ Grid ที่ไม่เกินขนาดนี้ค้นหาแบบแม่นยำจนจบ ใหญ่กว่านี้จำกัดเวลา
+
+
+def artifact_version(profile='dashboard'):
+    """ ✅ เวอร์ชันของไฟล์ = hash ของรูปแบบไฟล์และน้ำหนักคะแนนใน profile (เปลี่ยนคะแนนแล้วไฟล์เก่าถือว่าหมดอายุ) """
+    payload = json.dumps({'format': ARTIFACT_FORMAT, 'profile': PROFILES[profile]}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+class LayoutArtifact:
+    """ ✅ ตารางผังที่ดีที่สุดในหน่วยความจำ: (rows, cols, e_row, e_col) → {grid, score, optimal}
+
+    ตำแหน่ง E เริ่มที่ 0 (เหมือน layout_solver)
+    """
+
+    def __init__(self, version, profile, entries):
+        self.version = version
+        self.profile = profile
+        self.entries = entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def load(cls, path=None):
+        """ ✅ โหลดจากไฟล์ .npz (ไม่ใช้ pickle) """
+        with np.load(path or SYSTEM_CONFIG['LAYOUT_ARTIFACT_FILE'], allow_pickle=False) as data:
+            keys = data['keys'].tolist()
+            grids = data['grids']
+            scores = data['scores'].tolist()
+            optimal = data['optimal'].tolist()
+            version, profile = str(data['version']), str(data['profile'])
+
+        entries = {}
+        for i, (rows, cols, e_row, e_col) in enumerate(keys):
+            grid = CODE_TO_CELL[grids[i, :rows, :cols]].tolist()
+            entries[(rows, cols, e_row, e_col)] = {'grid': grid, 'score': scores[i], 'optimal': optimal[i]}
+        return cls(version, profile, entries)
+
+    def is_current(self):
+        return self.version == artifact_version(self.profile)
+
+    def lookup(self, rows, cols, e_position):
+        """ ✅ ผังที่ดีที่สุด (dict: grid เป็น list ของแถว, score, optimal) หรือ None ถ้าไม่มีในไฟล์ """
+        entry = self.entries.get((rows, cols, *e_position))
+        if entry is None:
+            return None
+        return {'grid': [row[:] for row in entry['grid']], 'score': entry['score'], 'optimal': entry['optimal']}
+
+def load_layout_artifact(path=None, profile='dashboard'):
+    """ ✅ โหลดไฟล์ผังที่ดีที่สุด คืน None ถ้าไม่มีไฟล์ อ่านไม่ได้ หรือเวอร์ชันไม่ตรงกับคะแนนปัจจุบัน """
+    path = path or SYSTEM_CONFIG['LAYOUT_ARTIFACT_FILE']
+    if not os.path.exists(path):
+        logger.info("ℹ️ ไม่พบไฟล์ผังที่ดีที่สุด %s", path)
+        return None
+    try:
+        artifact = LayoutArtifact.load(path)
+    except (OSError, KeyError, ValueError) as e:
+        logger.warning("⚠️ อ่านไฟล์ผังที่ดีที่สุด %s ไม่ได้: %s", path, e)
+        return None
+    if artifact.profile != profile or not artifact.is_current():
+        logger.warning("⚠️ ไฟล์ผังที่ดีที่สุด %s หมดอายุ (profile %s, เวอร์ชัน %s)", path, artifact.profile, artifact.version)
+        return None
+    return artifact
+
+def build_artifact(path=None, sizes=DASHBOARD_SIZES, profile='dashboard', table=None, time_limit=10.0,
+                   restarts=100):
+    """ ✅ คำนวณผังที่ดีที่สุดของทุกขนาดใน `sizes` และทุกตำแหน่ง E ขอบ แล้วเขียนไฟล์ .npz
+
+    Grid ไม่เกิน EXACT_MAX_CELLS ช่องค้นหาจนได้คำตอบที่ดีที่สุดจริง (optimal)
+    Grid ใหญ่กว่านั้นใช้ local_search + ค้นหาต่อไม่เกิน `time_limit` วินาทีต่อตำแหน่ง E (optimal = False)
+    ผลทั้งหมดถูกเก็บในตาราง LayoutTable ด้วย จึงสร้างใหม่ได้เร็วเมื่อเพิ่มขนาด
+    """
+    path = path or SYSTEM_CONFIG['LAYOUT_ARTIFACT_FILE']
+    table = table or LayoutTable()
+    start_time = time.perf_counter()
+
+    keys, grids, scores, optimal = [], [], [], []
+    for rows, cols in sizes:
+        exact = rows * cols <= EXACT_MAX_CELLS
+        results = solve_shape(rows, cols, profile, table, time_limit=None if exact else time_limit,
+                              restarts=restarts)
+        for e_position in get_topology(rows, cols).edge_positions:
+            result = results[e_position]
+            padded = np.zeros((MAX_SIDE, MAX_SIDE), dtype=np.uint8)
+            padded[:rows, :cols] = encode_grid(result['grid'])
+            keys.append((rows, cols, *e_position))
+            grids.append(padded)
+            scores.append(result['score'])
+            optimal.append(result['optimal'])
+        logger.info("📐 Grid %sx%s: %s ตำแหน่ง E | %.1f วินาทีสะสม", rows, cols, len(results),
+                    time.perf_counter() - start_time)
+
+    version = artifact_version(profile)
+    np.savez_compressed(path, version=np.array(version), profile=np.array(profile),
+                        keys=np.array(keys, dtype=np.int16), grids=np.stack(grids),
+                        scores=np.array(scores, dtype=np.int32), optimal=np.array(optimal, dtype=bool))
+    logger.info("💾 บันทึก %s (%s ผัง, optimal %s, เวอร์ชัน %s)", path, len(keys), sum(optimal), version)
+    return path
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description="สร้างไฟล์ผังที่ดีที่สุดสำหรับ Dashboard")
+    parser.add_argument("--sizes", nargs="+", type=parse_size, default=list(DASHBOARD_SIZES), help="เช่น 3x3 4x5")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="dashboard")
+    parser.add_argument("--output", default=None, help="ค่าเริ่มต้น SYSTEM_CONFIG['LAYOUT_ARTIFACT_FILE']")
+    parser.add_argument("--time-limit", type=float, default=10.0, help="วินาทีต่อตำแหน่ง E ของ Grid ใหญ่")
+    args = parser.parse_args()
+    build_artifact(args.output, args.sizes, args.profile, time_limit=args.time_limit)
@@ -0,0 +1,489 @@
+"""
+ตัวหาผังที่ดีที่สุดแบบแม่นยำ (branch-and-bound) สำหรับ Grid ขนาดเล็ก (ถึงประมาณ 5x5)
+ใช้เป็นคำตอบอ้างอิง: เก็บผังและคะแนนสูงสุดของทุก (ขนาด Grid, ตำแหน่ง E) ไว้ในตาราง SQLite
+ให้ Dashboard ตอบได้ทันที และใช้วัดคุณภาพของ AI ที่ฝึกเทียบกับคำตอบที่ดีที่สุดจริง
+"""
+
+import time
+import random
+import sqlite3
+import logging
+import argparse
+import threading
+
+import numpy as np
+
+from config import SYSTEM_CONFIG
+from grid_topology import get_topology
+from reward_calculator import get_scores_config
+from symmetry_utils import SCORE_PRESERVING_SYMMETRIES, transform_grid, transform_cell
+
+logger = logging.getLogger(__name__)
+
+BUILDINGS = ('H', 'R', 'G')  # ✅ ทุกช่องยกเว้น E ถูกวางอาคาร (เหมือน train_ai ที่วางจนเต็ม Grid)
+
+# ✅ น้ำหนักของแต่ละเงื่อนไขใน reward แยกตามตัวให้คะแนน
+# 'trainer' = reward_calculator.calculate_reward_verbose (โบนัส H ติดขอบถูกนับสองครั้ง = 100)
+# 'dashboard' = jecsun.calculate_reward_verbose
+# ตรวจว่าตรงกับฟังก์ชันจริงได้ด้วย check_profile()
+PROFILES = {
+    'trainer': {
+        'base': dict(get_scores_config()),
+        'edge_house': 100,
+        'patterns': [('h', 'HHH', 100), ('h', 'RRR', 100), ('v', 'HRH', 100)],
+        'house_unconnected': 300,
+        'e_unconnected': 1000,
+        'road_clusters': 500,
+        'no_road': 1000,
+        'green_low': 500,
+        'green_high': 500,
+        'fewer_houses': 0,
+    },
+    'dashboard': {
+        'base': {'E': 10, 'G': 10, 'H': 15, 'R': 5, '0': 0},
+        'edge_house': 50,
+        'patterns': [('h', 'HHH', 100), ('h', 'RRR', 100), ('v', 'HRH', 100),
+                     ('h', 'HRH', 50), ('v', 'HHH', 50), ('v', 'RRR', 50)],
+        'house_unconnected': 1000,
+        'e_unconnected': 1000,
+        'road_clusters': 500,
+        'no_road': 1000,
+        'green_low': 1000,
+        'green_high': 500,
+        'fewer_houses': 1500,
+    },
+}
+
+def green_penalty(num_green, total_cells, profile):
+    """ ✅ ค่าปรับสัดส่วนพื้นที่สีเขียว (< 5% หรือ > 20%) """
+    ratio = num_green / total_cells
+    return -(profile['green_low'] if ratio < 0.05 else 0) - (profile['green_high'] if ratio > 0.20 else 0)
+
+def count_road_clusters(cells, topology):
+    """ ✅ นับกลุ่มถนนจาก list ตัวอักษรแบบแบน """
+    seen = [False] * topology.size
+    clusters = 0
+    for start, cell in enumerate(cells):
+        if cell != 'R' or seen[start]:
+            continue
+        clusters += 1
+        seen[start] = True
+        stack = [start]
+        while stack:
+            for n in topology.neighbors[stack.pop()]:
+                if cells[n] == 'R' and not seen[n]:
+                    seen[n] = True
+                    stack.append(n)
+    return clusters
+
+def profile_score(grid, profile='trainer'):
+    """ ✅ คะแนนของ Grid ตามน้ำหนักใน profile (ให้ผลเท่ากับฟังก์ชันคะแนนจริงของ profile นั้น) """
+    profile = PROFILES[profile] if isinstance(profile, str) else profile
+    grid = np.asarray(grid).astype(str)
+    rows, cols = grid.shape
+    topology = get_topology(rows, cols)
+    cells = grid.ravel().tolist()
+
+    score = sum(profile['base'].get(cell, 0) for cell in cells)
+    score += profile['edge_house'] * sum(1 for i, cell in enumerate(cells) if cell == 'H' and topology.is_edge[i])
+    for direction, pattern, weight in profile['patterns']:
+        for a, b, c in topology.window_index[direction].tolist():
+            if cells[a] + cells[b] + cells[c] == pattern:
+                score += weight
+    for i, cell in enumerate(cells):
+        if cell in ('H', 'E') and not any(cells[n] == 'R' for n in topology.neighbors[i]):
+            score -= profile['house_unconnected'] if cell == 'H' else profile['e_unconnected']
+    clusters = count_road_clusters(cells, topology)
+    if clusters > 1:
+        score -= profile['road_clusters'] * clusters
+    elif clusters == 0:
+        score -= profile['no_road']
+    score += green_penalty(cells.count('G'), rows * cols, profile)
+    if cells.count('H') < cells.count('R'):
+        score -= profile['fewer_houses']
+    return int(score)
+
+def check_profile(profile, score_fn, shapes=((3, 3), (3, 4), (4, 4), (5, 5)), samples=300, seed=0):
+    """ ✅ ตรวจว่า profile ให้คะแนนเท่ากับ score_fn บน Grid สุ่ม คืน list ของ Grid ที่ไม่ตรง (ว่าง = ตรงทั้งหมด) """
+    rng = random.Random(seed)
+    mismatches = []
+    for rows, cols in shapes:
+        for _ in range(samples):
+            grid = np.array([[rng.choice('0EHRG') for _ in range(cols)] for _ in range(rows)])
+            if profile_score(grid, profile) != score_fn(grid):
+                mismatches.append(grid)
+    return mismatches
+
+
+def local_search(rows, cols, e_position, profile='trainer', restarts=10, seed=0):
+    """ ✅ หาผังที่ดีแบบเร็ว (ไม่รับประกันว่าดีที่สุด): hill climbing เปลี่ยนทีละช่อง + สุ่มรบกวนผังที่ดีที่สุดแล้วเริ่มใหม่
+
+    ใช้เป็นคำตอบตั้งต้นของ LayoutSolver และเป็นคำตอบของ Grid ใหญ่ที่ค้นหาแบบแม่นยำไม่ทัน
+    คืน (grid เป็น list ของแถว, score)
+    """
+    profile = PROFILES[profile] if isinstance(profile, str) else profile
+    rng = random.Random(seed)
+    e_index = e_position[0] * cols + e_position[1]
+    free = [i for i in range(rows * cols) if i != e_index]
+
+    def score_of(cells):
+        return profile_score(np.array(cells).reshape(rows, cols), profile)
+
+    def climb(cells):
+        score = score_of(cells)
+        improved = True
+        while improved:
+            improved = False
+            for i in rng.sample(free, len(free)):
+                current = cells[i]
+                for building in BUILDINGS:
+                    if building == current:
+                        continue
+                    cells[i] = building
+                    candidate = score_of(cells)
+                    if candidate > score:
+                        score, current, improved = candidate, building, True
+                cells[i] = current
+        return score
+
+    best_cells, best_score = None, float('-inf')
+    for restart in range(restarts):
+        if best_cells is None or restart % 2 == 0:
+            cells = [rng.choice(BUILDINGS) for _ in range(rows * cols)]
+        else:
+            cells = list(best_cells)
+            for i in rng.sample(free, max(2, len(free) // 5)):
+                cells[i] = rng.choice(BUILDINGS)
+        cells[e_index] = 'E'
+        score = climb(cells)
+        if score > best_score:
+            best_cells, best_score = cells, score
+    return [best_cells[r * cols:(r + 1) * cols] for r in range(rows)], best_score
+
+
+class SearchLimitReached(Exception):
+    """ ✅ ใช้หยุดการค้นหาเมื่อเกินจำนวน node หรือเวลาที่กำหนด """
+
+
+class LayoutSolver:
+    """ ✅ ค้นหาแบบ DFS ทีละช่อง (H/R/G) พร้อมขอบเขตบน (upper bound) ที่ไม่ต่ำกว่าคะแนนจริง
+
+    ขอบเขตบนของแต่ละ node = คะแนนส่วนที่รู้แน่นอนแล้ว + ค่าสูงสุดที่เป็นไปได้ของส่วนที่เหลือ:
+    - ช่องที่ยังว่าง: คะแนนพื้นฐาน (+ โบนัสขอบ) ของอาคารที่ดีที่สุด
+    - หน้าต่าง Pattern ที่ยังวางไม่ครบ: น้ำหนัก Pattern สูงสุดของหน้าต่างนั้น
+    - ค่าปรับ H/E ไม่ติดถนน: คิดเมื่อช่องนั้นและเพื่อนบ้านวางครบแล้วเท่านั้น
+    - ค่าปรับพื้นที่สีเขียว/จำนวนบ้าน: ค่าที่ดีที่สุดจากจำนวนช่องที่ยังเหลือ
+    ตัด branch ที่ขอบเขตบนไม่เกินคะแนนที่ดีที่สุดที่เจอแล้ว
+
+    ถ้าการกลับด้าน (ซ้าย-ขวา หรือ บน-ล่าง) ไม่ย้าย E ผังกับภาพกลับด้านมีคะแนนเท่ากัน
+    จึงค้นหาเฉพาะผังที่น้อยกว่าภาพกลับด้านตามลำดับตัวอักษร (ตรวจทุกครั้งที่วางครบหนึ่งแถว/คอลัมน์)
+
+    ไม่มี memo (transposition table) ของ state เมื่อวางครบแถว (สองแถวล่าสุด + กลุ่มถนน + จำนวน G + H-R):
+    ค่าที่บันทึกได้มีแค่ `best_score - คะแนนตอนนั้น` จึงตัดได้เฉพาะ state เดิมที่มาด้วยคะแนนไม่สูงกว่า
+    ซึ่งขอบเขตบนข้างต้นตัดไปเกือบหมดแล้ว (ลองวัดบน 4x4/4x5: node ลดราว 7% แต่ช้าลงเพราะต้องสร้าง key)
+    """
+
+    def __init__(self, rows, cols, e_position, profile='trainer', node_limit=None, time_limit=None):
+        self.rows, self.cols = rows, cols
+        self.e_position = tuple(e_position)
+        self.profile_name = profile
+        self.profile = profile = PROFILES[profile]
+        self.node_limit = node_limit
+        self.time_limit = time_limit
+        self.topology = topology = get_topology(rows, cols)
+        e_index = e_position[0] * cols + e_position[1]
+
+        # ✅ ลำดับการวาง: ทีละแถว หรือทีละคอลัมน์ถ้าการกลับบน-ล่างเป็นสมมาตรเดียวที่ไม่ย้าย E
+        fixes_lr = e_position[1] == cols - 1 - e_position[1]
+        fixes_ud = e_position[0] == rows - 1 - e_position[0]
+        if fixes_lr or not fixes_ud:
+            lines = [[r * cols + c for c in range(cols)] for r in range(rows)]
+        else:
+            lines = [[r * cols + c for r in range(rows)] for c in range(cols)]
+        self.mirror = fixes_lr or fixes_ud
+        self.lines = lines
+        self.order = [i for line in lines for i in line if i != e_index]
+        n = len(self.order)
+        pos = {i: k for k, i in enumerate(self.order)}
+        pos[e_index] = -1
+        self.line_end = {max(pos[i] for i in line): line for line in lines}
+
+        # ✅ คะแนนต่อช่อง (พื้นฐาน + โบนัส H ติดขอบ) และผลรวมค่าสูงสุดของช่องที่เหลือ
+        self.cell_values = [
+            {b: profile['base'].get(b, 0) + (profile['edge_house'] if b == 'H' and topology.is_edge[i] else 0)
+             for b in BUILDINGS}
+            for i in self.order
+        ]
+        self.try_order = [sorted(BUILDINGS, key=values.get, reverse=True) for values in self.cell_values]
+        self.cell_suffix = [0] * (n + 1)
+        for k in range(n - 1, -1, -1):
+            self.cell_suffix[k] = self.cell_suffix[k + 1] + max(self.cell_values[k].values())
+
+        # ✅ หน้าต่าง Pattern: คิดคะแนนจริงเมื่อวางช่องสุดท้ายของหน้าต่าง ก่อนหน้านั้นใช้น้ำหนักสูงสุด
+        self.complete_at = [[] for _ in range(n)]
+        window_max = [0] * (n + 1)
+        for direction in ('h', 'v'):
+            weights = {pattern: weight for d, pattern, weight in profile['patterns'] if d == direction}
+            if not weights:
+                continue
+            for window in topology.window_index[direction].tolist():
+                if e_index in window:
+                    continue  # ✅ ไม่มี Pattern ใดมี E
+                k = max(pos[i] for i in window)
+                self.complete_at[k].append((window, weights))
+                window_max[k] += max(weights.values())
+        self.window_suffix = [0] * (n + 1)
+        for k in range(n - 1, -1, -1):
+            self.window_suffix[k] = self.window_suffix[k + 1] + window_max[k]
+
+        # ✅ ช่องที่รู้แน่ว่าติดถนนหรือไม่ เมื่อวางตัวเองและเพื่อนบ้านครบแล้ว
+        self.settle_at = [[] for _ in range(n)]
+        for i in self.order + [e_index]:
+            k = max(pos[j] for j in (i,) + topology.neighbors[i])
+            self.settle_at[max(k, 0)].append(i)
+
+        # ✅ ค่าปรับพื้นที่สีเขียวที่ดีที่สุดเมื่อมี G แล้ว g ช่อง และเหลือ u ช่อง
+        total = rows * cols
+        penalties = [green_penalty(g, total, profile) for g in range(total + 1)]
+        self.green_best = [[max(penalties[g:g + u + 1]) for u in range(n + 1)] for g in range(n + 1)]
+
+        self.cells = [None] * total
+        self.cells[e_index] = 'E'
+        self.fixed_score = profile['base'].get('E', 0)
+
+    # -----------------------------------------------------
+    # ✅ การค้นหา
+    # -----------------------------------------------------
+    def solve(self, initial=None):
+        """ ✅ คืน dict: grid (list ของแถว), score, optimal (False ถ้าหยุดเพราะเกินขีดจำกัด), nodes, seconds
+
+        `initial` (ผังเต็มที่มี E ตำแหน่งเดียวกัน เช่นจาก local_search) เป็นคำตอบตั้งต้น
+        ช่วยให้ตัด branch ได้ตั้งแต่ต้น และเป็นคำตอบถ้าหยุดก่อนค้นหาครบ
+        """
+        self.best_score = float('-inf')
+        self.best_cells = None
+        if initial is not None:
+            self.best_score = profile_score(initial, self.profile)
+            self.best_cells = np.asarray(initial).astype(str).ravel().tolist()
+        self.nodes = 0
+        self.start_time = time.perf_counter()
+        optimal = True
+        try:
+            self._search(0, self.fixed_score, 0, 0, 0, self.mirror)
+        except SearchLimitReached:
+            optimal = False
+
+        seconds = time.perf_counter() - self.start_time
+        grid = None
+        if self.best_cells is not None:
+            grid = [self.best_cells[r * self.cols:(r + 1) * self.cols] for r in range(self.rows)]
+        logger.info("🧮 Solver %sx%s, E ที่ %s (%s): คะแนน %s | %s | %s nodes | %.2f วินาที",
+                    self.rows, self.cols, self.e_position, self.profile_name,
+                    self.best_score if grid else None, "optimal" if optimal else "หยุดก่อนครบ",
+                    self.nodes, seconds)
+        return {'grid': grid, 'score': int(self.best_score) if grid else None, 'optimal': optimal,
+                'nodes': self.nodes, 'seconds': seconds}
+
+    def _check_limits(self):
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise SearchLimitReached()
+        if self.time_limit is not None and time.perf_counter() - self.start_time >= self.time_limit:
+            raise SearchLimitReached()
+
+    def _search(self, k, exact, greens, houses, roads, tied):
+        """ ✅ วางช่องที่ k ของลำดับ; `exact` = คะแนนส่วนที่รู้แน่แล้ว, `tied` = ยังเท่ากับภาพกลับด้านทุกแถวที่ผ่านมา """
+        cells = self.cells
+        profile = self.profile
+        neighbors = self.topology.neighbors
+        i = self.order[k]
+        last = k == len(self.order) - 1
+        remaining = len(self.order) - k - 1
+
+        for building in self.try_order[k]:
+            self.nodes += 1
+            if not self.nodes & 0xFFF:
+                self._check_limits()
+            cells[i] = building
+            g = greens + (building == 'G')
+            h = houses + (building == 'H')
+            r = roads + (building == 'R')
+
+            score = exact + self.cell_values[k][building]
+            for (a, b, c), weights in self.complete_at[k]:
+                score += weights.get(cells[a] + cells[b] + cells[c], 0)
+            for j in self.settle_at[k]:
+                cell = cells[j]
+                if cell in ('H', 'E') and not any(cells[n] == 'R' for n in neighbors[j]):
+                    score -= profile['house_unconnected'] if cell == 'H' else profile['e_unconnected']
+
+            # ✅ ตัดผังที่มากกว่าภาพกลับด้าน (ภาพกลับด้านมีคะแนนเท่ากันและถูกค้นหาแล้ว/จะถูกค้นหา)
+            line = self.line_end.get(k)
+            still_tied = tied
+            if tied and line is not None:
+                values = [cells[j] for j in line]
+                mirrored = values[::-1]
+                if values > mirrored:
+                    continue
+                still_tied = values == mirrored
+
+            if last:
+                clusters = count_road_clusters(cells, self.topology)
+                if clusters > 1:
+                    score -= profile['road_clusters'] * clusters
+                elif clusters == 0:
+                    score -= profile['no_road']
+                score += self.green_best[g][0]
+                if h < r:
+                    score -= profile['fewer_houses']
+                if score > self.best_score:
+                    self.best_score = score
+                    self.best_cells = list(cells)
+                continue
+
+            bound = (score + self.cell_suffix[k + 1] + self.window_suffix[k + 1] + self.green_best[g][remaining]
+                     - (profile['fewer_houses'] if h + remaining < r else 0))
+            if bound > self.best_score:
+                self._search(k + 1, score, g, h, r, still_tied)
+
+        cells[i] = None
+
+
+def e_position_orbits(rows, cols, e_positions, symmetries=SCORE_PRESERVING_SYMMETRIES):
+    """ ✅ จัดกลุ่มตำแหน่ง E ที่เป็นภาพสมมาตรของกัน คืน {ตัวแทน: [(ตำแหน่ง E, ชื่อการแปลงจากตัวแทน), ...]} """
+    orbits = {}
+    assigned = set()
+    for e_position in e_positions:
+        if e_position in assigned:
+            continue
+        members = []
+        for name in symmetries:
+            moved = tuple(transform_cell(*e_position, name, (rows, cols)))
+            if moved not in assigned:
+                assigned.add(moved)
+                members.append((moved, name))
+        orbits[e_position] = members
+    return orbits
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS optimal_layouts (
+    profile TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    cols INTEGER NOT NULL,
+    e_row INTEGER NOT NULL,
+    e_col INTEGER NOT NULL,
+    grid TEXT,
+    score INTEGER,
+    optimal INTEGER NOT NULL,
+    nodes INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    PRIMARY KEY (profile, rows, cols, e_row, e_col)
+);
+"""
+
+class LayoutTable:
+    """ ✅ ตารางผังที่ดีที่สุดต่อ (profile, ขนาด Grid, ตำแหน่ง E) บน SQLite """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or SYSTEM_CONFIG['OPTIMAL_LAYOUTS_FILE']
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+
+    def get(self, rows, cols, e_position, profile='trainer'):
+        """ ✅ ผลที่บันทึกไว้ (dict เหมือน LayoutSolver.solve) หรือ None """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT grid, score, optimal, nodes, seconds FROM optimal_layouts "
+                "WHERE profile = ? AND rows = ? AND cols = ? AND e_row = ? AND e_col = ?",
+                (profile, rows, cols, *e_position)).fetchone()
+        if row is None:
+            return None
+        grid, score, optimal, nodes, seconds = row
+        return {'grid': [list(line) for line in grid.split('/')] if grid else None, 'score': score,
+                'optimal': bool(optimal), 'nodes': nodes, 'seconds': seconds}
+
+    def put(self, rows, cols, e_position, result, profile='trainer'):
+        grid = '/'.join(''.join(line) for line in result['grid']) if result['grid'] else None
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO optimal_layouts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (profile, rows, cols, *e_position, grid, result['score'], int(result['optimal']),
+                 result['nodes'], result['seconds']))
+
+    def all(self, profile=None):
+        """ ✅ ผลทั้งหมดเป็น list ของ dict (เรียงตาม profile, ขนาด, ตำแหน่ง E) """
+        query = "SELECT profile, rows, cols, e_row, e_col, score, optimal, nodes, seconds FROM optimal_layouts"
+        params = ()
+        if profile:
+            query += " WHERE profile = ?"
+            params = (profile,)
+        with self.lock:
+            rows = self.conn.execute(query + " ORDER BY profile, rows, cols, e_row, e_col", params).fetchall()
+        keys = ('profile', 'rows', 'cols', 'e_row', 'e_col', 'score', 'optimal', 'nodes', 'seconds')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def close(self):
+        self.conn.close()
+
+def solve_shape(rows, cols, profile='trainer', table=None, e_positions=None, node_limit=None,
+                time_limit=None, refresh=False, restarts=30):
+    """ ✅ หาผังที่ดีที่สุดของทุกตำแหน่ง E (ค่าเริ่มต้น: ทุกช่องขอบ) แล้วบันทึกลงตาราง
+
+    แก้เฉพาะตำแหน่ง E ตัวแทนของแต่ละกลุ่มสมมาตร ตำแหน่งอื่นได้จากการหมุน/กลับด้านผังของตัวแทน
+    ผลที่บันทึกไว้แล้วและ optimal จะไม่ถูกคำนวณใหม่ (ยกเว้น `refresh`)
+    คำตอบตั้งต้นของการค้นหามาจาก local_search (หรือผลเดิมในตาราง ถ้าดีกว่า)
+    คืน {ตำแหน่ง E: result}
+    """
+    table = table or LayoutTable()
+    e_positions = e_positions or list(get_topology(rows, cols).edge_positions)
+    results = {}
+    for representative, members in e_position_orbits(rows, cols, e_positions).items():
+        result = None if refresh else table.get(rows, cols, representative, profile)
+        if result is None or not result['optimal']:
+            initial, initial_score = local_search(rows, cols, representative, profile, restarts)
+            if result is not None and result['grid'] is not None and result['score'] > initial_score:
+                initial = result['grid']
+            result = LayoutSolver(rows, cols, representative, profile, node_limit, time_limit).solve(initial)
+        for e_position, name in members:
+            moved = dict(result)
+            if result['grid'] is not None:
+                moved['grid'] = transform_grid(np.array(result['grid']), name).tolist()
+            table.put(rows, cols, e_position, moved, profile)
+            if e_position in e_positions:
+                results[e_position] = moved
+    return results
+
+def get_optimal_layout(rows, cols, e_position, profile='trainer', table=None, solve_missing=True, **limits):
+    """ ✅ ผังที่ดีที่สุดจากตาราง (คำนวณและบันทึกถ้ายังไม่มี และ `solve_missing`) หรือ None """
+    table = table or LayoutTable()
+    result = table.get(rows, cols, tuple(e_position), profile)
+    if result is None and solve_missing:
+        result = solve_shape(rows, cols, profile, table, [tuple(e_position)], **limits)[tuple(e_position)]
+    return result
+
+def parse_size(text):
+    rows, cols = text.lower().split('x')
+    return int(rows), int(cols)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description="หาผังที่ดีที่สุดแบบแม่นยำและบันทึกลงตาราง")
+    parser.add_argument("--sizes", nargs="+", type=parse_size, default=[(3, 3), (4, 4)], help="เช่น 3x3 4x4 5x5")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="trainer")
+    parser.add_argument("--node-limit", type=int, default=None)
+    parser.add_argument("--time-limit", type=float, default=None, help="วินาทีต่อหนึ่งตำแหน่ง E")
+    parser.add_argument("--refresh", action="store_true", help="คำนวณใหม่แม้มีผลในตารางแล้ว")
+    args = parser.parse_args()
+
+    layout_table = LayoutTable()
+    for rows, cols in args.sizes:
+        solve_shape(rows, cols, args.profile, layout_table, node_limit=args.node_limit,
+                    time_limit=args.time_limit, refresh=args.refresh)
+
+    print(f"\n📌 ผังที่ดีที่สุด ({args.profile})")
+    for entry in layout_table.all(args.profile):
+        print(f"   Grid {entry['rows']}x{entry['cols']}, E ที่ ({entry['e_row'] + 1}, {entry['e_col'] + 1}) | "
+              f"คะแนน {entry['score']} | {'optimal' if entry['optimal'] else 'ยังไม่ยืนยัน'} | "
+              f"{entry['nodes']} nodes | {entry['seconds']:.2f} วินาที")
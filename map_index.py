@@ -0,0 +1,174 @@
+"""
+ดัชนีแผนที่ (SQLite) สำหรับค้นหา Grid ตั้งต้นที่ดีที่สุด
+โดยไม่ต้องอ่านและให้คะแนน CSV ทุกไฟล์ซ้ำทุกครั้งที่โหลด Grid
+"""
+
+import os
+import csv
+import glob
+import json
+import types
+import hashlib
+import sqlite3
+import logging
+import threading
+
+import numpy as np
+
+from config import SYSTEM_CONFIG
+from grid_codec import CELL_CODES, encode_grid, decode_grid
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS maps (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    rows INTEGER NOT NULL,
+    cols INTEGER NOT NULL,
+    e_row INTEGER,
+    e_col INTEGER,
+    grid BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_maps_shape ON maps (rows, cols, e_row, e_col);
+CREATE TABLE IF NOT EXISTS map_scores (
+    path TEXT NOT NULL REFERENCES maps (path) ON DELETE CASCADE,
+    scorer TEXT NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (path, scorer)
+);
+CREATE INDEX IF NOT EXISTS idx_map_scores_best ON map_scores (scorer, score DESC);
+CREATE TABLE IF NOT EXISTS scorers (
+    scorer TEXT PRIMARY KEY,
+    version TEXT NOT NULL
+);
+"""
+
+def scorer_version(config, score_fn=None):
+    """ ✅ เวอร์ชันของ scorer = hash ของน้ำหนักคะแนน (`config`) และ bytecode/ค่าคงที่ของ `score_fn`
+
+    แก้น้ำหนักหรือแก้ฟังก์ชันให้คะแนนแล้ว คะแนนที่เก็บไว้ของ scorer นั้นถือว่าหมดอายุ (ดู MapIndex.best_maps)
+    """
+    payload = json.dumps(config, sort_keys=True, default=str).encode()
+    if score_fn is not None:
+        code = score_fn.__code__
+        consts = [const for const in code.co_consts if not isinstance(const, types.CodeType)]
+        payload += code.co_code + repr(consts).encode()
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+def read_csv_grid(path):
+    """ ✅ อ่าน CSV เป็น uint8 Grid คืน None ถ้าแต่ละแถวยาวไม่เท่ากันหรือไฟล์ว่าง """
+    with open(path, newline="") as f:
+        rows = [[cell.strip() for cell in row] for row in csv.reader(f) if row]
+    if not rows or any(len(row) != len(rows[0]) for row in rows):
+        return None
+    return encode_grid(rows)
+
+class MapIndex:
+    """ ✅ ดัชนีของ Grid จาก CSV: เก็บ Grid ที่เข้ารหัสแล้วและคะแนนที่คำนวณไว้ แยกตาม (rows, cols, ตำแหน่ง E) """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or SYSTEM_CONFIG['MAP_INDEX_FILE']
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(SCHEMA)
+
+    def refresh(self, csv_folder):
+        """ ✅ อัปเดตดัชนีเฉพาะไฟล์ที่เพิ่มใหม่/แก้ไข (ดูจาก mtime) และลบไฟล์ที่หายไป คืนจำนวนไฟล์ CSV ที่พบ """
+        files = {path: os.path.getmtime(path) for path in glob.glob(f"{csv_folder}/**/*.csv", recursive=True)}
+        prefix = os.path.join(csv_folder, "")
+
+        with self.lock, self.conn:
+            known = dict(self.conn.execute(
+                "SELECT path, mtime FROM maps WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)))
+
+            removed = [(path,) for path in known if path not in files]
+            self.conn.executemany("DELETE FROM maps WHERE path = ?", removed)
+
+            changed = []
+            for path, mtime in files.items():
+                if known.get(path) == mtime:
+                    continue
+                grid = read_csv_grid(path)
+                if grid is None:
+                    logger.warning("⚠️ ข้ามไฟล์ CSV ที่รูปแบบไม่ถูกต้อง: %s", path)
+                    continue
+                e_cells = np.argwhere(grid == CELL_CODES['E'])
+                e_row, e_col = (int(e_cells[0][0]), int(e_cells[0][1])) if len(e_cells) else (None, None)
+                changed.append((path, mtime, grid.shape[0], grid.shape[1], e_row, e_col, grid.tobytes()))
+
+            # ✅ REPLACE ลบแถวเดิม (และคะแนนเดิมผ่าน ON DELETE CASCADE) ก่อนใส่ใหม่
+            self.conn.executemany("INSERT OR REPLACE INTO maps VALUES (?, ?, ?, ?, ?, ?, ?)", changed)
+
+        if removed or changed:
+            logger.info("🗂️ อัปเดตดัชนีแผนที่: เพิ่ม/แก้ไข %s ไฟล์, ลบ %s ไฟล์", len(changed), len(removed))
+        return len(files)
+
+    def _shape_filter(self, rows, cols, e_position):
+        """ ✅ เงื่อนไข WHERE ตามขนาด Grid และตำแหน่ง E (0-based, None = มี E ที่ใดก็ได้) """
+        if e_position is None:
+            return "m.rows = ? AND m.cols = ? AND m.e_row IS NOT NULL", (rows, cols)
+        return "m.rows = ? AND m.cols = ? AND m.e_row = ? AND m.e_col = ?", (rows, cols, *e_position)
+
+    def _check_version(self, scorer, version):
+        """ ✅ ล้างคะแนนทั้งหมดของ scorer นี้ถ้าเวอร์ชันที่บันทึกไว้ไม่ตรงกับ `version` """
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT version FROM scorers WHERE scorer = ?", (scorer,)).fetchone()
+            if row is not None and row[0] == version:
+                return
+            deleted = self.conn.execute("DELETE FROM map_scores WHERE scorer = ?", (scorer,)).rowcount
+            self.conn.execute("INSERT OR REPLACE INTO scorers VALUES (?, ?)", (scorer, version))
+        if deleted:
+            logger.info("🗂️ scorer '%s' เปลี่ยนเวอร์ชัน: ล้างคะแนนเดิม %s แผนที่", scorer, deleted)
+
+    def _score_missing(self, rows, cols, e_position, scorer, score_fn):
+        """ ✅ ให้คะแนนเฉพาะ Grid ที่ยังไม่มีคะแนนจาก scorer นี้ """
+        where, params = self._shape_filter(rows, cols, e_position)
+        with self.lock, self.conn:
+            missing = self.conn.execute(
+                f"SELECT m.path, m.grid FROM maps m "
+                f"LEFT JOIN map_scores s ON s.path = m.path AND s.scorer = ? "
+                f"WHERE {where} AND s.path IS NULL", (scorer, *params)).fetchall()
+            scores = [
+                (path, scorer, float(score_fn(decode_grid(self._decode(blob, rows, cols)).tolist())))
+                for path, blob in missing
+            ]
+            self.conn.executemany("INSERT OR REPLACE INTO map_scores VALUES (?, ?, ?)", scores)
+
+    @staticmethod
+    def _decode(blob, rows, cols):
+        return np.frombuffer(blob, dtype=np.uint8).reshape(rows, cols)
+
+    def best_maps(self, rows, cols, e_position=None, scorer="reward_calculator", score_fn=None, version=None):
+        """ ✅ คืน (Grid ตัวอักษร, คะแนน) เรียงจากคะแนนสูงสุด ด้วย query เดียวบน index
+
+        `scorer` คือชื่อของฟังก์ชันให้คะแนน (แต่ละไฟล์มีคะแนนแยกตาม scorer)
+        `version` (เช่นจาก scorer_version) ถ้าไม่ตรงกับที่บันทึกไว้ จะล้างคะแนนเดิมของ scorer นี้ก่อน
+        ถ้าส่ง `score_fn` มา จะให้คะแนน Grid ที่ยังไม่เคยถูกคำนวณก่อน
+        """
+        if version is not None:
+            self._check_version(scorer, version)
+        if score_fn is not None:
+            self._score_missing(rows, cols, e_position, scorer, score_fn)
+
+        where, params = self._shape_filter(rows, cols, e_position)
+        with self.lock:
+            results = self.conn.execute(
+                f"SELECT m.grid, s.score FROM maps m JOIN map_scores s ON s.path = m.path "
+                f"WHERE s.scorer = ? AND {where} ORDER BY s.score DESC, m.path", (scorer, *params)).fetchall()
+        for blob, score in results:
+            yield decode_grid(self._decode(blob, rows, cols)).tolist(), score
+
+    def close(self):
+        self.conn.close()
+
+_indexes = {}
+
+def get_map_index(db_path=None):
+    """ ✅ คืน MapIndex ที่เปิดไว้แล้วของไฟล์นี้ (เปิดครั้งเดียวต่อ process) """
+    db_path = db_path or SYSTEM_CONFIG['MAP_INDEX_FILE']
+    key = (os.getpid(), db_path)
+    if key not in _indexes:
+        _indexes[key] = MapIndex(db_path)
+    return _indexes[key]
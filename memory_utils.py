@@ -2,6 +2,7 @@
 ระบบตรวจสอบและจัดการหน่วยความจำ
 """
 
+import time
 import psutil
 import logging
 from config import SYSTEM_CONFIG
@@ -60,4 +61,100 @@ def clear_memory():
         return True
     except Exception as e:
         logging.error(f"เกิดข้อผิดพลาดในการทำความสะอาดหน่วยความจำ: {str(e)}")
-        return False 
\ No newline at end of file
+        return False
+
+class MemoryGovernor:
+    """
+    ควบคุมหน่วยความจำระหว่างฝึก: ตรวจ RSS เป็นระยะ (ทุก `interval` วินาที) และประเมินขนาด Q-Table
+    ถ้า RSS รวมกับการขยาย Q-Table ครั้งถัดไปจะเกิน `high_water` ของงบ (`budget` ค่าเริ่มต้น MAX_MEMORY_USAGE
+    การฝึกแบบขนานส่งส่วนแบ่งของงบให้แต่ละ process) จะไล่ state ที่ไม่ได้อัปเดตนาน/ค่าต่ำออกตามส่วนที่เกิน
+    (เทียบกับขนาด Q-Table ไม่น้อยกว่า `min_fraction` ไม่เกิน `evict_fraction` ของแต่ละขนาด Grid) แล้วลดขนาด array ที่ว่าง
+    ถ้าหน่วยความจำส่วนที่ไม่ใช่ Q-Table เกินเกณฑ์อยู่แล้ว การไล่ไม่ช่วย จึงไม่ไล่ (นับใน metrics['skipped'])
+    state ที่ถูกไล่ถูกบันทึกลง `store` (QTableStore.spill) ก่อนทิ้ง จึงกลับมาเมื่อโหลด Q-Table ครั้งหน้า
+    (ไม่มี store = ทิ้งไปเลย) สถิติอยู่ใน `metrics`
+    """
+
+    def __init__(self, q_table, lock, store=None, budget=None, high_water=0.85, evict_fraction=0.2,
+                 interval=5.0, grow_margin=0.1, min_fraction=0.05):
+        self.q_table = q_table
+        self.lock = lock
+        self.store = store
+        self.budget = budget or SYSTEM_CONFIG['MAX_MEMORY_USAGE']
+        self.high_water = high_water
+        self.evict_fraction = evict_fraction
+        self.min_fraction = min_fraction
+        self.interval = interval
+        self.grow_margin = grow_margin
+        self._process = psutil.Process()
+        self._last_check = float('-inf')
+        self.metrics = {
+            'checks': 0,
+            'rss': 0,
+            'peak_rss': 0,
+            'q_table_bytes': 0,
+            'evictions': 0,
+            'skipped': 0,
+            'evicted_states': 0,
+            'spilled_entries': 0,
+            'freed_bytes': 0,
+        }
+
+    def growth_bytes(self):
+        """
+        หน่วยความจำที่จะเพิ่มถ้า matrix ที่ slot ใกล้เต็ม (เหลือน้อยกว่า grow_margin) ขยายเป็นสองเท่า
+        """
+        return sum(matrix.nbytes for matrix in list(self.q_table.matrices.values())
+                   if matrix.free_slots < matrix.capacity * self.grow_margin)
+
+    def maybe_check(self):
+        """
+        เรียกได้บ่อยในลูปฝึก ตรวจจริงเมื่อครบ `interval` วินาทีจากครั้งก่อน
+        """
+        if time.monotonic() - self._last_check < self.interval:
+            return False
+        return self.check()
+
+    def check(self):
+        """
+        ตรวจหน่วยความจำตอนนี้ ไล่ state ออกถ้าใกล้เกินงบ คืน True ถ้ามีการไล่
+        """
+        self._last_check = time.monotonic()
+        rss = self._process.memory_info().rss
+        self.metrics['checks'] += 1
+        self.metrics['rss'] = rss
+        self.metrics['peak_rss'] = max(self.metrics['peak_rss'], rss)
+        q_table_bytes = self.metrics['q_table_bytes'] = self.q_table.nbytes
+
+        limit = self.high_water * self.budget
+        overshoot = rss + self.growth_bytes() - limit
+        if overshoot <= 0:
+            return False
+        if not q_table_bytes or rss - q_table_bytes >= limit:
+            # ✅ ส่วนที่เกินไม่ได้มาจาก Q-Table: ไล่ไปก็ไม่ลงมาใต้เกณฑ์ ไม่ไล่จน Q-Table ว่าง
+            self.metrics['skipped'] += 1
+            log = logging.warning if self.metrics['skipped'] == 1 else logging.debug  # ✅ เตือนครั้งแรกครั้งเดียว
+            log(f"หน่วยความจำนอก Q-Table ({(rss - q_table_bytes) / (1024 * 1024):.0f}MB) "
+                            f"เกินเกณฑ์ {limit / (1024 * 1024):.0f}MB อยู่แล้ว ไม่ไล่ state ออก")
+            return False
+        self.evict(min(self.evict_fraction, max(self.min_fraction, overshoot / q_table_bytes)))
+        return True
+
+    def evict(self, fraction=None):
+        """
+        ไล่ state ออก `fraction` (ค่าเริ่มต้น evict_fraction) บันทึกลงดิสก์ และคืนหน่วยความจำของ array ที่ว่าง
+        """
+        with self.lock:
+            evicted = self.q_table.evict(fraction or self.evict_fraction)
+            spilled = self.store.spill(evicted) if self.store and evicted else 0
+            freed = self.q_table.shrink()
+
+        states = len({row[0] for row in evicted})
+        self.metrics['evictions'] += 1
+        self.metrics['evicted_states'] += states
+        self.metrics['spilled_entries'] += spilled
+        self.metrics['freed_bytes'] += freed
+        self.metrics['q_table_bytes'] = self.q_table.nbytes
+        logging.warning(f"หน่วยความจำใกล้เต็ม ({self.metrics['rss'] / (1024 * 1024):.0f}MB): "
+                        f"ไล่ {states} states ออกจาก Q-Table (บันทึกลงดิสก์ {spilled} entries, "
+                        f"คืนหน่วยความจำ {freed / (1024 * 1024):.1f}MB)")
+        return states
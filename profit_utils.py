@@ -0,0 +1,232 @@
+"""
+วิเคราะห์กำไรของผังที่มีประเภทบ้าน (H1-H4) แล้ว
+คำนวณจาก Grid ที่แปลงเป็นรหัสประเภทบ้านด้วย numpy (ไม่วนทีละช่อง) รองรับหลายผังพร้อมกัน
+คืนผลเป็นข้อมูล (dict / array) ส่วนการแสดงผลแยกไปที่ format_profit_report หรือหน้า Dashboard
+"""
+
+import math
+import logging
+
+import numpy as np
+
+from grid_topology import get_topology
+
+logger = logging.getLogger(__name__)
+
+# ✅ ราคาบ้านแต่ละประเภท: ต้นทุน, ราคาขาย (บาท), ขนาด (ตร.ม.), น้ำหนักความนิยมของตลาด
+HOUSE_PRICES = {
+    'H1': {'cost': 1_800_000, 'sale': 3_300_000, 'size': 110, 'weight': 1.3},
+    'H2': {'cost': 1_900_000, 'sale': 3_700_000, 'size': 125, 'weight': 1.1},
+    'H3': {'cost': 2_300_000, 'sale': 4_300_000, 'size': 160, 'weight': 1.0},
+    'H4': {'cost': 3_000_000, 'sale': 5_200_000, 'size': 200, 'weight': 0.9},
+}
+
+NO_HOUSE = -1  # ✅ รหัสของช่องที่ไม่ใช่บ้านที่มีประเภท
+
+
+def price_table(prices=HOUSE_PRICES):
+    """ ✅ แปลงตารางราคาเป็น array ต่อประเภท: (types, cost, sale, size, weight) """
+    types = tuple(prices)
+    cost, sale, size, weight = (np.array([prices[t][field] for t in types], dtype=np.float64)
+                                for field in ('cost', 'sale', 'size', 'weight'))
+    return types, cost, sale, size, weight
+
+def encode_house_types(grids, types=tuple(HOUSE_PRICES)):
+    """ ✅ Grid (หรือหลาย Grid) ของตัวอักษร → array int8 รหัสประเภทบ้าน (index ใน `types`, ช่องอื่น = NO_HOUSE) """
+    grids = np.asarray(grids).astype(str)
+    codes = np.full(grids.shape, NO_HOUSE, dtype=np.int8)
+    for index, htype in enumerate(types):
+        codes[grids == htype] = index
+    return codes
+
+def profit_batch(grids, prices=HOUSE_PRICES):
+    """ ✅ กำไรของหลายผังพร้อมกัน: `grids` [B, rows, cols] (ตัวอักษรหรือรหัสจาก encode_house_types)
+
+    คืน dict ของ array: counts [B, types], total_cost, total_revenue, total_profit, total_size,
+    profit_per_sqm และ weighted_profit (แต่ละตัว [B]) พร้อม 'types' (ลำดับคอลัมน์ของ counts)
+    """
+    types, cost, sale, size, weight = price_table(prices)
+    grids = np.asarray(grids)
+    codes = grids if np.issubdtype(grids.dtype, np.integer) else encode_house_types(grids, types)
+    codes = codes.reshape(len(codes), -1)
+
+    # ✅ นับบ้านแต่ละประเภทต่อผัง (bincount บน index ที่เลื่อนตามผัง)
+    valid = codes >= 0
+    offsets = np.arange(len(codes))[:, None] * len(types)
+    counts = np.bincount((codes + offsets)[valid], minlength=len(codes) * len(types)).reshape(len(codes), len(types))
+
+    total_cost = counts @ cost
+    total_revenue = counts @ sale
+    total_size = counts @ size
+    total_profit = total_revenue - total_cost
+    with np.errstate(divide='ignore', invalid='ignore'):
+        profit_per_sqm = np.where(total_size > 0, total_profit / total_size, 0.0)
+    return {
+        'types': types,
+        'counts': counts,
+        'total_cost': total_cost,
+        'total_revenue': total_revenue,
+        'total_profit': total_profit,
+        'total_size': total_size,
+        'profit_per_sqm': profit_per_sqm,
+        'weighted_profit': counts @ ((sale - cost) * weight),
+    }
+
+def analyze_profit(grid, prices=HOUSE_PRICES):
+    """ ✅ กำไรของผังเดียวเป็น dict
+
+    'houses': {ประเภท: units, cost_per_unit, sale_per_unit, profit_per_unit, total_cost, total_profit}
+    (เฉพาะประเภทที่มีในผัง) และยอดรวม total_cost, total_revenue, total_profit, total_size,
+    profit_per_sqm, weighted_profit
+    """
+    batch = profit_batch(np.asarray(grid)[None], prices)
+    houses = {}
+    for htype, units in zip(batch['types'], batch['counts'][0].tolist()):
+        if units:
+            info = prices[htype]
+            houses[htype] = {
+                'units': units,
+                'cost_per_unit': info['cost'],
+                'sale_per_unit': info['sale'],
+                'profit_per_unit': info['sale'] - info['cost'],
+                'total_cost': info['cost'] * units,
+                'total_profit': (info['sale'] - info['cost']) * units,
+            }
+    report = {'houses': houses}
+    for field in ('total_cost', 'total_revenue', 'total_profit', 'total_size'):
+        report[field] = int(batch[field][0])
+    report['profit_per_sqm'] = float(batch['profit_per_sqm'][0])
+    report['weighted_profit'] = float(batch['weighted_profit'][0])
+    return report
+
+def rank_layouts(grids, key='weighted_profit', prices=HOUSE_PRICES):
+    """ ✅ ลำดับ index ของผังจากกำไรมากไปน้อย (ตาม `key` ใน profit_batch) """
+    return np.argsort(-profit_batch(grids, prices)[key], kind='stable')
+
+def format_profit_report(report):
+    """ ✅ รายงานกำไรเป็นข้อความ (รูปแบบเดียวกับที่ jecsun เคยพิมพ์) """
+    lines = [
+        "",
+        "📋 House Type Summary:",
+        "",
+        "House Type | Number of Units | Cost/Unit | Sale/Unit | Profit/Unit | Total Cost | Total Profit",
+        "-" * 120,
+    ]
+    for htype, info in report['houses'].items():
+        lines.append(f"🏠 {htype} | {info['units']} units | {info['cost_per_unit']:,.0f} Baht | "
+                     f"{info['sale_per_unit']:,.0f} Baht | {info['profit_per_unit']:,.0f} Baht | "
+                     f"{info['total_cost']:,.0f} Baht | {info['total_profit']:,.0f} Baht")
+    lines += [
+        "",
+        f"💸 Total Construction Cost: {report['total_cost']:,} Baht",
+        f"💰 Total Revenue: {report['total_revenue']:,} Baht",
+        f"📈 Total Profit: {report['total_profit']:,} Baht",
+        f"📐 Average Profit per sqm: {report['profit_per_sqm']:,.2f} Baht/sqm",
+        f"🎯 Weighted Profit (Market Preference): {report['weighted_profit']:,.2f} Baht",
+    ]
+    return "\n".join(lines)
+
+
+# -----------------------------------------------------
+# ✅ การเลือกประเภทบ้าน (H1-H4) ให้แต่ละช่อง H
+# -----------------------------------------------------
+def market_ratios(prices=HOUSE_PRICES):
+    """ ✅ สัดส่วนของแต่ละประเภทตามกำไรถ่วงน้ำหนักตลาด (ใช้กับ assign_by_ratio) """
+    scores = {htype: (p['sale'] - p['cost']) * p['weight'] for htype, p in prices.items()}
+    total = sum(scores.values())
+    return {htype: score / total for htype, score in scores.items()}
+
+def assign_by_ratio(grid, ratios):
+    """ ✅ วิธีเดิม: แบ่งจำนวนบ้านตามสัดส่วน `ratios` แล้วเรียงประเภทลงช่อง H ตามลำดับแถว (ไม่สนตำแหน่ง) """
+    grid = [list(row) for row in grid]
+    h_positions = [(r, c) for r in range(len(grid)) for c in range(len(grid[0])) if grid[r][c] == 'H']
+    total_h = len(h_positions)
+    if total_h == 0:
+        return grid
+
+    house_counts = {htype: int(ratio * total_h) for htype, ratio in ratios.items()}
+    while sum(house_counts.values()) < total_h:
+        for htype in house_counts:
+            house_counts[htype] += 1
+            if sum(house_counts.values()) == total_h:
+                break
+
+    house_sequence = []
+    for htype, count in house_counts.items():
+        house_sequence.extend([htype] * count)
+
+    for (r, c), htype in zip(h_positions, house_sequence):
+        grid[r][c] = htype
+    return grid
+
+def house_type_values(grid, prices=HOUSE_PRICES, edge_bonus=None):
+    """ ✅ ค่าของการวางบ้านแต่ละประเภทในแต่ละช่อง H: [n, types] = กำไรถ่วงน้ำหนัก + โบนัสถ้าอยู่ขอบ
+
+    คืน (h_positions, types, values)
+    """
+    types, cost, sale, size, weight = price_table(prices)
+    grid = np.asarray(grid).astype(str)
+    rows, cols = grid.shape
+    h_positions = [tuple(p) for p in np.argwhere(grid == 'H').tolist()]
+    values = np.tile((sale - cost) * weight, (len(h_positions), 1))
+    if edge_bonus and h_positions:
+        on_edge = get_topology(rows, cols).edge_mask[tuple(np.array(h_positions).T)]
+        values[on_edge] += np.array([edge_bonus.get(htype, 0) for htype in types], dtype=np.float64)
+    return h_positions, types, values
+
+def type_caps(total_h, types, max_units=None, max_share=None):
+    """ ✅ จำนวนบ้านสูงสุดต่อประเภท จาก `max_units` {ประเภท: จำนวน} และ/หรือ `max_share` (ตัวเลขเดียว หรือ {ประเภท: สัดส่วน}) """
+    caps = np.full(len(types), total_h, dtype=np.int64)
+    for i, htype in enumerate(types):
+        if max_share is not None:
+            share = max_share.get(htype) if isinstance(max_share, dict) else max_share
+            if share is not None:
+                caps[i] = min(caps[i], math.ceil(share * total_h))
+        if max_units and htype in max_units:
+            caps[i] = min(caps[i], max_units[htype])
+    return caps
+
+def assign_house_types(grid, prices=HOUSE_PRICES, max_units=None, max_share=None, size_budget=None,
+                       edge_bonus=None, fallback_ratios=None):
+    """ ✅ เลือกประเภทบ้านของแต่ละช่อง H ให้ได้กำไรถ่วงน้ำหนัก (+ โบนัสตำแหน่ง) สูงสุด ด้วย MILP (scipy.optimize.milp)
+
+    ตัวแปร x[i, t] = 1 ถ้าช่อง H ที่ i เป็นประเภท t โดยแต่ละช่องได้หนึ่งประเภท
+    - `max_units` / `max_share`: จำนวนบ้านสูงสุดต่อประเภท (ดู type_caps)
+    - `size_budget`: พื้นที่บ้านรวม (ตร.ม.) ไม่เกินค่านี้
+    - `edge_bonus`: {ประเภท: บาท} ค่าความชอบเพิ่มเมื่อบ้านประเภทนั้นอยู่ช่องขอบ (เช่นบ้านหลังใหญ่ริมขอบ)
+
+    ถ้าไม่มี scipy หรือเงื่อนไขขัดกันจนไม่มีคำตอบ ใช้ assign_by_ratio(`fallback_ratios` หรือ market_ratios) แทน
+    คืน Grid ใหม่ (list ของแถว)
+    """
+    h_positions, types, values = house_type_values(grid, prices, edge_bonus)
+    n, num_types = values.shape
+    if n == 0:
+        return [list(row) for row in grid]
+
+    try:
+        from scipy.optimize import milp, LinearConstraint, Bounds
+        from scipy.sparse import csr_matrix, kron, identity
+    except ImportError:
+        logger.warning("⚠️ ไม่มี scipy ใช้การแบ่งประเภทบ้านตามสัดส่วนแทน")
+        return assign_by_ratio(grid, fallback_ratios or market_ratios(prices))
+
+    # ✅ x เรียงแบบ [ช่อง 0: H1..H4, ช่อง 1: H1..H4, ...]
+    one_per_cell = kron(identity(n), np.ones((1, num_types)))
+    per_type = kron(np.ones((1, n)), identity(num_types))
+    caps = type_caps(n, types, max_units, max_share)
+    constraints = [LinearConstraint(one_per_cell, 1, 1), LinearConstraint(per_type, 0, caps)]
+    if size_budget is not None:
+        sizes = np.tile([prices[htype]['size'] for htype in types], n)
+        constraints.append(LinearConstraint(csr_matrix(sizes), 0, size_budget))
+
+    result = milp(-values.ravel(), constraints=constraints, integrality=np.ones(n * num_types),
+                  bounds=Bounds(0, 1))
+    if result.status != 0 or result.x is None:
+        logger.warning("⚠️ เลือกประเภทบ้านด้วย MILP ไม่ได้ (%s) ใช้การแบ่งตามสัดส่วนแทน", result.message)
+        return assign_by_ratio(grid, fallback_ratios or market_ratios(prices))
+
+    chosen = result.x.reshape(n, num_types).argmax(axis=1)
+    assigned = [list(row) for row in grid]
+    for (r, c), t in zip(h_positions, chosen.tolist()):
+        assigned[r][c] = types[t]
+    return assigned
@@ -0,0 +1,422 @@
+"""
+Q-Table แบบ array: แต่ละ state ได้ slot (แถว) ใน matrix float32 ขนาด [states, actions]
+หนึ่ง matrix ต่อขนาด Grid เพราะ action ของ Grid ขนาดหนึ่งคงที่ (ช่อง × {H, R, G})
+ค่า Q สูงสุดและ action ที่ดีที่สุดของแต่ละแถวถูกอัปเดตไปพร้อมกับค่า จึงอ่านได้ใน O(1)
+"""
+
+from contextlib import nullcontext
+
+import numpy as np
+
+from grid_codec import ACTION_TYPES, key_shape
+
+UNSEEN = np.float32(-np.inf)  # ✅ ค่าของ action ที่ยังไม่เคยเรียนรู้
+VISITS_DTYPE = np.uint16  # ✅ จำนวนครั้งที่อัปเดต (ใช้เป็นน้ำหนักตอนรวม delta) นับถึง VISITS_MAX แล้วหยุด
+VISITS_MAX = int(np.iinfo(VISITS_DTYPE).max)
+
+
+class QMatrix:
+    """ ✅ Q-values ของ Grid ขนาดเดียว: state_key → slot, values[slot, action]
+
+    ขยายขนาดแบบเท่าตัว (amortized O(1)) และนำ slot ของ state ที่ถูกลบกลับมาใช้ใหม่
+    """
+
+    def __init__(self, rows, cols, capacity=64):
+        self.rows, self.cols = rows, cols
+        self.num_actions = rows * cols * len(ACTION_TYPES)
+        self.values = np.full((capacity, self.num_actions), UNSEEN, dtype=np.float32)
+        self.visits = np.zeros((capacity, self.num_actions), dtype=VISITS_DTYPE)
+        self.row_max = np.full(capacity, UNSEEN, dtype=np.float32)
+        self.row_argmax = np.full(capacity, -1, dtype=np.int16)  # ✅ action สูงสุด 7 × 7 × 3 = 147
+        self.touched = np.zeros(capacity, dtype=np.uint64)  # ✅ เวลา (QTable.clock) ที่แถวถูกอัปเดตล่าสุด
+        self.slots = {}             # ✅ state_key → slot
+        self._slot_keys = [None] * capacity  # ✅ slot → state_key (None = ว่าง)
+        self._free = []             # ✅ slot ที่ถูกลบแล้ว รอใช้ซ้ำ
+        self._next = 0              # ✅ slot ถัดไปที่ยังไม่เคยใช้
+
+    def __len__(self):
+        return len(self.slots)
+
+    @property
+    def capacity(self):
+        return len(self.values)
+
+    def _grow(self):
+        """ ✅ ขยายทุก array เป็นสองเท่า """
+        capacity = self.capacity
+        self.values = np.concatenate([self.values, np.full_like(self.values, UNSEEN)])
+        self.visits = np.concatenate([self.visits, np.zeros_like(self.visits)])
+        self.row_max = np.concatenate([self.row_max, np.full(capacity, UNSEEN, dtype=np.float32)])
+        self.row_argmax = np.concatenate([self.row_argmax, np.full(capacity, -1, dtype=np.int16)])
+        self.touched = np.concatenate([self.touched, np.zeros(capacity, dtype=np.uint64)])
+        self._slot_keys.extend([None] * capacity)
+
+    def shrink(self, min_capacity=64, fill=0.75):
+        """ ✅ ย้าย state ไปไว้ต้น array แล้วลดขนาดลงครึ่งหนึ่งซ้ำๆ ตราบที่ state ยังใช้ไม่เกิน `fill` ของขนาดใหม่
+
+        ใช้หลังไล่ state ออก เพื่อคืนหน่วยความจำจริง (slot ของทุก state เปลี่ยน) คืนจำนวน byte ที่ลดได้
+        """
+        used = self.used_slots()
+        capacity = self.capacity
+        while capacity // 2 >= min_capacity and len(used) <= capacity // 2 * fill:
+            capacity //= 2
+        if capacity == self.capacity:
+            return 0
+
+        before = self.nbytes
+        count = len(used)
+        for name, empty in (('values', UNSEEN), ('visits', 0), ('row_max', UNSEEN), ('row_argmax', -1), ('touched', 0)):
+            old = getattr(self, name)
+            new = np.full((capacity,) + old.shape[1:], empty, dtype=old.dtype)
+            new[:count] = old[used]
+            setattr(self, name, new)
+        keys = [self._slot_keys[slot] for slot in used.tolist()]
+        self.slots = dict(zip(keys, range(count)))
+        self._slot_keys = keys + [None] * (capacity - count)
+        self._free = []
+        self._next = count
+        return before - self.nbytes
+
+    def slot(self, state_key, create=False):
+        """ ✅ slot ของ state (สร้างใหม่ถ้า `create`) หรือ None ถ้าไม่มี """
+        slot = self.slots.get(state_key)
+        if slot is None and create:
+            if self._free:
+                slot = self._free.pop()
+            else:
+                if self._next == self.capacity:
+                    self._grow()
+                slot = self._next
+                self._next += 1
+            self.slots[state_key] = slot
+            self._slot_keys[slot] = state_key
+        return slot
+
+    def set(self, slot, action, value):
+        """ ✅ ตั้งค่า Q และอัปเดตค่าสูงสุดของแถว (คำนวณทั้งแถวใหม่เฉพาะเมื่อค่าสูงสุดลดลง) """
+        value = np.float32(value)
+        self.values[slot, action] = value
+        if value > self.row_max[slot] or self.row_argmax[slot] < 0:
+            self.row_max[slot] = value
+            self.row_argmax[slot] = action
+        elif action == self.row_argmax[slot] and value < self.row_max[slot]:
+            best = int(self.values[slot].argmax())
+            self.row_max[slot] = self.values[slot, best]
+            self.row_argmax[slot] = best
+
+    def refresh_rows(self, slots):
+        """ ✅ คำนวณค่าสูงสุดของหลายแถวใหม่พร้อมกัน (หลังเขียนค่าแบบ bulk) """
+        slots = np.asarray(slots, dtype=np.intp)
+        best = self.values[slots].argmax(axis=1)
+        self.row_argmax[slots] = best
+        self.row_max[slots] = self.values[slots, best]
+
+    def lookup_slots(self, state_keys):
+        """ ✅ slot ของหลาย state เป็น array (-1 = ยังไม่มี) """
+        slots = self.slots
+        return np.fromiter((slots.get(key, -1) for key in state_keys), dtype=np.intp, count=len(state_keys))
+
+    def remove_slots(self, slots):
+        """ ✅ ลบหลาย state พร้อมกันด้วย slot (ล้างแถวแบบ vectorized) คืน key ที่ถูกลบ """
+        slots = np.asarray(slots, dtype=np.intp)
+        if not len(slots):
+            return []
+        self.values[slots] = UNSEEN
+        self.visits[slots] = 0
+        self.row_max[slots] = UNSEEN
+        self.row_argmax[slots] = -1
+        self.touched[slots] = 0
+        keys = []
+        for slot in slots.tolist():
+            key = self._slot_keys[slot]
+            self._slot_keys[slot] = None
+            del self.slots[key]
+            keys.append(key)
+        self._free.extend(slots.tolist())
+        return keys
+
+    def used_slots(self):
+        """ ✅ slot ทั้งหมดที่มี state อยู่ (เรียงตามลำดับ slot) """
+        return np.fromiter(sorted(self.slots.values()), dtype=np.intp, count=len(self.slots))
+
+    def slot_key(self, slot):
+        return self._slot_keys[slot]
+
+    @property
+    def free_slots(self):
+        """ ✅ จำนวน state ที่ยังเพิ่มได้ก่อนต้องขยาย array """
+        return self.capacity - self._next + len(self._free)
+
+    @property
+    def slot_limit(self):
+        """ ✅ slot สูงสุดที่เคยใช้ + 1 (slot ตั้งแต่ค่านี้ไปยังว่างทั้งหมด) """
+        return self._next
+
+    def entries_in_range(self, start, stop):
+        """ ✅ entry ของ slot ในช่วง [start, stop) เป็น (state_keys, actions, values, visits) (array เป็นสำเนา) """
+        stop = min(stop, self._next)
+        if start >= stop:
+            return [], np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32), np.empty(0, dtype=VISITS_DTYPE)
+        values = self.values[start:stop]
+        rows, actions = np.nonzero(values != UNSEEN)  # ✅ slot ว่าง (ถูกลบ) เป็น UNSEEN ทั้งแถวจึงไม่ถูกนับ
+        keys = [self._slot_keys[start + row] for row in rows.tolist()]
+        return keys, actions, values[rows, actions], self.visits[start + rows, actions]
+
+    @property
+    def nbytes(self):
+        return (self.values.nbytes + self.visits.nbytes + self.row_max.nbytes + self.row_argmax.nbytes
+                + self.touched.nbytes)
+
+
+class QTable:
+    """ ✅ Q-Table ทุกขนาด Grid: เลือก QMatrix ตามขนาดที่อยู่ใน key (grid_codec.key_shape)
+
+    อ่านแบบ dict ได้เหมือนเดิม (`len`, `in`, `get`, `items`, `del`) โดย `get`/`items`
+    คืน {action_key: q_value} ของ action ที่เคยเรียนรู้ ส่วนการเขียนใช้ set_q / add_visits
+    """
+
+    def __init__(self):
+        self.matrices = {}  # ✅ (rows, cols) → QMatrix
+        self.clock = 0      # ✅ นับครั้งที่อัปเดต (update / update_batch) ใช้เรียงลำดับ state ที่ไม่ได้ใช้นาน
+
+    def matrix(self, shape, create=False):
+        """ ✅ QMatrix ของขนาด Grid นี้ (สร้างใหม่ถ้า `create`) """
+        matrix = self.matrices.get(shape)
+        if matrix is None and create:
+            matrix = self.matrices[shape] = QMatrix(*shape)
+        return matrix
+
+    def _locate(self, state_key, create=False):
+        matrix = self.matrix(key_shape(state_key), create)
+        if matrix is None:
+            return None, None
+        return matrix, matrix.slot(state_key, create)
+
+    # -----------------------------------------------------
+    # ✅ อ่านแบบ dict
+    # -----------------------------------------------------
+    def __len__(self):
+        return sum(len(matrix) for matrix in self.matrices.values())
+
+    def __contains__(self, state_key):
+        return self._locate(state_key)[1] is not None
+
+    def __iter__(self):
+        for matrix in self.matrices.values():
+            yield from list(matrix.slots)
+
+    def keys(self):
+        return iter(self)
+
+    def get(self, state_key, default=None):
+        """ ✅ {action_key: q_value} ของ state นี้ หรือ `default` ถ้าไม่มี """
+        matrix, slot = self._locate(state_key)
+        if slot is None:
+            return default
+        row = matrix.values[slot]
+        actions = np.flatnonzero(row != UNSEEN)
+        return dict(zip(actions.tolist(), row[actions].tolist()))
+
+    def items(self):
+        for state_key in self:
+            yield state_key, self.get(state_key)
+
+    def clear(self):
+        self.matrices.clear()
+
+    def assign(self, other):
+        """ ✅ แทนที่เนื้อหาทั้งหมดด้วยของ QTable `other` (object เดิม ตัวแปรที่อ้างถึงตารางนี้จึงเห็นค่าใหม่) """
+        self.matrices = other.matrices
+        self.clock = other.clock
+
+    def __delitem__(self, state_key):
+        matrix, slot = self._locate(state_key)
+        if slot is None:
+            raise KeyError(state_key)
+        matrix.remove_slots([slot])
+
+    # -----------------------------------------------------
+    # ✅ อ่าน/เขียนทีละ entry
+    # -----------------------------------------------------
+    def get_q(self, state_key, action_key, default=None):
+        """ ✅ ค่า Q ของ (state, action) หรือ `default` ถ้ายังไม่เคยเรียนรู้ """
+        matrix, slot = self._locate(state_key)
+        if slot is None:
+            return default
+        value = matrix.values[slot, action_key]
+        return default if value == UNSEEN else float(value)
+
+    def set_q(self, state_key, action_key, value, visits=None):
+        """ ✅ ตั้งค่า Q (สร้าง state ถ้ายังไม่มี) และตั้งจำนวนครั้งที่อัปเดตถ้าส่ง `visits` มา """
+        matrix, slot = self._locate(state_key, create=True)
+        matrix.set(slot, action_key, value)
+        if visits is not None:
+            matrix.visits[slot, action_key] = min(visits, VISITS_MAX)
+
+    def update(self, state_key, action_key, reward, next_state_key, alpha, gamma, decimals=4):
+        """ ✅ อัปเดต Q-learning หนึ่งขั้น: Q ← (1 - α)·Q + α·(reward + γ·max Q(next_state))
+
+        action ที่ยังไม่เคยเรียนรู้เริ่มที่ 0 (นับรวมใน max ของ next_state ถ้าเป็น state เดียวกัน)
+        เพิ่มจำนวนครั้งที่อัปเดตอีก 1 และคืน (ค่าเดิม, ค่าใหม่)
+        """
+        matrix, slot = self._locate(state_key, create=True)
+        old_q_value = matrix.values[slot, action_key].item()
+        if old_q_value == -np.inf:
+            old_q_value = 0.0
+            matrix.set(slot, action_key, old_q_value)
+
+        next_matrix, next_slot = self._locate(next_state_key)
+        max_future_q = 0.0 if next_slot is None else next_matrix.row_max[next_slot].item()
+        new_q_value = round((1 - alpha) * old_q_value + alpha * (reward + gamma * max_future_q), decimals)
+        matrix.set(slot, action_key, new_q_value)
+        if matrix.visits[slot, action_key] < VISITS_MAX:
+            matrix.visits[slot, action_key] += 1
+        self.clock += 1
+        matrix.touched[slot] = self.clock
+        return old_q_value, new_q_value
+
+    def update_batch(self, shape, state_keys, actions, rewards, next_state_keys, alpha, gamma, decimals=4):
+        """ ✅ อัปเดต Q-learning หลาย transition ของ Grid ขนาดเดียวกันพร้อมกัน (vectorized)
+
+        max Q ของ next_state อ่านก่อนเขียน (เหมือนทุก transition เกิดพร้อมกัน)
+        (state, action) ที่ซ้ำกัน n ครั้งในชุดเดียวใช้ค่าเป้าหมายเฉลี่ย:
+        Q ← (1 - α)ⁿ·Q + (1 - (1 - α)ⁿ)·mean(target) ซึ่งเท่ากับอัปเดตทีละครั้งเมื่อเป้าหมายเท่ากัน
+        คืน list ของ (state_key, action_key) ที่เปลี่ยน
+        """
+        matrix = self.matrix(shape, create=True)
+        actions = np.asarray(actions, dtype=np.intp)
+        next_slots = matrix.lookup_slots(next_state_keys)
+        max_future_q = np.where(next_slots >= 0, matrix.row_max[next_slots], 0).astype(float)
+        targets = np.asarray(rewards, dtype=float) + gamma * max_future_q
+
+        slots = np.fromiter((matrix.slot(key, create=True) for key in state_keys),
+                            dtype=np.intp, count=len(state_keys))
+        cells, inverse, counts = np.unique(slots * matrix.num_actions + actions,
+                                           return_inverse=True, return_counts=True)
+        mean_targets = np.bincount(inverse.ravel(), weights=targets) / counts
+        cell_slots, cell_actions = np.divmod(cells, matrix.num_actions)
+
+        old_q_values = matrix.values[cell_slots, cell_actions].astype(float)
+        old_q_values[old_q_values == UNSEEN] = 0.0  # ✅ action ใหม่เริ่มที่ 0 เหมือน update()
+        keep = (1 - alpha) ** counts
+        matrix.values[cell_slots, cell_actions] = np.round(keep * old_q_values + (1 - keep) * mean_targets, decimals)
+        matrix.visits[cell_slots, cell_actions] = np.minimum(matrix.visits[cell_slots, cell_actions] + counts, VISITS_MAX)
+        matrix.refresh_rows(np.unique(cell_slots))
+        self.clock += 1
+        matrix.touched[cell_slots] = self.clock
+
+        return list(zip([matrix.slot_key(slot) for slot in cell_slots.tolist()], cell_actions.tolist()))
+
+    def get_visits(self, state_key, action_key):
+        matrix, slot = self._locate(state_key)
+        return 0 if slot is None else int(matrix.visits[slot, action_key])
+
+    def add_visits(self, state_key, action_key, count=1):
+        matrix, slot = self._locate(state_key)
+        if slot is not None:
+            matrix.visits[slot, action_key] = min(int(matrix.visits[slot, action_key]) + count, VISITS_MAX)
+
+    def max_q(self, state_key, default=0.0):
+        """ ✅ ค่า Q สูงสุดของ state (O(1)) หรือ `default` ถ้าไม่มี """
+        matrix, slot = self._locate(state_key)
+        if slot is None:
+            return default
+        return float(matrix.row_max[slot])
+
+    def best_action(self, state_key):
+        """ ✅ (action_key, q_value) ที่ดีที่สุดของ state (O(1)) หรือ None ถ้าไม่มี """
+        matrix, slot = self._locate(state_key)
+        if slot is None:
+            return None
+        return int(matrix.row_argmax[slot]), float(matrix.row_max[slot])
+
+    # -----------------------------------------------------
+    # ✅ งานทั้งตาราง (vectorized ต่อขนาด Grid)
+    # -----------------------------------------------------
+    def entries(self):
+        """ ✅ ทุก entry เป็น (state_key, action_key, q_value, visits) """
+        for matrix in self.matrices.values():
+            slots = matrix.used_slots()
+            rows, actions = np.nonzero(matrix.values[slots] != UNSEEN)
+            slots = slots[rows]
+            yield from zip(
+                [matrix.slot_key(slot) for slot in slots.tolist()],
+                actions.tolist(),
+                matrix.values[slots, actions].tolist(),
+                matrix.visits[slots, actions].tolist(),
+            )
+
+    def iter_chunks(self, chunk_slots=4096, lock=None):
+        """ ✅ อ่านทุก entry ทีละช่วง slot: yield (state_keys, actions, values, visits) ทีละชุด
+
+        ถือ `lock` เฉพาะตอนคัดลอกแต่ละชุด จึงฝึกต่อระหว่างอ่านได้ (ผลเป็น snapshot แบบทีละชุด ไม่ใช่ทั้งตารางพร้อมกัน)
+        หน่วยความจำที่ใช้ไม่เกินขนาดหนึ่งชุด (`chunk_slots` state)
+        """
+        lock = lock or nullcontext()
+        with lock:
+            shapes = list(self.matrices)
+        for shape in shapes:
+            start = 0
+            while True:
+                with lock:
+                    matrix = self.matrices.get(shape)
+                    if matrix is None or start >= matrix.slot_limit:
+                        break
+                    chunk = matrix.entries_in_range(start, start + chunk_slots)
+                start += chunk_slots
+                if len(chunk[1]):
+                    yield chunk
+
+    def num_entries(self):
+        return sum(int(np.count_nonzero(matrix.values[matrix.used_slots()] != UNSEEN))
+                   for matrix in self.matrices.values())
+
+    def clean(self, percentile=35):
+        """ ✅ ลบ state ที่ค่า Q เฉลี่ยต่ำกว่า percentile ของค่า Q สูงสุดของ state ขนาดเดียวกัน
+
+        คืน list ของ state_key ที่ถูกลบ
+        """
+        deleted = []
+        for matrix in self.matrices.values():
+            slots = matrix.used_slots()
+            if not len(slots):
+                continue
+            threshold = np.percentile(matrix.row_max[slots].astype(float), percentile)
+            values = matrix.values[slots]
+            seen = values != UNSEEN
+            means = np.where(seen, values, 0).sum(axis=1, dtype=float) / np.maximum(seen.sum(axis=1), 1)
+            deleted.extend(matrix.remove_slots(slots[means < threshold]))
+        return deleted
+
+    def evict(self, fraction, pool=2):
+        """ ✅ ไล่ state ออก `fraction` ของแต่ละขนาด Grid เพื่อลดหน่วยความจำ
+
+        จาก state ที่ไม่ได้อัปเดตนานที่สุด `pool` เท่าของจำนวนที่ต้องไล่ เลือกตัวที่ค่า Q สูงสุดต่ำที่สุด
+        คืน list ของ (state_key, action_key, q_value, visits) ของ state ที่ถูกไล่ (ให้บันทึกลงดิสก์ก่อนทิ้ง)
+        """
+        evicted = []
+        for matrix in self.matrices.values():
+            slots = matrix.used_slots()
+            count = int(len(slots) * fraction)
+            if not count:
+                continue
+            candidates = slots[np.argsort(matrix.touched[slots], kind='stable')[:pool * count]]
+            victims = candidates[np.argsort(matrix.row_max[candidates], kind='stable')[:count]]
+            rows, actions = np.nonzero(matrix.values[victims] != UNSEEN)
+            victim_slots = victims[rows]
+            evicted.extend(zip(
+                [matrix.slot_key(slot) for slot in victim_slots.tolist()],
+                actions.tolist(),
+                matrix.values[victim_slots, actions].tolist(),
+                matrix.visits[victim_slots, actions].tolist(),
+            ))
+            matrix.remove_slots(victims)
+        return evicted
+
+    def shrink(self):
+        """ ✅ ลดขนาด array ของทุกขนาด Grid ที่ใช้ไม่เต็ม (QMatrix.shrink) คืนจำนวน byte ที่ลดได้ """
+        return sum(matrix.shrink() for matrix in self.matrices.values())
+
+    @property
+    def nbytes(self):
+        return sum(matrix.nbytes for matrix in self.matrices.values())
@@ -0,0 +1,159 @@
+"""
+ลบ state ค่าต่ำออกจาก Q-Table แบบทยอยทำ (amortized) แทนการล้างทั้งตารางในครั้งเดียว
+เกณฑ์เดียวกับ QTable.clean: ลบ state ที่ค่า Q เฉลี่ยต่ำกว่า percentile ของค่า Q สูงสุดของ state ขนาดเดียวกัน
+แต่ percentile มาจาก quantile sketch (P²) ต่อขนาด Grid ที่อัปเดตไปพร้อมกับการไล่ตรวจ จึงมี threshold พร้อมใช้ตลอด
+
+แต่ละขนาด Grid มี cursor ไล่ตรวจ slot ทีละช่วง (vectorized) ถือ lock เฉพาะช่วงที่ตรวจ
+sketch มีสองชุด: `active` (จากการไล่ตรวจครบรอบล่าสุด ใช้เป็น threshold) และ `building` (รอบปัจจุบัน)
+"""
+
+import math
+import logging
+from contextlib import nullcontext
+
+import numpy as np
+
+from q_matrix import UNSEEN
+from quantile_sketch import P2Quantile
+
+logger = logging.getLogger(__name__)
+
+SWEEP_EPISODES = 500  # ✅ ไล่ตรวจครบทั้งตารางหนึ่งรอบต่อประมาณนี้ Episode (เท่ากับรอบ Clean เดิม)
+SKETCH_SAMPLE = 256   # ✅ จำนวนค่าสูงสุดต่อช่วงที่ป้อนเข้า sketch (สุ่มเลือก)
+
+
+class _ShapeState:
+    def __init__(self, p):
+        self.cursor = 0
+        self.active = None
+        self.building = P2Quantile(p)
+        self.sweeps = 0
+
+
+class QTablePruner:
+    """ ✅ ตัวลบ state แบบทยอยของ QTable หนึ่งตาราง
+
+    - step(episodes) ตรวจ slot ประมาณ `slot ที่ใช้ × episodes / sweep_episodes` ต่อขนาด Grid
+    - sweep() ตรวจครบหนึ่งรอบ (ทีละช่วง ปล่อย lock ระหว่างช่วง)
+    - `on_delete(state_keys)` ถูกเรียกภายใต้ lock ทุกครั้งที่ลบ (เช่น mark_deleted ของ QTableStore)
+    """
+
+    def __init__(self, q_table, percentile=35, sweep_episodes=SWEEP_EPISODES, sample=SKETCH_SAMPLE,
+                 lock=None, on_delete=None, seed=None):
+        self.q_table = q_table
+        self.p = percentile / 100
+        self.sweep_episodes = sweep_episodes
+        self.sample = sample
+        self.lock = lock or nullcontext()
+        self.on_delete = on_delete
+        self.rng = np.random.default_rng(seed)
+        self.shapes = {}  # ✅ (rows, cols) → _ShapeState
+        self.deleted = 0
+
+    def _shape_state(self, shape):
+        state = self.shapes.get(shape)
+        if state is None:
+            state = self.shapes[shape] = _ShapeState(self.p)
+        return state
+
+    def threshold(self, shape):
+        """ ✅ threshold ปัจจุบันของขนาด Grid นี้ (จากรอบที่ครบล่าสุด หรือรอบปัจจุบันถ้ายังไม่เคยครบ) หรือ None """
+        state = self.shapes.get(shape)
+        if state is None:
+            return None
+        sketch = state.active if state.active is not None else state.building
+        return sketch.value()
+
+    def thresholds(self):
+        return {shape: self.threshold(shape) for shape in self.shapes}
+
+    def _observe(self, state, row_max, rows):
+        """ ✅ สุ่มค่าสูงสุดของช่วงเข้า sketch ในสัดส่วน sample / rows (ช่วงที่มี state มากได้ตัวอย่างมากตาม) """
+        count = min(len(row_max), max(1, round(len(row_max) * self.sample / rows)))
+        if count < len(row_max):
+            row_max = self.rng.choice(row_max, count, replace=False)
+        state.building.observe_many(row_max)
+
+    def _prune_range(self, shape, matrix, rows):
+        """ ✅ ตรวจ slot ช่วงถัดไปของ matrix (เรียกขณะถือ lock) คืน (key ที่ถูกลบ, ครบรอบแล้วหรือไม่) """
+        state = self._shape_state(shape)
+        limit = matrix.slot_limit
+        if state.cursor >= limit:  # ✅ ตารางหดลง (เช่น QMatrix.shrink) เริ่มรอบใหม่
+            state.cursor = 0
+        start = state.cursor
+        stop = min(start + rows, limit)
+
+        values = matrix.values[start:stop]
+        seen = values != UNSEEN
+        counts = seen.sum(axis=1)
+        used = np.flatnonzero(counts)
+        deleted = []
+        if len(used):
+            row_max = matrix.row_max[start + used].astype(float)
+            means = np.where(seen[used], values[used], 0).sum(axis=1, dtype=float) / counts[used]
+            threshold = self.threshold(shape)  # ✅ threshold ก่อนรวมช่วงนี้ (เหมือนคำนวณจากทั้งตารางก่อนลบ)
+
+            self._observe(state, row_max, rows)
+
+            if threshold is not None:
+                deleted = matrix.remove_slots(start + used[means < threshold])
+
+        state.cursor = stop
+        wrapped = stop >= limit
+        if wrapped:
+            state.cursor = 0
+            state.sweeps += 1
+            if state.building.count:
+                state.active, state.building = state.building, P2Quantile(self.p)
+        return deleted, wrapped
+
+    def step(self, episodes=1):
+        """ ✅ ตรวจหนึ่งช่วงของทุกขนาด Grid (ขนาดช่วงตาม `episodes` ที่ผ่านไป) คืนจำนวน state ที่ลบ """
+        deleted = 0
+        with self.lock:
+            shapes = list(self.q_table.matrices.items())
+        for shape, matrix in shapes:
+            with self.lock:
+                rows = max(1, math.ceil(matrix.slot_limit * episodes / self.sweep_episodes))
+                keys, _ = self._prune_range(shape, matrix, rows)
+                if keys and self.on_delete:
+                    self.on_delete(keys)
+            deleted += len(keys)
+        self.deleted += deleted
+        return deleted
+
+    def sweep(self, rows=4096):
+        """ ✅ ตรวจครบหนึ่งรอบทุกขนาด Grid ทีละ `rows` slot (ปล่อย lock ระหว่างช่วง) คืน list ของ key ที่ถูกลบ """
+        deleted = []
+        with self.lock:
+            shapes = list(self.q_table.matrices.items())
+        for shape, matrix in shapes:
+            state = self._shape_state(shape)
+            state.cursor = 0
+            if state.active is None and not state.building.count:
+                # ✅ ยังไม่มีข้อมูลเลย: ไล่ตรวจรอบแรกเพื่อสร้าง sketch ก่อน (ยังไม่ลบ)
+                while not self._scan_only(shape, matrix, rows):
+                    pass
+            wrapped = False
+            while not wrapped:
+                with self.lock:
+                    keys, wrapped = self._prune_range(shape, matrix, rows)
+                    if keys and self.on_delete:
+                        self.on_delete(keys)
+                deleted.extend(keys)
+        self.deleted += len(deleted)
+        return deleted
+
+    def _scan_only(self, shape, matrix, rows):
+        """ ✅ ป้อนค่าสูงสุดของช่วงถัดไปเข้า sketch โดยไม่ลบ คืน True เมื่อครบรอบ """
+        with self.lock:
+            state = self._shape_state(shape)
+            start, stop = state.cursor, min(state.cursor + rows, matrix.slot_limit)
+            row_max = matrix.row_max[start:stop]
+            self._observe(state, row_max[row_max != UNSEEN].astype(float), rows)
+            state.cursor = stop
+            if stop < matrix.slot_limit:
+                return False
+            state.cursor = 0
+            state.active, state.building = state.building, P2Quantile(self.p)
+            return True
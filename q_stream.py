@@ -0,0 +1,179 @@
+"""
+ส่งออก/นำเข้า Q-Table แบบ stream ใช้หน่วยความจำคงที่ไม่ขึ้นกับขนาดตาราง
+อ่าน Q-Table ทีละช่วง slot (QTable.iter_chunks) ถือ lock เฉพาะตอนคัดลอกแต่ละชุด แล้วเข้ารหัสเป็น
+
+- NDJSON: หนึ่งบรรทัดต่อ entry {"state_key": hex, "action_key", "q_value", "visits"} (รูปแบบเดียวกับที่ส่งเซิร์ฟเวอร์)
+  บรรทัด {"state_key": hex, "deleted": true} หมายถึงลบ state นั้น (ใช้ใน delta ของ q_sync)
+- binary: หัวไฟล์ BINARY_MAGIC ตามด้วย frame [<I ความยาว][<I จำนวน record][record ...]
+  แต่ละ record = [<B ความยาว key][key bytes][<H action][<f q_value][<I visits]
+
+ฝั่งอ่านแปลงทีละบรรทัด/ทีละ frame และนำเข้าทีละชุด จึงไม่ต้องโหลดทั้งไฟล์หรือทั้ง request เข้าหน่วยความจำ
+"""
+
+import json
+import struct
+import logging
+from contextlib import nullcontext
+
+from grid_codec import key_to_bytes, key_from_bytes
+
+logger = logging.getLogger(__name__)
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+BINARY_CONTENT_TYPE = "application/octet-stream"
+BINARY_MAGIC = b"QTB1"
+CHUNK_SLOTS = 4096  # ✅ จำนวน state ต่อชุดตอนอ่าน Q-Table
+IMPORT_CHUNK = 4096  # ✅ จำนวน entry ต่อชุดตอนนำเข้า (ถือ lock ต่อชุด)
+
+_FRAME = struct.Struct('<I')
+_RECORD = struct.Struct('<HfI')
+
+
+class StreamFormatError(ValueError):
+    """ ✅ ข้อมูล stream ผิดรูปแบบ (หัวไฟล์ไม่ตรง frame ขาด หรือบรรทัด JSON เสีย) """
+
+
+# -----------------------------------------------------
+# ✅ ส่งออก
+# -----------------------------------------------------
+def ndjson_line(state_key, action_key, q_value, visits):
+    """ ✅ หนึ่งบรรทัด NDJSON ของ entry (ไม่รวมขึ้นบรรทัดใหม่) """
+    return json.dumps({"state_key": key_to_bytes(state_key).hex(), "action_key": action_key, "q_value": q_value,
+                       "visits": visits})
+
+def ndjson_delete_line(state_key):
+    """ ✅ หนึ่งบรรทัด NDJSON ที่สั่งลบ state """
+    return json.dumps({"state_key": key_to_bytes(state_key).hex(), "deleted": True})
+
+def iter_ndjson(q_table, lock=None, chunk_slots=CHUNK_SLOTS):
+    """ ✅ yield bytes ของ NDJSON ทีละชุด (ใช้เป็น body ของ requests.post ได้โดยตรง → ส่งแบบ chunked) """
+    for keys, actions, values, visits in q_table.iter_chunks(chunk_slots, lock):
+        lines = [ndjson_line(*entry) for entry in zip(keys, actions.tolist(), values.tolist(), visits.tolist())]
+        yield ("\n".join(lines) + "\n").encode()
+
+def iter_binary(q_table, lock=None, chunk_slots=CHUNK_SLOTS):
+    """ ✅ yield bytes ของรูปแบบ binary: หัวไฟล์ก่อน แล้วหนึ่ง frame ต่อชุด """
+    yield BINARY_MAGIC
+    for keys, actions, values, visits in q_table.iter_chunks(chunk_slots, lock):
+        parts = [_FRAME.pack(len(keys))]
+        for key, action, q_value, visit in zip(keys, actions.tolist(), values.tolist(), visits.tolist()):
+            data = key_to_bytes(key)
+            parts.append(bytes((len(data),)) + data + _RECORD.pack(action, q_value, visit))
+        payload = b"".join(parts)
+        yield _FRAME.pack(len(payload)) + payload
+
+def export_q_table(q_table, path, lock=None, fmt="ndjson", chunk_slots=CHUNK_SLOTS):
+    """ ✅ เขียน Q-Table ลงไฟล์ทีละชุด (`fmt` = "ndjson" หรือ "binary") คืนจำนวน byte ที่เขียน """
+    chunks = iter_binary(q_table, lock, chunk_slots) if fmt == "binary" else iter_ndjson(q_table, lock, chunk_slots)
+    written = 0
+    with open(path, "wb") as fp:
+        for chunk in chunks:
+            fp.write(chunk)
+            written += len(chunk)
+    logger.info("💾 ส่งออก Q-Table (%s) → %s (%s bytes)", fmt, path, written)
+    return written
+
+
+# -----------------------------------------------------
+# ✅ อ่าน / นำเข้า
+# -----------------------------------------------------
+def read_ndjson(stream):
+    """ ✅ yield (state_key, action_key, q_value, visits) ทีละบรรทัดจาก stream แบบ binary (ไฟล์หรือ request.stream)
+
+    บรรทัดที่สั่งลบ state ได้ (state_key, None, None, None)
+    """
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entry = json.loads(line)
+            state_key = key_from_bytes(bytes.fromhex(entry["state_key"]))
+            if entry.get("deleted"):
+                yield state_key, None, None, None
+            else:
+                yield state_key, int(entry["action_key"]), float(entry["q_value"]), entry.get("visits")
+        except (ValueError, KeyError, TypeError) as e:
+            raise StreamFormatError(f"บรรทัด {line_number}: {e}") from e
+
+def _read_exact(stream, size):
+    data = stream.read(size)
+    while data is not None and 0 < len(data) < size:  # ✅ stream ของเครือข่ายอาจคืนข้อมูลไม่ครบในครั้งเดียว
+        more = stream.read(size - len(data))
+        if not more:
+            break
+        data += more
+    return data or b""
+
+def read_binary(stream):
+    """ ✅ yield (state_key, action_key, q_value, visits) ทีละ frame จาก stream รูปแบบ binary """
+    if _read_exact(stream, len(BINARY_MAGIC)) != BINARY_MAGIC:
+        raise StreamFormatError("หัวไฟล์ไม่ใช่ Q-Table binary")
+    while True:
+        header = _read_exact(stream, _FRAME.size)
+        if not header:
+            return
+        if len(header) < _FRAME.size:
+            raise StreamFormatError("frame header ไม่ครบ")
+        (size,) = _FRAME.unpack(header)
+        payload = _read_exact(stream, size)
+        if len(payload) < size:
+            raise StreamFormatError("frame ไม่ครบ")
+
+        (count,) = _FRAME.unpack_from(payload, 0)
+        offset = _FRAME.size
+        try:
+            for _ in range(count):
+                key_length = payload[offset]
+                key = key_from_bytes(payload[offset + 1:offset + 1 + key_length])
+                action, q_value, visits = _RECORD.unpack_from(payload, offset + 1 + key_length)
+                offset += 1 + key_length + _RECORD.size
+                yield key, action, q_value, visits
+        except (IndexError, struct.error) as e:
+            raise StreamFormatError(f"record ใน frame เสีย: {e}") from e
+
+def read_entries(stream):
+    """ ✅ อ่าน stream โดยดูรูปแบบจากหัวไฟล์ (binary หรือ NDJSON) """
+    peek = getattr(stream, "peek", None)
+    head = peek(len(BINARY_MAGIC))[:len(BINARY_MAGIC)] if peek else b""
+    if head == BINARY_MAGIC:
+        return read_binary(stream)
+    return read_ndjson(stream)
+
+def import_entries(q_table, entries, lock=None, chunk_size=IMPORT_CHUNK, on_chunk=None):
+    """ ✅ ตั้งค่า Q ตาม `entries` ทีละชุด (ถือ `lock` ต่อชุด) คืนจำนวน entry ที่นำเข้า (entry ที่ action เป็น None = ลบ state)
+
+    `on_chunk(chunk)` ถูกเรียกภายใต้ lock หลังนำเข้าแต่ละชุด (เช่น mark_dirty_many ของ QTableStore)
+    """
+    lock = lock or nullcontext()
+    imported = 0
+    chunk = []
+
+    def apply(chunk):
+        with lock:
+            for state_key, action_key, q_value, visits in chunk:
+                if action_key is None:
+                    if state_key in q_table:
+                        del q_table[state_key]
+                else:
+                    q_table.set_q(state_key, action_key, q_value, visits)
+            if on_chunk:
+                on_chunk(chunk)
+
+    for entry in entries:
+        chunk.append(entry)
+        if len(chunk) >= chunk_size:
+            apply(chunk)
+            imported += len(chunk)
+            chunk = []
+    if chunk:
+        apply(chunk)
+        imported += len(chunk)
+    return imported
+
+def import_q_table(q_table, path, lock=None, chunk_size=IMPORT_CHUNK):
+    """ ✅ นำเข้าไฟล์ที่ได้จาก export_q_table (รูปแบบดูจากหัวไฟล์) คืนจำนวน entry """
+    with open(path, "rb") as fp:
+        imported = import_entries(q_table, read_entries(fp), lock, chunk_size)
+    logger.info("📥 นำเข้า Q-Table จาก %s (%s entries)", path, imported)
+    return imported
@@ -0,0 +1,253 @@
+"""
+ซิงก์ Q-Table กับเซิร์ฟเวอร์แบบ delta (POST /update_q_table)
+ขนาดข้อมูลที่ส่งและเวลาที่ถือ lock ต่อการซิงก์ขึ้นกับจำนวน entry ที่เปลี่ยน ไม่ใช่ขนาดของ Q-Table
+
+Protocol:
+- body เป็น NDJSON (q_stream) บีบอัดด้วย gzip (Content-Encoding: gzip)
+- header SYNC_MODE_HEADER = "delta" หรือ "full" และ BASE_VERSION_HEADER = เวอร์ชันที่เซิร์ฟเวอร์ยืนยันครั้งล่าสุด
+- เวอร์ชันเป็นข้อความ "<epoch>-<revision>" (epoch สุ่มใหม่ทุกครั้งที่เซิร์ฟเวอร์เริ่ม จึงไม่ชนกับเวอร์ชันก่อนเริ่มใหม่)
+- delta: เซิร์ฟเวอร์ใช้ทั้งชุดแบบ atomic (อ่านครบก่อนแล้วค่อยเขียน) เพิ่มเวอร์ชัน แล้วคืน {"status": "success", "version"}
+  ถ้าเวอร์ชันไม่ตรง (เช่นเซิร์ฟเวอร์เพิ่งเริ่มใหม่) คืน 409 {"status": "resync", "version"} → client ส่งทั้งตาราง (full)
+- full: แทนที่ Q-Table ของเซิร์ฟเวอร์ทั้งหมด (ส่งแบบ stream ทีละชุด) client ที่ยังไม่เคยซิงก์เริ่มด้วย full เสมอ
+
+รันเซิร์ฟเวอร์จำลอง: python q_sync.py serve --port 5000
+ทดสอบ protocol: python -m pytest test_q_sync.py
+"""
+
+import os
+import gzip
+import zlib
+import logging
+import argparse
+import threading
+
+from config import SYSTEM_CONFIG
+from q_matrix import QTable
+from q_stream import (NDJSON_CONTENT_TYPE, StreamFormatError, iter_ndjson, ndjson_line, ndjson_delete_line,
+                      read_ndjson, import_entries)
+
+logger = logging.getLogger(__name__)
+
+SYNC_PATH = "/update_q_table"
+SYNC_MODE_HEADER = "X-Q-Sync-Mode"
+BASE_VERSION_HEADER = "X-Q-Base-Version"
+DELTA, FULL = "delta", "full"
+
+
+def gzip_chunks(chunks, level=6):
+    """ ✅ บีบอัด bytes ที่ทยอยมาเป็น gzip แบบ stream (yield ทีละส่วน) """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# -----------------------------------------------------
+# ✅ ฝั่ง trainer
+# -----------------------------------------------------
+class SyncClient:
+    """ ✅ ติดตาม entry ที่เปลี่ยนตั้งแต่การซิงก์ที่เซิร์ฟเวอร์ยืนยันครั้งล่าสุด แล้วส่งเฉพาะส่วนนั้น
+
+    mark_dirty / mark_dirty_many / mark_deleted เรียกขณะถือ lock ของ Q-Table (เหมือน QTableStore)
+    `post(url, data=..., headers=..., timeout=...)` ค่าเริ่มต้นคือ requests.post
+    """
+
+    def __init__(self, url=None, timeout=10, level=6, post=None):
+        self.url = url or SYSTEM_CONFIG['SYNC_SERVER_URL']
+        self.timeout = timeout
+        self.level = level
+        self.post = post
+        self.version = None  # ✅ เวอร์ชันที่เซิร์ฟเวอร์ยืนยันล่าสุด (None = ยังไม่เคยซิงก์ → full)
+        self.dirty = set()
+        self.deleted_states = set()
+        self.stats = {'delta': 0, 'full': 0, 'resync': 0, 'entries': 0, 'bytes': 0}
+
+    def mark_dirty(self, state_key, action_key):
+        self.dirty.add((state_key, action_key))
+
+    def mark_dirty_many(self, entries):
+        self.dirty.update(entries)
+
+    def mark_deleted(self, state_key):
+        self.deleted_states.add(state_key)
+
+    def _post(self, chunks, mode):
+        post = self.post
+        if post is None:
+            import requests
+            post = requests.post
+        headers = {"Content-Type": NDJSON_CONTENT_TYPE, "Content-Encoding": "gzip", SYNC_MODE_HEADER: mode}
+        if self.version is not None:
+            headers[BASE_VERSION_HEADER] = self.version
+        sent = [0]
+
+        def body():
+            for data in gzip_chunks(chunks, self.level):
+                sent[0] += len(data)
+                yield data
+
+        response = post(self.url, data=body(), headers=headers, timeout=self.timeout)
+        self.stats['bytes'] += sent[0]
+        return response
+
+    def sync(self, q_table, q_table_lock):
+        """ ✅ ส่งการเปลี่ยนแปลงไปเซิร์ฟเวอร์ คืน dict ของผล (mode, entries, version) หรือ None ถ้าไม่มีอะไรเปลี่ยน
+
+        ถ้าส่งไม่สำเร็จ entry ที่ค้างจะถูกเก็บไว้ส่งครั้งหน้า (exception ของ requests ส่งต่อให้ผู้เรียก)
+        """
+        if self.version is None:
+            return self.full_sync(q_table, q_table_lock)
+
+        with q_table_lock:
+            dirty, self.dirty = self.dirty, set()
+            deleted, self.deleted_states = self.deleted_states, set()
+            # ✅ state ที่ถูกลบแล้วสร้างใหม่: ลบของเดิมที่เซิร์ฟเวอร์ แล้วส่ง action ปัจจุบันทั้งหมด
+            for state_key in deleted:
+                dirty.update((state_key, action_key) for action_key in q_table.get(state_key, ()))
+            lines = [ndjson_delete_line(state_key) for state_key in deleted]
+            for state_key, action_key in dirty:
+                q_value = q_table.get_q(state_key, action_key)
+                if q_value is not None:
+                    lines.append(ndjson_line(state_key, action_key, q_value,
+                                             q_table.get_visits(state_key, action_key)))
+
+        if not lines:
+            return None
+        try:
+            response = self._post([("\n".join(lines) + "\n").encode()], DELTA)
+            if response.status_code == 409:
+                logger.info("🔁 [Sync] เวอร์ชันไม่ตรงกับเซิร์ฟเวอร์ (%s ≠ %s) ส่งทั้งตาราง",
+                            self.version, response.json().get("version"))
+                self.stats['resync'] += 1
+                return self.full_sync(q_table, q_table_lock)
+            response.raise_for_status()
+        except Exception:
+            with q_table_lock:
+                self.dirty |= dirty
+                self.deleted_states |= deleted
+            raise
+
+        self.version = response.json()["version"]
+        self.stats['delta'] += 1
+        self.stats['entries'] += len(lines)
+        return {'mode': DELTA, 'entries': len(lines), 'version': self.version}
+
+    def full_sync(self, q_table, q_table_lock):
+        """ ✅ ส่งทั้งตารางแบบ stream (อ่านทีละชุดภายใต้ lock) ให้เซิร์ฟเวอร์แทนที่ของเดิม """
+        with q_table_lock:
+            # ✅ ทุกอย่างที่ค้างอยู่รวมใน snapshot นี้ การเปลี่ยนแปลงระหว่างส่งจะไปกับ delta ครั้งหน้า
+            dirty, self.dirty = self.dirty, set()
+            deleted, self.deleted_states = self.deleted_states, set()
+        try:
+            response = self._post(iter_ndjson(q_table, q_table_lock), FULL)
+            response.raise_for_status()
+        except Exception:
+            with q_table_lock:
+                self.dirty |= dirty
+                self.deleted_states |= deleted
+            raise
+
+        result = response.json()
+        self.version = result["version"]
+        self.stats['full'] += 1
+        self.stats['entries'] += result.get("entries", 0)
+        return {'mode': FULL, 'entries': result.get("entries", 0), 'version': self.version}
+
+_clients = {}
+
+def get_sync_client(url=None):
+    """ ✅ คืน SyncClient ของ URL นี้ (หนึ่งตัวต่อ process เหมือน get_q_store) """
+    url = url or SYSTEM_CONFIG['SYNC_SERVER_URL']
+    key = (os.getpid(), url)
+    if key not in _clients:
+        _clients[key] = SyncClient(url)
+    return _clients[key]
+
+
+# -----------------------------------------------------
+# ✅ ฝั่งเซิร์ฟเวอร์
+# -----------------------------------------------------
+class SyncServer:
+    """ ✅ Q-Table ฝั่งเซิร์ฟเวอร์พร้อมเวอร์ชัน (revision เพิ่มขึ้น 1 ทุกครั้งที่ใช้ delta หรือแทนที่ทั้งตารางสำเร็จ) """
+
+    def __init__(self, q_table=None, lock=None):
+        self.q_table = q_table if q_table is not None else QTable()
+        self.lock = lock or threading.Lock()
+        self.epoch = os.urandom(4).hex()
+        self.revision = 0
+
+    @property
+    def version(self):
+        return f"{self.epoch}-{self.revision}"
+
+    def apply_delta(self, base_version, entries):
+        """ ✅ ใช้ delta ทั้งชุดถ้า `base_version` ตรงกับเวอร์ชันปัจจุบัน คืน (สำเร็จ, เวอร์ชัน) """
+        entries = list(entries)  # ✅ อ่านครบก่อน: body เสียกลางทางจะไม่มีอะไรถูกเขียน
+        with self.lock:
+            if base_version != self.version:
+                return False, self.version
+            import_entries(self.q_table, entries, chunk_size=len(entries) or 1)
+            self.revision += 1
+            return True, self.version
+
+    def replace(self, entries):
+        """ ✅ แทนที่ทั้งตารางด้วย `entries` (สร้างตารางใหม่นอก lock แล้วสลับ) คืน (จำนวน entry, เวอร์ชัน) """
+        incoming = QTable()
+        count = import_entries(incoming, entries)
+        with self.lock:
+            self.q_table.assign(incoming)
+            self.revision += 1
+            return count, self.version
+
+    def handle(self, request):
+        """ ✅ ประมวลผล request ของ Flask คืน (payload dict, HTTP status) """
+        stream = request.stream
+        if request.headers.get("Content-Encoding", "").lower() == "gzip":
+            stream = gzip.GzipFile(fileobj=stream, mode="rb")
+        mode = request.headers.get(SYNC_MODE_HEADER, FULL)
+        try:
+            if mode == DELTA:
+                base_version = request.headers.get(BASE_VERSION_HEADER)
+                entries = list(read_ndjson(stream))
+                applied, version = self.apply_delta(base_version, entries)
+                if not applied:
+                    return {"status": "resync", "version": version}, 409
+                count = len(entries)
+            elif mode == FULL:
+                count, version = self.replace(read_ndjson(stream))
+            else:
+                return {"status": "error", "message": f"unknown sync mode {mode!r}"}, 400
+        except (StreamFormatError, OSError, EOFError, zlib.error) as e:
+            return {"status": "error", "message": str(e)}, 400
+
+        logger.debug("📥 [Sync] %s: %s entries → เวอร์ชัน %s", mode, count, version)
+        return {"status": "success", "mode": mode, "entries": count, "version": version,
+                "states": len(self.q_table)}, 200
+
+def create_sync_app(server=None):
+    """ ✅ Flask app จำลองเซิร์ฟเวอร์ (POST SYNC_PATH) สำหรับทดสอบ (test_q_sync) และใช้งานในเครื่อง """
+    from flask import Flask, request, jsonify
+
+    app = Flask(__name__)
+    app.extensions['q_sync'] = server or SyncServer()
+
+    def update_q_table():
+        payload, status = app.extensions['q_sync'].handle(request)
+        return jsonify(payload), status
+
+    app.add_url_rule(SYNC_PATH, view_func=update_q_table, methods=['POST'])
+    return app
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description="ซิงก์ Q-Table แบบ delta")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="รันเซิร์ฟเวอร์จำลอง")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+
+    create_sync_app().run(host=args.host, port=args.port, threaded=True)
@@ -0,0 +1,185 @@
+"""
+ที่เก็บ Q-Table บน SQLite (WAL mode) แบบบันทึกเฉพาะค่าที่เปลี่ยน
+ค่าใช้จ่ายในการบันทึกขึ้นกับจำนวน entry ที่เปลี่ยน ไม่ใช่ขนาดของ Q-Table
+"""
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+
+from config import SYSTEM_CONFIG
+from grid_codec import pack_grid, key_shape, key_to_bytes, key_from_bytes, encode_action
+from q_matrix import QTable
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS q_values (
+    state_key BLOB NOT NULL,
+    action_key INTEGER NOT NULL,
+    q_value REAL NOT NULL,
+    PRIMARY KEY (state_key, action_key)
+) WITHOUT ROWID;
+"""
+
+UPSERT = ("INSERT INTO q_values (state_key, action_key, q_value) VALUES (?, ?, ?) "
+          "ON CONFLICT (state_key, action_key) DO UPDATE SET q_value = excluded.q_value")
+
+class QTableStore:
+    """ ✅ ที่เก็บ Q-Table: ติดตาม entry ที่เปลี่ยน (dirty) แล้วบันทึกเป็นชุดด้วย executemany
+
+    key ของ state เก็บเป็น BLOB (grid_codec.key_to_bytes) ซึ่งเป็น PRIMARY KEY (มี index ในตัว)
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or SYSTEM_CONFIG['DB_FILE']
+        self.lock = threading.Lock()
+        self.dirty = set()            # ✅ (state_key, action_key) ที่ยังไม่ได้บันทึก
+        self.deleted_states = set()   # ✅ state ที่ถูกลบออกจาก Q-Table ในหน่วยความจำ
+        # ✅ ชุดที่ flush เขียนไม่สำเร็จ (ป้องกันด้วย self.lock ไม่ใช่ lock ของ Q-Table) รวมเข้า flush / spill ครั้งถัดไป
+        self.retry_dirty = set()
+        self.retry_deleted = set()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._migrate_legacy_table()
+
+    def _migrate_legacy_table(self):
+        """ ✅ ย้ายข้อมูลจากตาราง `q_table` รูปแบบเก่า (key เป็น JSON) มาที่ `q_values` ครั้งเดียว """
+        legacy = self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'q_table'").fetchone()
+        if not legacy:
+            return
+
+        rows = []
+        for state_key, action_key, q_value in self.conn.execute(
+                "SELECT state_key, action_key, q_value FROM q_table"):
+            try:
+                if isinstance(state_key, bytes):
+                    state_key = key_from_bytes(state_key)
+                else:
+                    state_key = pack_grid(json.loads(state_key))
+                if isinstance(action_key, str):
+                    r, c, char = json.loads(action_key)
+                    action_key = encode_action(r, c, char, key_shape(state_key)[1])
+                rows.append((key_to_bytes(state_key), action_key, q_value))
+            except Exception as e:
+                logger.warning("⚠️ [AI] Error แปลง state_key: %s -> %s", state_key, e)
+
+        with self.conn:
+            self.conn.executemany(UPSERT, rows)
+            self.conn.execute("ALTER TABLE q_table RENAME TO q_table_legacy")
+        logger.info("✅ [AI] ย้าย Q-Table รูปแบบเก่า %s records ไปยัง q_values", len(rows))
+
+    def load(self):
+        """ ✅ โหลด Q-Table ทั้งหมดเป็น QTable (q_matrix) """
+        q_table = QTable()
+        with self.lock:
+            for state_blob, action_key, q_value in self.conn.execute(
+                    "SELECT state_key, action_key, q_value FROM q_values"):
+                q_table.set_q(key_from_bytes(state_blob), action_key, q_value)
+        return q_table
+
+    def mark_dirty(self, state_key, action_key):
+        """ ✅ บันทึกว่า entry นี้เปลี่ยน (เรียกขณะถือ lock ของ Q-Table อยู่แล้ว) """
+        self.dirty.add((state_key, action_key))
+
+    def mark_dirty_many(self, entries):
+        """ ✅ บันทึกว่าหลาย (state_key, action_key) เปลี่ยน (ใช้กับการอัปเดตแบบ batch) """
+        self.dirty.update(entries)
+
+    def mark_deleted(self, state_key):
+        """ ✅ บันทึกว่า state นี้ถูกลบออกจาก Q-Table """
+        self.deleted_states.add(state_key)
+
+    def flush(self, q_table, q_table_lock):
+        """ ✅ บันทึกเฉพาะ entry ที่เปลี่ยนลง SQLite ในหนึ่ง transaction คืนจำนวน entry ที่บันทึก
+
+        ถือ `q_table_lock` เฉพาะช่วงดึงค่าที่เปลี่ยนออกมา การเขียนลงดิสก์ทำนอก lock
+        แต่จับ `self.lock` ก่อนปล่อย `q_table_lock` (ลำดับ lock เดียวกับ spill) ค่าที่ดึงออกมาจึงถูกเขียนก่อน flush / spill
+        ที่ตามมาเสมอ ไม่มี snapshot ที่เก่ากว่าเขียนทับ ถ้าเขียนไม่สำเร็จ (sqlite3.Error) entry ชุดนี้ถูกเก็บไว้เขียนครั้งหน้า
+        """
+        with q_table_lock:
+            self.lock.acquire()
+            try:
+                dirty = self.dirty | self.retry_dirty
+                deleted = self.deleted_states | self.retry_deleted
+                self.dirty, self.deleted_states = set(), set()
+                self.retry_dirty, self.retry_deleted = set(), set()
+                # ✅ state ที่ถูกลบแล้วสร้างใหม่ภายหลัง: ลบของเดิมบนดิสก์ทั้งหมด แล้วเขียน action ปัจจุบันทับ
+                for state_key in deleted:
+                    dirty.update((state_key, action_key) for action_key in q_table.get(state_key, ()))
+                rows = []
+                for state_key, action_key in dirty:
+                    q_value = q_table.get_q(state_key, action_key)
+                    if q_value is not None:
+                        rows.append((key_to_bytes(state_key), action_key, q_value))
+            except BaseException:
+                self.lock.release()
+                raise
+
+        try:
+            if not rows and not deleted:
+                return 0
+            with self.conn:
+                self.conn.executemany("DELETE FROM q_values WHERE state_key = ?",
+                                      [(key_to_bytes(state_key),) for state_key in deleted])
+                self.conn.executemany(UPSERT, rows)
+        except sqlite3.Error:
+            self.retry_dirty |= dirty
+            self.retry_deleted |= deleted
+            raise
+        finally:
+            self.lock.release()
+        logger.debug("💾 [Q-Store] บันทึก %s entries, ลบ %s states", len(rows), len(deleted))
+        return len(rows)
+
+    def spill(self, rows):
+        """ ✅ บันทึก entry ของ state ที่ถูกไล่ออกจากหน่วยความจำ (QTable.evict) ลง SQLite ทันที คืนจำนวน entry
+
+        เรียกขณะถือ lock ของ Q-Table: entry ของ state เหล่านี้ไม่ต้องบันทึกซ้ำตอน flush
+        และ state ที่เคยถูกลบ (mark_deleted) จะลบของเดิมบนดิสก์ก่อนเขียน
+        """
+        states = {row[0] for row in rows}
+        with self.lock, self.conn:
+            deleted = states & (self.deleted_states | self.retry_deleted)
+            self.deleted_states -= deleted
+            self.retry_deleted -= deleted
+            self.dirty = {entry for entry in self.dirty if entry[0] not in states}
+            self.retry_dirty = {entry for entry in self.retry_dirty if entry[0] not in states}
+
+            self.conn.executemany("DELETE FROM q_values WHERE state_key = ?",
+                                  [(key_to_bytes(state_key),) for state_key in deleted])
+            self.conn.executemany(UPSERT, [(key_to_bytes(state_key), action_key, q_value)
+                                           for state_key, action_key, q_value, _ in rows])
+        logger.debug("💾 [Q-Store] spill %s entries จาก %s states", len(rows), len(states))
+        return len(rows)
+
+    def count(self):
+        """ ✅ จำนวน records และจำนวน state ที่บันทึกไว้ """
+        with self.lock:
+            records = self.conn.execute("SELECT COUNT(*) FROM q_values").fetchone()[0]
+            states = self.conn.execute("SELECT COUNT(DISTINCT state_key) FROM q_values").fetchone()[0]
+        return records, states
+
+    def grid_sizes(self):
+        """ ✅ ขนาด Grid ทั้งหมดที่มีใน Q-Table """
+        with self.lock:
+            return sorted({key_shape(key_from_bytes(blob)) for (blob,) in
+                           self.conn.execute("SELECT DISTINCT state_key FROM q_values")})
+
+    def close(self):
+        self.conn.close()
+
+_stores = {}
+
+def get_q_store(db_path=None):
+    """ ✅ คืน QTableStore ของไฟล์นี้ (เปิดครั้งเดียวต่อ process เพื่อให้ใช้กับ worker process ได้) """
+    db_path = db_path or SYSTEM_CONFIG['DB_FILE']
+    key = (os.getpid(), db_path)
+    if key not in _stores:
+        _stores[key] = QTableStore(db_path)
+    return _stores[key]
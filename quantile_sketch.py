@@ -0,0 +1,83 @@
+"""
+ประมาณค่า quantile แบบ stream ด้วยอัลกอริทึม P² (Jain & Chlamtac, 1985)
+ใช้หน่วยความจำคงที่ (5 marker) ไม่ต้องเก็บค่าที่เห็นทั้งหมด และอ่านค่าประมาณได้ตลอดเวลาใน O(1)
+"""
+
+import numpy as np
+
+
+class P2Quantile:
+    """ ✅ ค่าประมาณ quantile `p` (0-1) ของค่าทั้งหมดที่ observe มา
+
+    5 ค่าแรกเก็บไว้ตรงๆ (คืน percentile จริงของค่าเหล่านั้น) หลังจากนั้นปรับ marker ทีละค่าด้วยสูตร parabolic
+    """
+
+    def __init__(self, p):
+        if not 0 < p < 1:
+            raise ValueError(f"p ต้องอยู่ระหว่าง 0 ถึง 1: {p}")
+        self.p = p
+        self.count = 0
+        self._heights = []                          # ✅ ความสูงของ marker (ค่า quantile ที่ 0, p/2, p, (1+p)/2, 1)
+        self._positions = [0, 1, 2, 3, 4]           # ✅ ตำแหน่งจริงของ marker
+        self._desired = [0, 2 * p, 4 * p, 2 + 2 * p, 4]  # ✅ ตำแหน่งที่ควรเป็น
+        self._increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def observe(self, value):
+        value = float(value)
+        self.count += 1
+        heights = self._heights
+        if self.count <= 5:
+            heights.append(value)
+            heights.sort()
+            return
+
+        positions, desired = self._positions, self._desired
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = 0
+            while value >= heights[cell + 1]:
+                cell += 1
+        for i in range(cell + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            desired[i] += self._increments[i]
+
+        for i in (1, 2, 3):
+            offset = desired[i] - positions[i]
+            if (offset >= 1 and positions[i + 1] - positions[i] > 1) or \
+                    (offset <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if offset > 0 else -1
+                height = self._parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = heights[i] + step * (heights[i + step] - heights[i]) / (positions[i + step] - positions[i])
+                heights[i] = height
+                positions[i] += step
+
+    def observe_many(self, values):
+        for value in np.asarray(values, dtype=float).ravel().tolist():
+            self.observe(value)
+
+    def _parabolic(self, i, step):
+        heights, positions = self._heights, self._positions
+        below, here, above = positions[i - 1], positions[i], positions[i + 1]
+        return heights[i] + step / (above - below) * (
+            (here - below + step) * (heights[i + 1] - heights[i]) / (above - here)
+            + (above - here - step) * (heights[i] - heights[i - 1]) / (here - below)
+        )
+
+    def value(self):
+        """ ✅ ค่าประมาณปัจจุบัน หรือ None ถ้ายังไม่เคย observe """
+        if not self.count:
+            return None
+        if self.count <= 5:  # ✅ percentile จริงของค่าที่มี (interpolate แบบเส้นตรงเหมือน np.percentile)
+            heights = self._heights
+            position = self.p * (len(heights) - 1)
+            low = int(position)
+            high = min(low + 1, len(heights) - 1)
+            return heights[low] + (heights[high] - heights[low]) * (position - low)
+        return self._heights[2]
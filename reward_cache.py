@@ -0,0 +1,95 @@
+"""
+แคชคะแนนของ Grid แบบ LRU ใช้ key แบบบีบอัดจาก grid_codec.pack_grid
+ใน train_ai ผังบางส่วนเดิมๆ ถูกคำนวณคะแนนซ้ำหลายรอบ (โดยเฉพาะ Grid 3x3 / 4x4)
+แคชนี้จึงตอบคะแนนที่เคยคำนวณแล้วได้ทันที
+"""
+
+import os
+import logging
+from collections import OrderedDict
+
+from config import SYSTEM_CONFIG
+from grid_codec import pack_grid
+from reward_calculator import calculate_reward_verbose
+
+logger = logging.getLogger(__name__)
+
+
+class RewardCache:
+    """ ✅ แคช LRU ขนาดจำกัด (key → คะแนน) พร้อมตัวนับ hit/miss
+
+    ไม่มี lock: ใช้ภายใน process เดียว (แต่ละ worker process มี instance ของตัวเองผ่าน get_reward_cache)
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize or SYSTEM_CONFIG['REWARD_CACHE_SIZE']
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """ ✅ คืนคะแนนที่แคชไว้ (และย้ายไปท้ายคิว LRU) หรือ `default` ถ้าไม่มี """
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """ ✅ เก็บคะแนน ถ้าเต็มให้ทิ้ง key ที่ไม่ได้ใช้นานที่สุด """
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """ ✅ คืนคะแนนจากแคช ถ้าไม่มีให้เรียก `compute()` แล้วเก็บผลไว้ """
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def stats(self):
+        """ ✅ สถิติของแคช: hits, misses, hit_rate, size, maxsize """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+        }
+
+    def clear(self):
+        self._data.clear()
+        self.hits = self.misses = 0
+
+_caches = {}
+
+def get_reward_cache(name="reward_calculator", maxsize=None):
+    """ ✅ คืน RewardCache ของฟังก์ชันคะแนน `name` (สร้างครั้งเดียวต่อ process)
+
+    ฟังก์ชันคะแนนต่างกัน (เช่น jecsun) ต้องใช้ชื่อต่างกัน เพราะ key เป็น Grid อย่างเดียว
+    """
+    key = (os.getpid(), name)
+    if key not in _caches:
+        _caches[key] = RewardCache(maxsize)
+    return _caches[key]
+
+def cached_reward(grid, score_fn=calculate_reward_verbose, name="reward_calculator"):
+    """ ✅ คะแนนของ Grid ผ่านแคช (ค่าเท่ากับเรียก score_fn(grid) ตรงๆ) """
+    return get_reward_cache(name).get_or_compute(pack_grid(grid), lambda: score_fn(grid))
+
+def log_cache_stats(name="reward_calculator", level=logging.INFO):
+    """ ✅ บันทึกสถิติของแคชลง log """
+    stats = get_reward_cache(name).stats()
+    logger.log(level, "🗃️ Reward cache (%s): hit %.1f%% (%s/%s) | %s/%s entries", name,
+               stats['hit_rate'] * 100, stats['hits'], stats['hits'] + stats['misses'],
+               stats['size'], stats['maxsize'])
@@ -1,6 +1,11 @@
+import logging
 import numpy as np
 from collections import deque
 
+from grid_topology import get_topology
+
+logger = logging.getLogger(__name__)
+
 # ✅ ตั้งค่าการให้คะแนน (แหล่งข้อมูลหลัก)
 SCORES_CONFIG = {
     'E': 50,  # พื้นที่เชิงพาณิชย์
@@ -17,40 +22,37 @@ def get_scores_config():
 def count_r_clusters(grid, use_dfs=False):
     """ ✅ นับจำนวนกลุ่มของ 'R' ที่แยกกัน พร้อมเลือกโหมด BFS หรือ DFS """
     GRID_ROWS, GRID_COLS = len(grid), len(grid[0])  # ✅ ดึงขนาดของ Grid อัตโนมัติ
-    visited = [[False] * GRID_COLS for _ in range(GRID_ROWS)]  # ✅ ใช้ List แทน Set
+    neighbors = get_topology(GRID_ROWS, GRID_COLS).neighbors  # ✅ เพื่อนบ้านที่คำนวณไว้แล้ว ไม่ต้องเช็คขอบ
+    is_road = [cell == 'R' for row in grid for cell in row]
+    visited = [False] * (GRID_ROWS * GRID_COLS)  # ✅ ใช้ List แทน Set
     clusters = 0
 
-    def bfs(r, c):
+    def bfs(i):
         """ ✅ BFS สำหรับหา Cluster """
-        queue = deque([(r, c)])
-        visited[r][c] = True
+        queue = deque([i])
+        visited[i] = True
         while queue:
-            x, y = queue.popleft()
-            for dx, dy in [(-1,0), (1,0), (0,-1), (0,1)]:  # 4 ทิศทาง
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < GRID_ROWS and 0 <= ny < GRID_COLS and not visited[nx][ny] and grid[nx][ny] == 'R':
-                    visited[nx][ny] = True
-                    queue.append((nx, ny))
-
-    def dfs(r, c):
+            for n in neighbors[queue.popleft()]:
+                if is_road[n] and not visited[n]:
+                    visited[n] = True
+                    queue.append(n)
+
+    def dfs(i):
         """ ✅ DFS สำหรับหา Cluster """
-        stack = [(r, c)]
-        visited[r][c] = True
+        stack = [i]
+        visited[i] = True
         while stack:
-            x, y = stack.pop()
-            for dx, dy in [(-1,0), (1,0), (0,-1), (0,1)]:
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < GRID_ROWS and 0 <= ny < GRID_COLS and not visited[nx][ny] and grid[nx][ny] == 'R':
-                    visited[nx][ny] = True
-                    stack.append((nx, ny))
+            for n in neighbors[stack.pop()]:
+                if is_road[n] and not visited[n]:
+                    visited[n] = True
+                    stack.append(n)
 
     search_func = dfs if use_dfs else bfs  # ✅ เลือก BFS หรือ DFS
 
-    for r in range(GRID_ROWS):
-        for c in range(GRID_COLS):
-            if grid[r][c] == 'R' and not visited[r][c]:
-                clusters += 1
-                search_func(r, c)  # ✅ เรียกใช้ BFS หรือ DFS
+    for i, road in enumerate(is_road):
+        if road and not visited[i]:
+            clusters += 1
+            search_func(i)  # ✅ เรียกใช้ BFS หรือ DFS
 
     return clusters
 
@@ -59,12 +61,13 @@ def calculate_reward_verbose(grid):
     
     # ✅ กรณีที่ Grid เป็น None หรือว่าง
     if grid is None or len(grid) == 0 or len(grid[0]) == 0:
-        print(f"⚠️ Error: grid เป็น None หรือว่าง! กำลังใช้ Grid เปล่าแทน...")
+        logger.warning("⚠️ Error: grid เป็น None หรือว่าง! กำลังใช้ Grid เปล่าแทน...")
         grid_size = 5
         grid = np.full((grid_size, grid_size), '0')
 
     grid = np.array(grid)
     rows, cols = grid.shape
+    topology = get_topology(rows, cols)
 
     # ✅ คำนวณคะแนนพื้นฐาน (Base Score)
     SCORES = get_scores_config()
@@ -75,9 +78,7 @@ def calculate_reward_verbose(grid):
     bonus_details = {}
 
     # ✅ โบนัส +50 ถ้าบ้าน (H) อยู่ที่ขอบ
-    h_positions = np.argwhere(grid == 'H')
-    edge_houses = np.sum((h_positions[:, 0] == 0) | (h_positions[:, 0] == rows - 1) |
-                          (h_positions[:, 1] == 0) | (h_positions[:, 1] == cols - 1))
+    edge_houses = np.sum((grid == 'H') & topology.edge_mask)
     bonus_details["H ติดขอบ"] = edge_houses * 50
     bonus += edge_houses * 50
 
@@ -104,44 +105,21 @@ def calculate_reward_verbose(grid):
     penalty = 0
     penalty_details = {}
 
-    # ✅ ตรวจสอบว่าบ้าน (`H`) เชื่อมต่อกับถนน (`R`) หรือไม่
-    h_positions = np.argwhere(grid == 'H')
-    num_h_not_connected = 0
-    
-    for r, c in h_positions:
-        has_road_neighbor = False
-        # ตรวจสอบ 4 ทิศทาง
-        for dr, dc in [(-1,0), (1,0), (0,-1), (0,1)]:
-            nr, nc = r + dr, c + dc
-            if 0 <= nr < rows and 0 <= nc < cols and grid[nr,nc] == 'R':
-                has_road_neighbor = True
-                break
-        if not has_road_neighbor:
-            num_h_not_connected += 1
+    # ✅ ตรวจสอบว่าบ้าน (`H`) และ `E` เชื่อมต่อกับถนน (`R`) หรือไม่ (ดูเพื่อนบ้าน 4 ทิศจากตาราง topology)
+    flat = grid.ravel()
+    road_neighbor = topology.pad(flat == 'R')[topology.neighbor_index].any(axis=1)
+    num_h_not_connected = int(np.sum((flat == 'H') & ~road_neighbor))
     
     penalty_details["H ไม่ติดถนน"] = -300 * num_h_not_connected
     penalty -= 300 * num_h_not_connected
 
     # ✅ ตรวจสอบ `E` ที่ไม่ติดถนน
-    e_positions = np.argwhere(grid == 'E')
-    num_e_not_connected = 0
-    
-    for r, c in e_positions:
-        has_road_neighbor = False
-        # ตรวจสอบ 4 ทิศทาง
-        for dr, dc in [(-1,0), (1,0), (0,-1), (0,1)]:
-            nr, nc = r + dr, c + dc
-            if 0 <= nr < rows and 0 <= nc < cols and grid[nr,nc] == 'R':
-                has_road_neighbor = True
-                break
-        if not has_road_neighbor:
-            num_e_not_connected += 1
+    num_e_not_connected = int(np.sum((flat == 'E') & ~road_neighbor))
     
     penalty_details["E ไม่ติดถนน"] = -1000 * num_e_not_connected
     penalty -= 1000 * num_e_not_connected
 
     # ✅ ตรวจสอบถนนที่ติดกัน
-    r_positions = np.argwhere(grid == 'R')
     num_r_clusters = count_r_clusters(grid)  # นับจำนวนกลุ่มของ R ที่แยกกัน
     
     if num_r_clusters > 1:  # ถ้ามี R มากกว่า 1 กลุ่ม
@@ -179,6 +157,297 @@ def calculate_reward_verbose(grid):
 
     # ✅ คำนวณคะแนนรวม
     total_score = base_score + bonus + penalty
-    print(f"🎯 Debug: คะแนน Grid = {total_score} (Base: {base_score}, Bonus: {bonus}, Penalty: {penalty})")
+    logger.debug("🎯 Debug: คะแนน Grid = %s (Base: %s, Bonus: %s, Penalty: %s)", total_score, base_score, bonus, penalty)
+
+    return total_score 
+
+class IncrementalScorer:
+    """ ✅ ตัวคำนวณคะแนนแบบเพิ่มทีละช่อง (ให้ผลเท่ากับ calculate_reward_verbose)
+
+    เก็บ Grid ปัจจุบันและคะแนนย่อยแต่ละส่วนไว้ เมื่อเปลี่ยนค่าช่องเดียว
+    จะคำนวณใหม่เฉพาะหน้าต่าง 1x3 / 3x1 และเพื่อนบ้านที่ช่องนั้นแตะเท่านั้น
+    ส่วนกลุ่มถนน (R) ติดตามด้วย Union-Find แบบเพิ่มทีละช่อง
+    """
+
+    def __init__(self, grid):
+        grid = np.array(grid)
+        if grid.dtype == np.uint8:
+            from grid_codec import decode_grid
+            grid = decode_grid(grid)
+        self.rows, self.cols = grid.shape
+        self.cells = [str(cell) for cell in grid.ravel()]
+        self.scores = get_scores_config()
+
+        # ✅ เพื่อนบ้าน, ช่องขอบ และหน้าต่าง Pattern (1x3 / 3x1) ใช้ตารางร่วมจาก grid_topology
+        topology = get_topology(self.rows, self.cols)
+        self.neighbors = topology.neighbors
+        self.is_edge = topology.is_edge
+        self.all_windows = topology.windows
+        self.windows = topology.cell_windows
+
+        self._rebuild()
+
+    # -----------------------------------------------------
+    # ✅ คะแนนย่อย
+    # -----------------------------------------------------
+    def _rebuild(self):
+        """ ✅ คำนวณคะแนนย่อยทั้งหมดใหม่จาก Grid ปัจจุบัน """
+        cells = self.cells
+        self.base = sum(self.scores.get(cell, 0) for cell in cells)
+        self.edge_houses = sum(1 for i, cell in enumerate(cells) if cell == 'H' and self.is_edge[i])
+        self.num_green = cells.count('G')
+
+        self.pattern_bonus = sum(self._window_bonus(window, cells.__getitem__) for window in self.all_windows)
+
+        self.h_not_connected = 0
+        self.e_not_connected = 0
+        for i, cell in enumerate(cells):
+            if cell in ('H', 'E') and not self._has_road_neighbor(i, cells.__getitem__):
+                if cell == 'H':
+                    self.h_not_connected += 1
+                else:
+                    self.e_not_connected += 1
+
+        # ✅ Union-Find สำหรับกลุ่มถนน
+        self.parent = list(range(len(cells)))
+        self.size = [1] * len(cells)
+        self.r_clusters = 0
+        for i, cell in enumerate(cells):
+            if cell == 'R':
+                self.r_clusters += 1
+                for n in self.neighbors[i]:
+                    if n < i and cells[n] == 'R' and self._union(i, n):
+                        self.r_clusters -= 1
+
+    @staticmethod
+    def _window_bonus(window, value):
+        """ ✅ โบนัสของหน้าต่างเดียว: HHH / RRR แนวนอน และ H-R-H แนวตั้ง """
+        kind, a, b, c = window
+        va, vb, vc = value(a), value(b), value(c)
+        if kind == 'h':
+            if va == vb == vc and va in ('H', 'R'):
+                return 100
+        elif va == 'H' and vb == 'R' and vc == 'H':
+            return 100
+        return 0
+
+    def _has_road_neighbor(self, i, value):
+        return any(value(n) == 'R' for n in self.neighbors[i])
+
+    def _find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def _union(self, a, b):
+        ra, rb = self._find(a), self._find(b)
+        if ra == rb:
+            return False
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+        return True
+
+    def _count_clusters_without(self, index):
+        """ ✅ นับกลุ่มถนนใหม่เมื่อถนนที่ `index` ถูกเอาออก (ใช้ในกรณีลบ R เท่านั้น) """
+        cells = self.cells
+        visited = [False] * len(cells)
+        visited[index] = True
+        clusters = 0
+        for start, cell in enumerate(cells):
+            if cell != 'R' or visited[start]:
+                continue
+            clusters += 1
+            visited[start] = True
+            stack = [start]
+            while stack:
+                i = stack.pop()
+                for n in self.neighbors[i]:
+                    if not visited[n] and cells[n] == 'R':
+                        visited[n] = True
+                        stack.append(n)
+        return clusters
+
+    def _local_terms(self, index, value):
+        """ ✅ ผลรวมโบนัส Pattern และค่าปรับการเชื่อมต่อ เฉพาะบริเวณที่ช่อง `index` มีผล """
+        bonus = sum(self._window_bonus(window, value) for window in self.windows[index])
+        h_missing = e_missing = 0
+        for i in (index,) + self.neighbors[index]:
+            cell = value(i)
+            if cell in ('H', 'E') and not self._has_road_neighbor(i, value):
+                if cell == 'H':
+                    h_missing += 1
+                else:
+                    e_missing += 1
+        return bonus, h_missing, e_missing
+
+    @staticmethod
+    def _total(base, edge_houses, pattern_bonus, h_not_connected, e_not_connected,
+               r_clusters, num_green, total_cells):
+        penalty = -300 * h_not_connected - 1000 * e_not_connected
+        if r_clusters > 1:
+            penalty -= 500 * r_clusters
+        elif r_clusters == 0:
+            penalty -= 1000
+        green_ratio = num_green / total_cells
+        if green_ratio < 0.05:
+            penalty -= 500
+        if green_ratio > 0.20:
+            penalty -= 500
+        # ✅ calculate_reward_verbose บวกโบนัส "H ติดขอบ" สองครั้ง (ตรง ๆ และผ่าน bonus_details)
+        return base + edge_houses * 100 + pattern_bonus + penalty
+
+    # -----------------------------------------------------
+    # ✅ API หลัก
+    # -----------------------------------------------------
+    def total(self):
+        """ ✅ คะแนนรวมของ Grid ปัจจุบัน """
+        return self._total(self.base, self.edge_houses, self.pattern_bonus,
+                           self.h_not_connected, self.e_not_connected,
+                           self.r_clusters, self.num_green, len(self.cells))
+
+    def _delta(self, r, c, value):
+        """ ✅ คำนวณคะแนนย่อยใหม่ถ้าเปลี่ยนช่อง (r, c) เป็น `value` (ยังไม่บันทึกลง Grid) """
+        index = r * self.cols + c
+        old = self.cells[index]
+        cells = self.cells
+
+        def new_value(i):
+            return value if i == index else cells[i]
+
+        old_bonus, old_h, old_e = self._local_terms(index, cells.__getitem__)
+        new_bonus, new_h, new_e = self._local_terms(index, new_value)
+
+        r_clusters = self.r_clusters
+        if old != 'R' and value == 'R':
+            roots = {self._find(n) for n in self.neighbors[index] if cells[n] == 'R'}
+            r_clusters += 1 - len(roots)
+        elif old == 'R' and value != 'R':
+            r_clusters = self._count_clusters_without(index)
+
+        is_edge = self.is_edge[index]
+        return {
+            'base': self.base + self.scores.get(value, 0) - self.scores.get(old, 0),
+            'edge_houses': self.edge_houses + (is_edge and value == 'H') - (is_edge and old == 'H'),
+            'pattern_bonus': self.pattern_bonus + new_bonus - old_bonus,
+            'h_not_connected': self.h_not_connected + new_h - old_h,
+            'e_not_connected': self.e_not_connected + new_e - old_e,
+            'r_clusters': r_clusters,
+            'num_green': self.num_green + (value == 'G') - (old == 'G'),
+        }
+
+    def score_if(self, r, c, value):
+        """ ✅ คืนคะแนนรวมถ้าวาง `value` ที่ (r, c) โดยไม่แก้ไข Grid จริง """
+        if self.cells[r * self.cols + c] == value:
+            return self.total()
+        terms = self._delta(r, c, value)
+        return self._total(total_cells=len(self.cells), **terms)
+
+    def set(self, r, c, value):
+        """ ✅ วาง `value` ที่ (r, c) อัปเดตคะแนนย่อย แล้วคืนคะแนนรวมใหม่ """
+        index = r * self.cols + c
+        old = self.cells[index]
+        if old == value:
+            return self.total()
+
+        terms = self._delta(r, c, value)
+        self.cells[index] = value
+        for name, term in terms.items():
+            setattr(self, name, term)
+
+        if old == 'R' and value != 'R':
+            # ✅ Union-Find ลบสมาชิกไม่ได้ จึงสร้างใหม่เฉพาะกรณีลบถนน
+            self._rebuild()
+        elif old != 'R' and value == 'R':
+            self.parent[index] = index
+            self.size[index] = 1
+            for n in self.neighbors[index]:
+                if self.cells[n] == 'R':
+                    self._union(index, n)
+        return self.total()
+
+    def to_grid(self):
+        """ ✅ คืน Grid ปัจจุบันเป็น NumPy array """
+        return np.array(self.cells).reshape(self.rows, self.cols)
+
+
+def score_batch(grids):
+    """ ✅ คำนวณคะแนนของหลาย Grid พร้อมกันในครั้งเดียว (ให้ผลเท่ากับ calculate_reward_verbose)
+
+    `grids` เป็น array ขนาด [N, rows, cols] ของรหัสจาก grid_codec (หรือตัวอักษรก็ได้)
+    คืนค่าเป็น int64 array ขนาด [N]
+    """
+    from grid_codec import CELL_CODES, encode_grid
+
+    grids = encode_grid(grids)
+    if grids.ndim == 2:
+        grids = grids[np.newaxis]
+    n, rows, cols = grids.shape
+
+    # ✅ คะแนนพื้นฐาน: ตารางคะแนนตามรหัส
+    SCORES = get_scores_config()
+    code_scores = np.zeros(8, dtype=np.int64)
+    for cell, code in CELL_CODES.items():
+        code_scores[code] = SCORES.get(cell, 0)
+    base_score = code_scores[grids].sum(axis=(1, 2))
+
+    is_h = grids == CELL_CODES['H']
+    is_r = grids == CELL_CODES['R']
+    is_e = grids == CELL_CODES['E']
+    is_g = grids == CELL_CODES['G']
+
+    topology = get_topology(rows, cols)
+    flat_h = is_h.reshape(n, -1)
+    flat_r = is_r.reshape(n, -1)
+
+    # ✅ โบนัส H ติดขอบ (นับสองครั้งเหมือน calculate_reward_verbose)
+    bonus = (is_h & topology.edge_mask).sum(axis=(1, 2)) * 100
+
+    # ✅ โบนัสจาก Pattern: HHH / RRR แนวนอน และ H-R-H แนวตั้ง (ดึงทุกหน้าต่างด้วยตาราง index)
+    h_windows, v_windows = topology.window_index['h'], topology.window_index['v']
+    bonus += flat_h[:, h_windows].all(axis=2).sum(axis=1) * 100
+    bonus += flat_r[:, h_windows].all(axis=2).sum(axis=1) * 100
+    bonus += (flat_h[:, v_windows[:, 0]] & flat_r[:, v_windows[:, 1]] & flat_h[:, v_windows[:, 2]]).sum(axis=1) * 100
+
+    # ✅ ค่าปรับ H / E ที่ไม่ติดถนน
+    road_neighbor = topology.pad(flat_r)[:, topology.neighbor_index].any(axis=2)
+    penalty = -300 * (flat_h & ~road_neighbor).sum(axis=1)
+    penalty -= 1000 * (is_e.reshape(n, -1) & ~road_neighbor).sum(axis=1)
+
+    # ✅ ค่าปรับกลุ่มถนน
+    r_clusters = count_r_clusters_batch(is_r)
+    penalty -= np.where(r_clusters > 1, 500 * r_clusters, 0)
+    penalty -= np.where(r_clusters == 0, 1000, 0)
+
+    # ✅ ค่าปรับสัดส่วนพื้นที่สีเขียว
+    green_ratio = is_g.sum(axis=(1, 2)) / (rows * cols)
+    penalty -= np.where(green_ratio < 0.05, 500, 0)
+    penalty -= np.where(green_ratio > 0.20, 500, 0)
+
+    return base_score + bonus + penalty
+
+def count_r_clusters_batch(is_road):
+    """ ✅ นับกลุ่มถนนของหลาย Grid พร้อมกัน ด้วยการกระจาย label ค่าต่ำสุดระหว่างเพื่อนบ้าน
+
+    `is_road` เป็น bool array ขนาด [N, rows, cols] คืนค่าเป็น int64 array ขนาด [N]
+    """
+    n, rows, cols = is_road.shape
+    topology = get_topology(rows, cols)
+    is_road = is_road.reshape(n, -1)
+    no_label = topology.size
+    own_label = np.arange(topology.size)
+    labels = np.where(is_road, own_label, no_label)
+
+    while True:
+        # ✅ ช่องสำรองท้ายแถวมี label เป็น no_label จึงไม่มีผลกับค่าต่ำสุด
+        spread = topology.pad(labels, no_label)[:, topology.neighbor_index].min(axis=2)
+        spread = np.where(is_road, np.minimum(labels, spread), no_label)
+        if np.array_equal(spread, labels):
+            break
+        labels = spread
 
-    return total_score 
\ No newline at end of file
+    # ✅ แต่ละกลุ่มมีช่องเดียวที่ label เท่ากับตำแหน่งของตัวเอง (ช่องแรกของกลุ่ม)
+    return (is_road & (labels == own_label)).sum(axis=1).astype(np.int64)
@@ -0,0 +1,94 @@
+"""
+ระบบสมมาตรของ Grid (กลุ่ม D4: หมุน 4 แบบ และกลับด้าน 4 แบบ)
+ใช้ย่อ state ที่เป็นภาพหมุน/กลับด้านของกันให้เหลือตัวแทนเดียวใน Q-Table
+"""
+
+import random
+from functools import lru_cache
+
+import numpy as np
+
+from grid_codec import CELL_CODES, pack_grid, encode_action, decode_action
+
+# ✅ การแปลงทั้ง 8 แบบของกลุ่ม D4 (หมุนตามเข็มนาฬิกา)
+TRANSFORMS = {
+    'identity': lambda g: g,
+    'rot90': lambda g: np.rot90(g, k=-1),
+    'rot180': lambda g: np.rot90(g, k=2),
+    'rot270': lambda g: np.rot90(g, k=1),
+    'flip_lr': lambda g: g[:, ::-1],
+    'flip_ud': lambda g: g[::-1, :],
+    'transpose': lambda g: g.T,
+    'anti_transpose': lambda g: np.rot90(g, k=2).T,
+}
+
+INVERSE = {
+    'identity': 'identity', 'rot90': 'rot270', 'rot180': 'rot180', 'rot270': 'rot90',
+    'flip_lr': 'flip_lr', 'flip_ud': 'flip_ud', 'transpose': 'transpose', 'anti_transpose': 'anti_transpose',
+}
+
+# ✅ กลุ่มย่อยที่คะแนนไม่เปลี่ยน: reward ให้โบนัส HHH/RRR เฉพาะแนวนอน และ H-R-H เฉพาะแนวตั้ง
+# (บ้านหันหน้าทิศเหนือ/ใต้) จึงใช้ได้เฉพาะการกลับด้านที่ไม่สลับแถวกับคอลัมน์
+# ตรวจสอบได้ด้วย find_score_preserving_symmetries()
+SCORE_PRESERVING_SYMMETRIES = ('identity', 'flip_lr', 'flip_ud', 'rot180')
+
+def transform_grid(grid, name):
+    """ ✅ แปลง Grid ด้วยการหมุน/กลับด้านตามชื่อ """
+    return np.ascontiguousarray(TRANSFORMS[name](np.asarray(grid)))
+
+@lru_cache(maxsize=None)
+def _cell_map(name, rows, cols):
+    """ ✅ ตารางแปลงตำแหน่งช่อง: ช่อง i ของ Grid เดิมไปอยู่ช่องไหนหลังแปลง และขนาด Grid ใหม่ """
+    index = np.arange(rows * cols).reshape(rows, cols)
+    moved = TRANSFORMS[name](index)
+    cell_map = np.empty(rows * cols, dtype=np.int64)
+    cell_map[moved.ravel()] = np.arange(rows * cols)
+    return tuple(cell_map.tolist()), moved.shape
+
+def transform_cell(r, c, name, shape):
+    """ ✅ แปลงพิกัด (r, c) ของ Grid ขนาด `shape` ไปเป็นพิกัดหลังแปลง """
+    cell_map, (_, new_cols) = _cell_map(name, *shape)
+    return divmod(cell_map[r * shape[1] + c], new_cols)
+
+def transform_action(action, name, shape):
+    """ ✅ แปลง Action ที่เข้ารหัสแล้ว (grid_codec.encode_action) ไปตามการแปลง Grid """
+    r, c, char = decode_action(action, shape[1])
+    cell_map, (_, new_cols) = _cell_map(name, *shape)
+    new_r, new_c = divmod(cell_map[r * shape[1] + c], new_cols)
+    return encode_action(new_r, new_c, char, new_cols)
+
+def canonicalize(grid, symmetries=SCORE_PRESERVING_SYMMETRIES):
+    """ ✅ หาตัวแทนของ Grid ภายใต้กลุ่มสมมาตร: คืน (key ที่น้อยที่สุด, ชื่อการแปลงที่ใช้) """
+    best_key, best_name = None, None
+    for name in symmetries:
+        key = pack_grid(transform_grid(grid, name))
+        if best_key is None or key < best_key:
+            best_key, best_name = key, name
+    return best_key, best_name
+
+def canonical_state_action(state, action, symmetries=SCORE_PRESERVING_SYMMETRIES):
+    """ ✅ แปลง (state, action ที่เข้ารหัสแล้ว) ไปเป็นตัวแทน คืน (state_key, action_key, ชื่อการแปลง) """
+    state_key, name = canonicalize(state, symmetries)
+    return state_key, transform_action(action, name, np.shape(state)), name
+
+def restore_action(action, name, shape):
+    """ ✅ แปลง Action ของตัวแทนกลับไปเป็นพิกัดของ Grid เดิม (`shape` คือขนาด Grid เดิม) """
+    canonical_shape = _cell_map(name, *shape)[1]
+    return transform_action(action, INVERSE[name], canonical_shape)
+
+def find_score_preserving_symmetries(score_fn, shapes=((3, 3), (3, 4), (4, 4), (5, 5)), samples=200, seed=0):
+    """ ✅ ตรวจว่าการแปลงใดใน D4 ที่คะแนนไม่เปลี่ยนเลย บน Grid สุ่มทุกขนาดที่กำหนด
+
+    ใช้ยืนยันว่า SCORE_PRESERVING_SYMMETRIES ยังถูกต้องเมื่อมีการแก้ไข reward
+    """
+    rng = random.Random(seed)
+    cells = [cell for cell in CELL_CODES if cell != 'X']
+    preserving = set(TRANSFORMS)
+    for rows, cols in shapes:
+        for _ in range(samples):
+            grid = np.array([[rng.choice(cells) for _ in range(cols)] for _ in range(rows)])
+            score = score_fn(grid)
+            for name in list(preserving):
+                if score_fn(transform_grid(grid, name)) != score:
+                    preserving.discard(name)
+    return tuple(name for name in TRANSFORMS if name in preserving)
@@ -0,0 +1,107 @@
+"""
+ทดสอบ protocol ของ q_sync ผ่าน HTTP กับเซิร์ฟเวอร์จำลอง (create_sync_app) ที่รันใน thread
+full ครั้งแรก → delta → ไม่มีอะไรเปลี่ยน → เซิร์ฟเวอร์เริ่มใหม่ (409 → full) → body เสีย (400)
+รัน: python -m pytest test_q_sync.py (หรือ python -m unittest test_q_sync)
+"""
+
+import gzip
+import random
+import threading
+import unittest
+
+import requests
+from werkzeug.serving import make_server
+
+from grid_codec import pack_grid
+from q_matrix import QTable
+from q_sync import (SYNC_PATH, SYNC_MODE_HEADER, BASE_VERSION_HEADER, DELTA, FULL, SyncClient, SyncServer,
+                    create_sync_app)
+
+STATES = 2000
+CHANGES = 50
+
+def table_entries(q_table):
+    return sorted((state_key, action_key, round(q_value, 4)) for state_key, action_key, q_value, _ in q_table.entries())
+
+
+class SyncProtocolTest(unittest.TestCase):
+    def setUp(self):
+        self.rng = random.Random(0)
+        self.lock = threading.Lock()
+        self.table = QTable()
+        self.keys = []
+        for _ in range(STATES):
+            grid = [[self.rng.choice("0HRG") for _ in range(5)] for _ in range(5)]
+            grid[0][0] = 'E'
+            self.keys.append(pack_grid(grid))
+            for action_key in self.rng.sample(range(75), 3):
+                self.table.set_q(self.keys[-1], action_key, round(self.rng.uniform(-50, 50), 4), visits=1)
+
+        self.app = create_sync_app()
+        self.http = make_server("127.0.0.1", 0, self.app, threaded=True)
+        threading.Thread(target=self.http.serve_forever, daemon=True).start()
+        self.addCleanup(self.http.shutdown)
+        self.client = SyncClient(f"http://127.0.0.1:{self.http.server_port}{SYNC_PATH}")
+
+    @property
+    def server(self):
+        return self.app.extensions['q_sync']
+
+    def sync(self, expected_mode):
+        """ ✅ ซิงก์หนึ่งครั้ง ตรวจโหมดและว่าตารางสองฝั่งตรงกัน คืนจำนวน byte ที่ส่ง """
+        bytes_before = self.client.stats['bytes']
+        result = self.client.sync(self.table, self.lock)
+        self.assertEqual(result['mode'], expected_mode)
+        self.assertEqual(result['version'], self.server.version)
+        self.assertEqual(table_entries(self.server.q_table), table_entries(self.table))
+        return self.client.stats['bytes'] - bytes_before
+
+    def change_entries(self):
+        with self.lock:
+            for state_key in self.rng.sample(self.keys, CHANGES):
+                action_key = self.rng.randrange(75)
+                self.table.set_q(state_key, action_key, round(self.rng.uniform(-50, 50), 4), visits=2)
+                self.client.mark_dirty(state_key, action_key)
+            for state_key in self.rng.sample(self.keys, CHANGES // 5):
+                if state_key in self.table:
+                    del self.table[state_key]
+                    self.client.mark_deleted(state_key)
+
+    def test_full_then_delta(self):
+        full_bytes = self.sync(FULL)
+        self.change_entries()
+        delta_bytes = self.sync(DELTA)
+        self.assertLess(delta_bytes * 10, full_bytes)
+        self.assertIsNone(self.client.sync(self.table, self.lock))  # ✅ ไม่มีอะไรเปลี่ยน ไม่ส่ง
+
+    def test_server_restart_triggers_full_resync(self):
+        self.sync(FULL)
+        self.app.extensions['q_sync'] = SyncServer()  # ✅ จำลองเซิร์ฟเวอร์เริ่มใหม่ (เวอร์ชันเดิมใช้ไม่ได้)
+        self.change_entries()
+        self.sync(FULL)
+        self.assertEqual(self.client.stats['resync'], 1)
+
+    def test_failed_post_keeps_changes(self):
+        self.sync(FULL)
+        self.change_entries()
+        url, self.client.url = self.client.url, "http://127.0.0.1:1" + SYNC_PATH  # ✅ ไม่มีเซิร์ฟเวอร์
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.client.sync(self.table, self.lock)
+        self.client.url = url
+        self.sync(DELTA)
+
+    def test_bad_body_rejected_atomically(self):
+        self.sync(FULL)
+        before = table_entries(self.server.q_table)
+        version = self.server.version
+        body = b'{"state_key": "00", "action_key": 1, "q_value": 1.0}\n{"state_key": "zz"}\n'
+        response = requests.post(self.client.url, data=gzip.compress(body), timeout=10,
+                                 headers={"Content-Encoding": "gzip", SYNC_MODE_HEADER: DELTA,
+                                          BASE_VERSION_HEADER: version})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(table_entries(self.server.q_table), before)
+        self.assertEqual(self.server.version, version)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+"""
+ทดสอบ symmetry_utils: คะแนนไม่เปลี่ยนภายใต้ SCORE_PRESERVING_SYMMETRIES และการแปลง Action ไป-กลับตรงกัน
+รัน: python -m pytest test_symmetry_utils.py (หรือ python -m unittest test_symmetry_utils)
+"""
+
+import random
+import unittest
+
+import numpy as np
+
+from grid_codec import CELL_CODES, ACTION_TYPES, pack_grid, encode_action, decode_action
+from reward_calculator import calculate_reward_verbose
+from symmetry_utils import (
+    SCORE_PRESERVING_SYMMETRIES, TRANSFORMS, transform_grid, canonicalize, canonical_state_action, restore_action
+)
+
+SHAPES = ((3, 3), (3, 4), (4, 3), (4, 5), (5, 5), (6, 7), (7, 7))
+SAMPLES = 30
+
+def random_grid(rng, rows, cols):
+    """ ✅ Grid ตัวอักษรสุ่ม (ไม่มี 'X') """
+    cells = [cell for cell in CELL_CODES if cell != 'X']
+    return np.array([[rng.choice(cells) for _ in range(cols)] for _ in range(rows)])
+
+
+class ScorePreservingSymmetriesTest(unittest.TestCase):
+    def test_reward_invariant(self):
+        rng = random.Random(0)
+        for rows, cols in SHAPES:
+            for _ in range(SAMPLES):
+                grid = random_grid(rng, rows, cols)
+                expected = calculate_reward_verbose(grid)
+                for name in SCORE_PRESERVING_SYMMETRIES:
+                    with self.subTest(shape=(rows, cols), transform=name):
+                        self.assertEqual(calculate_reward_verbose(transform_grid(grid, name)), expected)
+
+    def test_canonical_key_shared_by_symmetric_grids(self):
+        rng = random.Random(1)
+        for rows, cols in SHAPES:
+            grid = random_grid(rng, rows, cols)
+            key = canonicalize(grid)[0]
+            for name in SCORE_PRESERVING_SYMMETRIES:
+                with self.subTest(shape=(rows, cols), transform=name):
+                    self.assertEqual(canonicalize(transform_grid(grid, name))[0], key)
+
+
+class CanonicalActionTest(unittest.TestCase):
+    def test_round_trip(self):
+        rng = random.Random(2)
+        for rows, cols in SHAPES:
+            for _ in range(SAMPLES):
+                grid = random_grid(rng, rows, cols)
+                r, c, char = rng.randrange(rows), rng.randrange(cols), rng.choice(ACTION_TYPES)
+                action = encode_action(r, c, char, cols)
+
+                state_key, canonical_action, name = canonical_state_action(grid, action)
+                canonical_grid = transform_grid(grid, name)
+                self.assertEqual(state_key, pack_grid(canonical_grid))
+
+                # ✅ Action ของตัวแทนชี้ไปที่ช่องเดียวกัน (ค่าเดิม) บน Grid ที่แปลงแล้ว
+                new_r, new_c, new_char = decode_action(canonical_action, canonical_grid.shape[1])
+                self.assertEqual(new_char, char)
+                self.assertEqual(canonical_grid[new_r, new_c], grid[r, c])
+
+                self.assertEqual(restore_action(canonical_action, name, (rows, cols)), action)
+
+    def test_restore_every_transform(self):
+        for rows, cols in SHAPES:
+            for name in TRANSFORMS:
+                shape = transform_grid(np.zeros((rows, cols)), name).shape
+                for action in range(rows * cols * len(ACTION_TYPES)):
+                    with self.subTest(shape=(rows, cols), transform=name, action=action):
+                        canonical_action = canonical_state_action(np.zeros((rows, cols)), action, (name,))[1]
+                        self.assertLess(canonical_action, shape[0] * shape[1] * len(ACTION_TYPES))
+                        self.assertEqual(restore_action(canonical_action, name, (rows, cols)), action)
+
+
+if __name__ == "__main__":
+    unittest.main()
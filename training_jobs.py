@@ -0,0 +1,126 @@
+"""
+ตัวจัดการงานฝึก AI เบื้องหลังสำหรับ Dashboard
+งานฝึกรันใน thread pool (ไม่บล็อกสคริปต์ Streamlit) คำขอที่เหมือนกัน (rows, cols, E, episodes) ใช้งานเดียวกัน
+ระหว่างฝึกเก็บผังที่ดีที่สุดและกราฟคะแนนไว้ให้หน้าเว็บดึงไปแสดงได้เรื่อยๆ
+งานที่เสร็จแล้วถูกเก็บไว้ (LRU) ผู้ใช้/แท็บอื่นที่ขอแบบเดียวกันได้ผลทันทีโดยไม่ต้องฝึกซ้ำ
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class TrainingJob:
+    """ ✅ สถานะของงานฝึกหนึ่งงาน (อัปเดตจาก thread ที่ฝึก อ่านผ่าน snapshot() เท่านั้น) """
+
+    def __init__(self, key, episodes):
+        self.key = key
+        self.episodes = episodes
+        self.status = QUEUED
+        self.episodes_done = 0
+        self.best_grid = None
+        self.best_score = None
+        self.curve = []  # ✅ [(episodes_done, best_score), ...]
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = self.finished_at = None
+        self._lock = threading.Lock()
+
+    def report(self, episodes_done, best_grid, best_score):
+        """ ✅ callback ความคืบหน้าจาก train_ai """
+        with self._lock:
+            self.episodes_done = episodes_done
+            self.best_grid = [row[:] for row in best_grid] if best_grid is not None else None
+            self.best_score = best_score
+            self.curve.append((episodes_done, best_score))
+
+    def snapshot(self):
+        """ ✅ สำเนาสถานะปัจจุบันเป็น dict (ปลอดภัยเมื่ออ่านระหว่างฝึก) """
+        with self._lock:
+            return {
+                'key': self.key,
+                'status': self.status,
+                'episodes': self.episodes,
+                'episodes_done': self.episodes_done,
+                'best_grid': [row[:] for row in self.best_grid] if self.best_grid is not None else None,
+                'best_score': self.best_score,
+                'curve': list(self.curve),
+                'error': self.error,
+                'elapsed': ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0,
+            }
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+
+class TrainingJobManager:
+    """ ✅ คิวงานฝึกที่รวมคำขอซ้ำ: submit() ด้วย key เดิมได้งานเดิม (ยกเว้นงานที่ล้มเหลว จะเริ่มใหม่)
+
+    `train_fn(episodes, grid, e_position=..., progress=...)` ต้องคืน (best_grid, best_score)
+    เช่น jecsun.train_ai หมายเหตุ: ใช้ thread จึงฝึกได้ทีละงานจริงๆ ตาม GIL
+    ข้อดีคือสคริปต์ Streamlit ไม่ถูกบล็อกและ rerun ไม่ทำให้เริ่มฝึกใหม่
+    """
+
+    def __init__(self, train_fn, max_workers=1, max_finished=64):
+        self.train_fn = train_fn
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="training-job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, key, episodes, grid, e_position=None):
+        """ ✅ ส่งงานฝึก (หรือคืนงานที่มี key เดียวกันอยู่แล้ว) """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status != FAILED:
+                self._jobs.move_to_end(key)
+                return job
+            job = TrainingJob(key, episodes)
+            self._jobs[key] = job
+            self._evict()
+        self._executor.submit(self._run, job, [row[:] for row in grid], e_position)
+        logger.info("🧵 ส่งงานฝึก %s (%s episodes)", key, episodes)
+        return job
+
+    def get(self, key):
+        with self._lock:
+            return self._jobs.get(key)
+
+    def jobs(self):
+        """ ✅ snapshot ของทุกงาน (เก่าสุดก่อน) """
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.snapshot() for job in jobs]
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job, grid, e_position):
+        with job._lock:
+            job.status = RUNNING
+            job.started_at = time.time()
+        try:
+            best_grid, best_score = self.train_fn(job.episodes, grid, e_position=e_position, progress=job.report)
+        except Exception as e:
+            logger.exception("❌ งานฝึก %s ล้มเหลว", job.key)
+            with job._lock:
+                job.status, job.error, job.finished_at = FAILED, str(e), time.time()
+            return
+        with job._lock:
+            job.best_grid, job.best_score = best_grid, best_score
+            job.episodes_done = job.episodes
+            job.status, job.finished_at = DONE, time.time()
+        logger.info("✅ งานฝึก %s เสร็จ | คะแนน %s | %.1f วินาที", job.key, best_score, job.finished_at - job.started_at)
+
+    def _evict(self):
+        """ ✅ ทิ้งงานที่เสร็จแล้วที่เก่าที่สุดเมื่อเก็บไว้เกิน max_finished (งานที่ยังไม่เสร็จไม่ถูกทิ้ง) """
+        finished = [key for key, job in self._jobs.items() if job.finished]
+        for key in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[key]
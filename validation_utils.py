@@ -0,0 +1,34 @@
+"""
+ตรวจสอบความถูกต้องของ Grid ก่อนใช้ฝึก AI หรือให้คะแนน
+"""
+
+import numpy as np
+
+from grid_codec import CELL_CODES, SHAPE_BITS
+
+MAX_GRID_SIZE = (1 << SHAPE_BITS) - 1  # ✅ key ของ Q-Table เก็บขนาดได้สูงสุด 7x7 (grid_codec)
+
+def validate_grid_size(size):
+    """ ✅ ขนาด (rows, cols) ต้องเป็นจำนวนเต็ม 1 ถึง MAX_GRID_SIZE """
+    try:
+        rows, cols = size
+    except (TypeError, ValueError):
+        return False
+    return all(isinstance(n, (int, np.integer)) and 1 <= n <= MAX_GRID_SIZE for n in (rows, cols))
+
+def validate_grid_content(grid):
+    """ ✅ ทุกช่องต้องเป็นตัวอักษรที่รู้จัก ('0', 'E', 'H', 'R', 'G', 'X') หรือรหัส uint8 ของตัวอักษรเหล่านั้น """
+    grid = np.asarray(grid)
+    if grid.dtype == np.uint8:
+        return bool((grid < len(CELL_CODES)).all())
+    return bool(np.isin(grid.astype(str), list(CELL_CODES)).all())
+
+def validate_grid(grid):
+    """ ✅ Grid ต้องเป็นสี่เหลี่ยม (ทุกแถวยาวเท่ากัน) ขนาดที่รองรับ และมีแต่ช่องที่รู้จัก """
+    if grid is None:
+        return False
+    if not isinstance(grid, np.ndarray):
+        if not len(grid) or len({len(row) for row in grid}) != 1:
+            return False
+    grid = np.asarray(grid)
+    return grid.ndim == 2 and validate_grid_size(grid.shape) and validate_grid_content(grid)
@@ -2,10 +2,11 @@ import streamlit as st
 import numpy as np
 import pandas as pd
 import random
-import io
-import sys
 import base64
+import time
 from jecsun import initialize_grid, load_or_initialize_grid, train_ai, apply_house_types, analyze_profit, GRID_ROWS, GRID_COLS, E_START_POSITION, EPISODES, csv_folder
+from layout_artifact import load_layout_artifact
+from training_jobs import TrainingJobManager, FAILED
 
 # --- Page Config ---
 st.set_page_config(page_title="AI Village Planner", layout="wide")
@@ -16,6 +17,16 @@ def get_base64_image(image_path):
         b64_string = base64.b64encode(img_file.read()).decode()
     return f"data:image/png;base64,{b64_string}"
 
+# ผังที่ดีที่สุดที่คำนวณไว้ล่วงหน้า (โหลดครั้งเดียวต่อ server, None ถ้าไม่มีไฟล์หรือไฟล์หมดอายุ)
+@st.cache_resource
+def get_layout_artifact():
+    return load_layout_artifact()
+
+# งานฝึก AI เบื้องหลัง (ใช้ร่วมกันทุก session: คำขอเดียวกันไม่ฝึกซ้ำ และ rerun ไม่เริ่มฝึกใหม่)
+@st.cache_resource
+def get_training_jobs():
+    return TrainingJobManager(train_ai)
+
 # --- Sidebar ---
 with st.sidebar:
     st.markdown(
@@ -98,17 +109,83 @@ def render_colored_grid(grid, title):
     html += "</table>"
     st.markdown(html, unsafe_allow_html=True)
 
+# --- Profit Rendering ---
+def render_profit_report(report):
+    st.subheader("📊 Profitability Analysis")
+    st.markdown("**📋 House Type Summary**")
+    st.dataframe(pd.DataFrame([
+        {
+            'House Type': htype,
+            'Number of Units': info['units'],
+            'Cost/Unit (Baht)': f"{info['cost_per_unit']:,.0f}",
+            'Sale/Unit (Baht)': f"{info['sale_per_unit']:,.0f}",
+            'Profit/Unit (Baht)': f"{info['profit_per_unit']:,.0f}",
+            'Total Cost (Baht)': f"{info['total_cost']:,.0f}",
+            'Total Profit (Baht)': f"{info['total_profit']:,.0f}",
+        }
+        for htype, info in report['houses'].items()
+    ]), hide_index=True)
+
+    columns = st.columns(5)
+    columns[0].metric("💸 Total Construction Cost", f"{report['total_cost']:,} Baht")
+    columns[1].metric("💰 Total Revenue", f"{report['total_revenue']:,} Baht")
+    columns[2].metric("📈 Total Profit", f"{report['total_profit']:,} Baht")
+    columns[3].metric("📐 Average Profit per sqm", f"{report['profit_per_sqm']:,.2f} Baht/sqm")
+    columns[4].metric("🎯 Weighted Profit", f"{report['weighted_profit']:,.2f} Baht")
+
+# --- Training Progress ---
+def wait_for_training(job):
+    """ แสดงความคืบหน้าของงานฝึก (ผังที่ดีที่สุดตอนนี้ + กราฟคะแนน) จนกว่างานจะเสร็จ แล้วคืน snapshot สุดท้าย """
+    progress_bar = st.progress(0.0)
+    layout_slot = st.empty()
+    chart_slot = st.empty()
+    while not job.finished:
+        snapshot = job.snapshot()
+        progress_bar.progress(snapshot['episodes_done'] / snapshot['episodes'],
+                              text=f"⏳ Training AI... {snapshot['episodes_done']:,}/{snapshot['episodes']:,} episodes")
+        if snapshot['best_grid'] is not None:
+            with layout_slot.container():
+                render_colored_grid(snapshot['best_grid'], f"⏳ Best Layout So Far (Score: {snapshot['best_score']})")
+        if snapshot['curve']:
+            chart_slot.line_chart(pd.DataFrame(snapshot['curve'], columns=['Episode', 'Best Score']).set_index('Episode'))
+        time.sleep(0.5)
+
+    snapshot = job.snapshot()
+    progress_bar.empty()
+    layout_slot.empty()
+    if snapshot['curve']:
+        chart_slot.line_chart(pd.DataFrame(snapshot['curve'], columns=['Episode', 'Best Score']).set_index('Episode'))
+    return snapshot
+
 # --- Main Logic ---
 if train_ai_clicked:
     with st.spinner("Loading or creating grid..."):
         grid, new_e = initialize_grid(rows, cols, e_position)
-        grid, _ = load_or_initialize_grid(csv_folder, rows, cols, new_e)
-
-    st.success(f"✅ Grid {rows}x{cols} loaded successfully | E Position: {new_e}")
+        artifact = get_layout_artifact()
+        precomputed = artifact.lookup(rows, cols, (new_e[0] - 1, new_e[1] - 1)) if artifact else None
+        if precomputed is None:
+            grid, _ = load_or_initialize_grid(csv_folder, rows, cols, new_e)
+    # ✅ เก็บคำขอไว้ใน session: rerun (เช่นขยับ slider) จะกลับมาดูงานเดิม ไม่เริ่มฝึกใหม่
+    st.session_state['layout_request'] = {'rows': rows, 'cols': cols, 'new_e': new_e, 'grid': grid,
+                                          'precomputed': precomputed}
+
+request = st.session_state.get('layout_request')
+if request:
+    grid, new_e, precomputed = request['grid'], request['new_e'], request['precomputed']
+    st.success(f"✅ Grid {request['rows']}x{request['cols']} loaded successfully | E Position: {new_e}")
     render_colored_grid(grid, "📌 Initial Layout (Before AI Training)")
 
-    with st.spinner("⏳ Training AI... Please wait..."):
-        best_grid, best_score = train_ai(EPISODES, grid)
+    if precomputed is not None:
+        best_grid, best_score = precomputed['grid'], precomputed['score']
+        st.caption("⚡ Loaded from the precomputed layout table" + (" (proven optimal)" if precomputed['optimal'] else ""))
+    else:
+        job_key = (request['rows'], request['cols'], new_e, EPISODES)
+        result = wait_for_training(get_training_jobs().submit(job_key, EPISODES, grid, new_e))
+        if result['status'] == FAILED:
+            st.error(f"❌ Training failed: {result['error']}")
+            st.stop()
+        best_grid, best_score = result['best_grid'], result['best_score']
+        st.caption(f"⏱️ Trained {result['episodes']:,} episodes in {result['elapsed']:.1f} seconds")
 
     final_grid = apply_house_types([row[:] for row in best_grid])
 
@@ -117,14 +194,10 @@ if train_ai_clicked:
 
     render_colored_grid(final_grid, "📌 Final Layout with House Types (H1–H4)")
 
-    st.subheader("📊 Profitability Analysis")
-    buffer = io.StringIO()
-    sys.stdout = buffer
-    analyze_profit(final_grid)
-    sys.stdout = sys.__stdout__
-    st.text(buffer.getvalue())
+    render_profit_report(analyze_profit(final_grid))
 
-    st.snow()
+    if train_ai_clicked:
+        st.snow()
 
 else:
     st.info("👈 Please configure settings and click 'Train AI' to start.")